@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import argparse
+import getpass
+import sqlite3
+import sys
+
+from utils import annotation_queue, call_database
+
+def parse_item(text, origin):
+    """'origin:recording_id' または recording_id（--origin を使う）を (origin, recording_id) にする"""
+    if ':' in text:
+        item_origin, recording_id = text.rsplit(':', 1)
+    else:
+        item_origin, recording_id = origin, text
+    if not item_origin:
+        raise argparse.ArgumentTypeError(f"音源元がありません（origin:recording_id の形式か --origin で指定してください）: {text}")
+    if not recording_id.isdigit():
+        raise argparse.ArgumentTypeError(f"recording_idが不正です: {text}")
+    return item_origin, int(recording_id)
+
+def print_claimed(conn, claimed):
+    """取り出した録音を詳細と一緒に表示する"""
+    for origin, recording_id in claimed:
+        row = conn.execute('SELECT gen, sp, en, quality, length, file FROM sound_metadata WHERE origin = ? AND recording_id = ?',
+                           (origin, recording_id)).fetchone()
+        gen, sp, en, quality, length, file = row or ('', '', '', '', '', '')
+        print(f"{origin}:{recording_id}\t{gen} {sp} ({en})\t{quality}\t{length}\t{file}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='アノテーションの作業キュー（未アノテーションの録音の取り出し・完了・進み具合）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+例:
+  annotation_queue.py claim -n 10 --species "Parus minor" --quality A,B
+  annotation_queue.py done xeno-canto:123456 xeno-canto:123457 --count 12
+  annotation_queue.py release
+  annotation_queue.py progress --origin xeno-canto
+''')
+    parser.add_argument('--db', help=f'データベースのパス（デフォルト: 環境変数 {call_database.DB_PATH_ENV}、なければ {call_database.DEFAULT_DB_PATH}）')
+    parser.add_argument('--annotator', default=getpass.getuser(), help='作業者の名前（デフォルト: ログイン名）')
+    parser.add_argument('--lease', type=int, default=annotation_queue.DEFAULT_LEASE_SECONDS,
+                        help=f'取り出した録音を他の人に渡さない時間（秒、デフォルト: {annotation_queue.DEFAULT_LEASE_SECONDS}）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--origin', help='音源元で絞り込む（例：xeno-canto）。done/release で recording_id だけを指定した場合の音源元')
+
+    claim_parser = subparsers.add_parser('claim', parents=[common], help='未アノテーションの録音を取り出す')
+    claim_parser.add_argument('-n', '--limit', type=int, default=1, help='取り出す件数（デフォルト: 1）')
+    claim_parser.add_argument('--species', help='学名（"Parus minor"）または英名で絞り込む')
+    claim_parser.add_argument('--quality', help='品質で絞り込む（カンマ区切り。例: A,B）')
+
+    done_parser = subparsers.add_parser('done', parents=[common], help='録音をアノテーション済みにする')
+    done_parser.add_argument('items', nargs='+', help='origin:recording_id または recording_id')
+    done_parser.add_argument('--count', type=int, help='アノテーションの数')
+
+    release_parser = subparsers.add_parser('release', parents=[common], help='取り出した未完了の録音を戻す')
+    release_parser.add_argument('items', nargs='*', help='origin:recording_id または recording_id（省略時は全て）')
+
+    progress_parser = subparsers.add_parser('progress', parents=[common], help='種毎の進み具合を表示する')
+    progress_parser.add_argument('--species', help='学名（"Parus minor"）または英名で絞り込む')
+    progress_parser.add_argument('--quality', help='品質で絞り込む（カンマ区切り。例: A,B）')
+
+    args = parser.parse_args()
+    quality = args.quality.split(',') if getattr(args, 'quality', None) else None
+    try:
+        items = [parse_item(item, args.origin) for item in getattr(args, 'items', [])]
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    try:
+        conn = call_database.connect(args.db)
+        try:
+            if args.command == 'claim':
+                claimed = annotation_queue.claim(conn, args.annotator, args.limit, args.species, quality,
+                                                 args.origin, args.lease)
+                print_claimed(conn, claimed)
+                print(f"{len(claimed)}件を取り出しました（作業者: {args.annotator}）")
+            elif args.command == 'done':
+                done = annotation_queue.mark_done(conn, args.annotator, items, args.count)
+                print(f"{len(done)}件をアノテーション済みにしました")
+                lost = sorted(set(items) - set(done))
+                for origin, recording_id in lost:
+                    print(f"エラー: {origin}:{recording_id} は {args.annotator} が取り出していないか、"
+                          f"期限が切れて他の作業者に渡りました", file=sys.stderr)
+                if lost:
+                    sys.exit(1)
+            elif args.command == 'release':
+                released = annotation_queue.release(conn, args.annotator, items or None)
+                print(f"{released}件を戻しました")
+            else:
+                rows = annotation_queue.progress(conn, args.species, quality, args.origin, args.lease)
+                print(f"{'種':<40} {'録音数':>8} {'済み':>8} {'作業中':>8} {'進捗':>7}")
+                print("-" * 80)
+                totals = [0, 0, 0]
+                for gen, sp, en, total, annotated, claimed in rows:
+                    print(f"{gen + ' ' + sp + ' (' + (en or '') + ')':<40} {total:>8} {annotated:>8} {claimed:>8} {annotated / total:>7.1%}")
+                    totals = [totals[0] + total, totals[1] + annotated, totals[2] + claimed]
+                print("-" * 80)
+                print(f"{'合計':<40} {totals[0]:>8} {totals[1]:>8} {totals[2]:>8} {totals[1] / max(1, totals[0]):>7.1%}")
+        finally:
+            conn.close()
+    except (sqlite3.Error, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
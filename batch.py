@@ -5,6 +5,8 @@ import subprocess
 import sys
 import shutil
 
+from utils import media_probe
+
 # グローバル定数として定義
 NOISE_FILENAME = "noise.wav"
 NOISE_IMAGE_FILENAME = "noise.png"
@@ -38,9 +40,7 @@ def parse_arguments():
     return parser.parse_args()
 
 def is_stereo(file_path):
-    command = "ffprobe -v error -show_entries stream=channels -of default=noprint_wrappers=1:nokey=1 {}".format(file_path)
-    result = subprocess.run(command, shell=True, capture_output=True, text=True, check=True)
-    return result.stdout.strip() == '2'
+    return media_probe.get_channels(file_path) == 2
 
 def separate_stereo(input_file, left_output, right_output):
     # 既存のファイルを削除
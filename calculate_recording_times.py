@@ -1,11 +1,38 @@
 #!/usr/bin/env python3
 
 import os
-import subprocess
+import re
 import argparse
+import csv
+import json
+import sqlite3
+import sys
 import time
 from datetime import datetime, timedelta
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+from utils import probe_cache, recording_catalog
+
+# 集計対象の音声ファイルの拡張子
+AUDIO_EXTENSIONS = ('.wav', '.mp3')
+
+# ディレクトリ走査のスレッド数（NAS上ではメタデータ取得の待ち時間が支配的なため多めにする）
+DEFAULT_WALK_JOBS = 16
+
+# ファイル名から時間を取得できないファイルを解析するスレッド数
+DEFAULT_PROBE_JOBS = 4
+
+# タイムラインで報告する空白の最短の長さ（秒）。録音機のファイル分割による数秒の隙間は無視する
+DEFAULT_GAP_MIN = 60
+
+# --group-by で指定できる集計キー（depthN は直下から深さNまでのディレクトリ）
+GROUP_LABELS = {'day': '日別', 'month': '月別', 'hour': '時刻別（0〜23時）', 'recorder': '録音機別'}
+UNKNOWN_GROUP = '不明'
+
+# csv形式で書き出す列（レコードの種類によって使わない列は空になる）
+RECORD_FIELDS = ['type', 'group_by', 'key', 'directory', 'path', 'other_path', 'start_time', 'end_time', 'duration_seconds', 'duration',
+                 'duration_source', 'files', 'size', 'last_update', 'message', 'execution_time']
 
 def is_valid_timestamp_format(filename):
     # ファイル名から日付と時刻を抽出
@@ -31,17 +58,14 @@ def is_valid_timestamp_format(filename):
             return False
     return False
 
-def get_audio_duration(filepath):
-    try:
-        # ffprobeで音声ファイルの長さを取得
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', filepath]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            return timedelta(seconds=duration)
-    except Exception as e:
-        print(f"Warning: ファイル '{filepath}' の長さ取得に失敗しました: {str(e)}")
-    return None
+def get_audio_duration(filepath, cache=None, stat_result=None):
+    # ヘッダから音声ファイルの長さを取得（解析できない形式のみffprobeを使う）
+    # cacheを指定した場合は変更されていないファイルの解析結果を再利用する
+    duration = probe_cache.get_duration(filepath, cache, stat_result)
+    if duration is None:
+        print(f"Warning: ファイル '{filepath}' の長さ取得に失敗しました", file=sys.stderr)
+        return None
+    return timedelta(seconds=duration)
 
 def parse_filename(filename):
     # ファイル名から日付と時刻を抽出
@@ -83,12 +107,6 @@ def should_exclude(path, exclude_pattern):
     # パスに除外パターンが含まれているかチェック
     return exclude_pattern in path
 
-def get_file_size(filepath):
-    try:
-        return os.path.getsize(filepath)
-    except Exception:
-        return 0
-
 def format_size(size_bytes):
     # バイト数を読みやすい形式に変換
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -97,18 +115,605 @@ def format_size(size_bytes):
         size_bytes /= 1024.0
     return f"{size_bytes:.2f} TB"
 
-def get_file_mtime(filepath):
+def scan_directory(dir_path):
+    """
+    1つのディレクトリを走査する関数
+
+    os.scandirのDirEntryを使うため、ファイルの種類判定に追加のstatは不要で、
+    サイズと更新時刻もDirEntry.stat()の1回で取得する。
+
+    Returns
+    -------
+    tuple
+        (音声ファイルのリスト, サブディレクトリのリスト, 走査したエントリ数, エラーメッセージ)
+        音声ファイルは (パス, ファイル名, os.stat_result または None) のタプル
+    """
+    files = []
+    subdirs = []
+    count = 0
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                count += 1
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                        files.append((entry.path, entry.name, entry.stat()))
+                except OSError:
+                    files.append((entry.path, entry.name, None))
+    except OSError as e:
+        return files, subdirs, count, f"Warning: ディレクトリ '{dir_path}' を読み込めません: {e}"
+    return files, subdirs, count, None
+
+def check_directory(dir_path, known_mtime_ns):
+    """
+    ディレクトリの更新時刻を確認し、変更されていれば走査する関数
+
+    Returns
+    -------
+    tuple
+        (ディレクトリの更新時刻ns, scan_directoryの戻り値)。
+        変更されていない場合は走査結果がNone、statに失敗した場合は更新時刻がNone
+    """
     try:
-        return os.path.getmtime(filepath)
-    except Exception:
-        return 0
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+    except OSError as e:
+        return None, ([], [], 0, f"Warning: ディレクトリ '{dir_path}' を読み込めません: {e}")
+    if mtime_ns == known_mtime_ns:
+        return mtime_ns, None
+    return mtime_ns, scan_directory(dir_path)
+
+def parse_recording(file):
+    """
+    録音ファイル1つの開始・終了時刻と長さをファイル名から求める関数
+
+    ファイル名から時刻を取得できない場合は duration_source を 'unprobed' とし、
+    集計対象になった時点で probe_pending_recordings() が音声ファイルから長さを取得する。
+
+    Returns
+    -------
+    dict
+        カタログに保存する列（start_time, end_time, duration, duration_source, is_666, warning）
+    """
+    start_time, end_time, warning = parse_filename(file)
+    row = {
+        'start_time': None,
+        'end_time': None,
+        'duration': None,
+        'duration_source': None,
+        'is_666': is_valid_timestamp_format(file),
+        'warning': None,
+    }
+    if warning:
+        row['duration_source'] = 'unprobed'
+        row['warning'] = warning
+    elif start_time and end_time:
+        row['start_time'] = start_time.strftime(recording_catalog.TIME_FORMAT)
+        row['end_time'] = end_time.strftime(recording_catalog.TIME_FORMAT)
+        row['duration'] = (end_time - start_time).total_seconds()
+        row['duration_source'] = 'filename'
+    return row
+
+def update_directory_files(catalog, top, dir_path, files, on_unprobed=None):
+    """
+    走査したディレクトリの録音ファイルのうち、新規・変更されたものだけを解析してカタログを更新する
+
+    ファイル名から時間を取得できなかったファイルは on_unprobed(top, パス, ファイル名) に渡す。
+    """
+    known = catalog.get_files(top, dir_path)
+    parsed = 0
+    for filepath, file, st in files:
+        size = st.st_size if st else 0
+        mtime_ns = st.st_mtime_ns if st else 0
+        if st is not None and known.get(filepath) == (size, mtime_ns):
+            continue
+        row = parse_recording(file)
+        catalog.save_recording(top, filepath, dir_path, file, size, mtime_ns, **row)
+        if on_unprobed and row['duration_source'] == 'unprobed':
+            on_unprobed(top, filepath, file)
+        parsed += 1
+    catalog.delete_recordings(top, set(known) - {filepath for filepath, _, _ in files})
+    return parsed
+
+def refresh_catalog(catalog, top_dirs, jobs=DEFAULT_WALK_JOBS, rebuild=False, on_unprobed=None, on_directory=None):
+    """
+    カタログを差分更新する関数
+
+    ディレクトリの更新時刻をスレッドプールで並列に確認し、変更されたディレクトリだけを
+    os.scandirで走査する。変更されていないディレクトリのサブディレクトリはカタログから
+    たどるため、ファイル毎のstatは発生しない。ファイルの追加・削除・名前変更は
+    ディレクトリの更新時刻で検出できるが、既存ファイルの上書きは検出できないため
+    必要に応じてrebuildで作り直す。
+
+    Parameters
+    ----------
+    catalog : RecordingCatalog
+        更新するカタログ
+    top_dirs : list of str
+        直下のディレクトリの絶対パス
+    jobs : int
+        ディレクトリ走査のスレッド数
+    rebuild : bool
+        Trueの場合はカタログを破棄して全て走査し直す
+    on_unprobed : callable, optional
+        ファイル名から時間を取得できなかった新規・変更ファイル毎に呼ばれる関数
+    on_directory : callable, optional
+        カタログへの反映が終わったディレクトリ毎に on_directory(top, パス, 配下も含むか) で呼ばれる関数
+        （読み込めなかったディレクトリは、カタログに残っている配下のディレクトリも含めて呼ばれる）
+
+    Returns
+    -------
+    tuple
+        (走査の統計情報, 警告メッセージのリスト)
+    """
+    scan_stats = {'dirs': 0, 'rescanned': 0, 'entries': 0, 'parsed': 0, 'seconds': 0.0}
+    warnings = []
+    scan_start = time.time()
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {}
+
+        def submit(top, path, parent):
+            known_mtime_ns = catalog.get_directory_mtime(top, path)
+            pending[executor.submit(check_directory, path, known_mtime_ns)] = (top, path, parent)
+
+        for top in top_dirs:
+            if rebuild:
+                catalog.delete_top(top)
+            submit(top, top, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                top, path, parent = pending.pop(future)
+                mtime_ns, scan = future.result()
+                scan_stats['dirs'] += 1
+
+                if scan is None:
+                    # 変更されていないディレクトリはカタログのサブディレクトリをたどる
+                    if on_directory:
+                        on_directory(top, path, False)
+                    for child in catalog.get_child_directories(top, path):
+                        submit(top, child, path)
+                    continue
+
+                files, subdirs, count, error = scan
+                scan_stats['entries'] += count
+                if error:
+                    warnings.append(error)
+                    if mtime_ns is None and not os.path.exists(path):
+                        catalog.delete_directory_tree(top, path)
+                    elif on_directory:
+                        on_directory(top, path, True)
+                    continue
+
+                scan_stats['rescanned'] += 1
+                scan_stats['parsed'] += update_directory_files(catalog, top, path, files, on_unprobed)
+                for child in set(catalog.get_child_directories(top, path)) - set(subdirs):
+                    catalog.delete_directory_tree(top, child)
+                for child in subdirs:
+                    catalog.add_directory(top, child, path)
+                catalog.save_directory(top, path, parent, mtime_ns)
+                if on_directory:
+                    on_directory(top, path, False)
+                for child in subdirs:
+                    submit(top, child, path)
+
+    catalog.commit()
+    scan_stats['seconds'] = time.time() - scan_start
+    return scan_stats, warnings
+
+def is_failed_file_changed(catalog, top, path, size, mtime_ns):
+    """
+    前回長さを取得できなかったファイルが、その時から変更されているか調べる関数
+
+    変更されていないファイルは何度解析しても失敗するため、解析し直さない。
+    変更されていた場合はカタログのサイズ・更新時刻を更新し、次回はその時点と比較する。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+        return False
+    catalog.set_file_stat(top, path, st.st_size, st.st_mtime_ns)
+    return True
 
 def format_datetime(timestamp):
     if timestamp == 0:
         return "未更新"
     return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
-def calculate_recording_times(root_dir, verbose=False, check_filename=False, exclude_pattern=None, only_666=False):
+class DurationProber:
+    """
+    ファイル名から時間を取得できなかったファイルの長さをスレッドプールで取得するクラス
+
+    ディレクトリの走査中に見つかったファイルをすぐに投入できるため、
+    音声ファイルの解析（ffprobeを含む）が走査を止めることはない。
+    結果のカタログへの書き込みはcollect()を呼んだスレッドでまとめて行う。
+
+    Parameters
+    ----------
+    cache : ProbeCache, optional
+        音声ファイルの解析結果キャッシュ
+    jobs : int
+        解析に使うスレッド数
+    show_progress : bool
+        Trueの場合は進捗を標準エラー出力に表示する
+    """
+
+    def __init__(self, cache=None, jobs=DEFAULT_PROBE_JOBS, show_progress=False):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.futures = {}
+        self.show_progress = show_progress
+
+    def submit(self, top, path, filepath):
+        """長さを取得するファイルを投入する（同じファイルは1回だけ）"""
+        if (top, path) not in self.futures:
+            self.futures[(top, path)] = self.executor.submit(get_audio_duration, filepath, self.cache)
+
+    def collect(self, catalog, on_done=None):
+        """
+        全ての解析結果を待ってカタログに保存する
+
+        on_doneを指定した場合は、解析が終わったファイル毎に保存した直後に on_done(top, パス) を呼ぶ。
+
+        Returns
+        -------
+        tuple
+            (解析したファイル数, 長さを取得できなかったファイル数)
+        """
+        keys = {future: key for key, future in self.futures.items()}
+        total = len(keys)
+        done_count = 0
+        errors = 0
+        last_report = 0.0
+        try:
+            for future in as_completed(keys):
+                top, path = keys[future]
+                duration = future.result()
+                if duration:
+                    catalog.set_duration(top, path, duration.total_seconds(), 'probe')
+                else:
+                    catalog.set_duration(top, path, None, 'failed')
+                    errors += 1
+                if on_done:
+                    on_done(top, path)
+                done_count += 1
+                if self.show_progress and (time.time() - last_report >= 1.0 or done_count == total):
+                    last_report = time.time()
+                    print(f"\r音声ファイル解析: {done_count}/{total} (失敗 {errors})", end='', file=sys.stderr, flush=True)
+            if self.show_progress and total:
+                print(file=sys.stderr)
+        finally:
+            self.executor.shutdown(wait=True)
+            catalog.commit()
+        return total, errors
+
+def open_catalog(catalog_path=None, enabled=True):
+    """
+    カタログを開く。無効化されている場合や開けない場合はメモリ上のカタログを使う
+    """
+    if enabled:
+        path = catalog_path or os.path.join(probe_cache.default_cache_dir(), recording_catalog.CATALOG_FILENAME)
+        try:
+            return recording_catalog.RecordingCatalog(path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: カタログを開けません（メモリ上で集計します）: {e}", file=sys.stderr)
+    return recording_catalog.RecordingCatalog(':memory:')
+
+def get_display(root_dir):
+    """
+    カタログのパスを表示用のパスに変換するための (接頭辞, 切り取り開始位置) を返す
+
+    カタログは絶対パスで管理し、表示や除外パターンの判定には
+    コマンドラインで指定されたディレクトリからのパスを使う。
+    """
+    root_abs = os.path.abspath(root_dir)
+    return os.path.join(root_dir, ''), len(os.path.join(root_abs, '')) + 1
+
+def get_top_dirs(root_dir, exclude_pattern=None):
+    """集計対象の直下のディレクトリを {絶対パス: ディレクトリ名} で返す"""
+    root_abs = os.path.abspath(root_dir)
+    top_dirs = {}
+    for subdir in sorted(os.listdir(root_dir)):
+        dir_path = os.path.join(root_dir, subdir)
+        if os.path.isdir(dir_path) and not (exclude_pattern and should_exclude(dir_path, exclude_pattern)):
+            top_dirs[os.path.join(root_abs, subdir)] = subdir
+    return top_dirs
+
+def parse_datetime_argument(value):
+    """コマンドラインで指定された日時（YYMMDD_HHMMSS または YYYY-MM-DD HH:MM:SS）を解析する"""
+    for fmt in ('%y%m%d_%H%M%S', '%y%m%d_%H%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"日時の形式が不正です: {value}（例: 240512_030000 または '2024-05-12 03:00:00'）")
+
+def sweep_timeline(intervals, min_gap=0):
+    """
+    開始時刻順に並んだ録音区間を1回だけ走査して、空白（ギャップ）と重複を求める関数
+
+    それまでの録音で最も遅い終了時刻を保持し、次の録音の開始時刻と比較する。
+    ファイル同士を総当たりで比較しないため、区間数nに対してO(n)で求まる。
+
+    Parameters
+    ----------
+    intervals : iterable
+        開始時刻順に並んだ (開始時刻, 終了時刻, パス) のタプル
+    min_gap : float
+        これより長い（秒）空白だけを報告する
+
+    Yields
+    ------
+    tuple
+        ('gap', 空白の開始, 空白の終了, 直前の録音のパス, 直後の録音のパス) または
+        ('overlap', 重複の開始, 重複の終了, 重なっている録音のパス, 録音のパス)
+    """
+    cover_end = None
+    cover_path = None
+    for start, end, path in intervals:
+        if cover_end is not None:
+            if start < cover_end:
+                yield 'overlap', start, min(end, cover_end), cover_path, path
+            elif (start - cover_end).total_seconds() > min_gap:
+                yield 'gap', cover_end, start, cover_path, path
+        if cover_end is None or end > cover_end:
+            cover_end = end
+            cover_path = path
+
+def iter_timeline(catalog, top_dirs, display, exclude_pattern=None, only_666=False, min_gap=0):
+    """
+    直下のディレクトリ毎に録音の空白と重複をレコードとして返す
+
+    ディレクトリ毎に 'timeline'（期間とファイル数）のレコードを返し、
+    続けてsweep_timeline()で求めた 'gap' と 'overlap' のレコードを返す。
+    """
+    for top, dir_name in sorted(top_dirs.items(), key=lambda item: item[1]):
+        if dir_name.startswith('.'):  # 隠しディレクトリを除外
+            continue
+        rows = catalog.list_recordings([top], ['start_time', 'end_time'], exclude_pattern, only_666, display,
+                                       condition='start_time IS NOT NULL', order_by='start_time, end_time')
+        if not rows:
+            continue
+        yield {
+            'type': 'timeline',
+            'directory': dir_name,
+            'start_time': rows[0][1],
+            'end_time': max(row[2] for row in rows),
+            'files': len(rows),
+        }
+        intervals = ((datetime.strptime(start, recording_catalog.TIME_FORMAT),
+                      datetime.strptime(end, recording_catalog.TIME_FORMAT), filepath)
+                     for filepath, start, end in rows)
+        for kind, start, end, before, after in sweep_timeline(intervals, min_gap):
+            yield {
+                'type': kind,
+                'directory': dir_name,
+                'start_time': start.strftime(recording_catalog.TIME_FORMAT),
+                'end_time': end.strftime(recording_catalog.TIME_FORMAT),
+                'duration_seconds': (end - start).total_seconds(),
+                'duration': format_timedelta(end - start),
+                'other_path': before,
+                'path': after,
+            }
+
+def print_timeline(records):
+    """iter_timeline()のレコードを表示する"""
+    totals = None
+    
+    def print_totals():
+        print(f"  空白 {totals['gap'][0]}件（合計 {format_timedelta(totals['gap'][1])}）, "
+              f"重複 {totals['overlap'][0]}件（合計 {format_timedelta(totals['overlap'][1])}）")
+    
+    for record in records:
+        if record['type'] == 'timeline':
+            if totals is not None:
+                print_totals()
+            totals = {'gap': [0, timedelta()], 'overlap': [0, timedelta()]}
+            print(f"タイムライン: {record['directory']} ({record['start_time']} 〜 {record['end_time']}, {record['files']}ファイル)")
+            continue
+        label = '空白' if record['type'] == 'gap' else '重複'
+        arrow = '→' if record['type'] == 'gap' else '⇔'
+        print(f"  {label}: {record['start_time']} 〜 {record['end_time']} ({record['duration']})  {record['other_path']} {arrow} {record['path']}")
+        totals[record['type']][0] += 1
+        totals[record['type']][1] += timedelta(seconds=record['duration_seconds'])
+    if totals is not None:
+        print_totals()
+
+def parse_group_keys(value):
+    """--group-by の値（カンマ区切り）を集計キーのリストに変換する"""
+    keys = []
+    for key in value.split(','):
+        key = key.strip()
+        if key in GROUP_LABELS or (key.startswith('depth') and key[5:].isdigit() and int(key[5:]) > 0):
+            keys.append(key)
+        else:
+            raise argparse.ArgumentTypeError(f"集計キーが不正です: {key}（day, month, hour, recorder, depthN のいずれか）")
+    return keys
+
+def get_recorder_tag(filename):
+    """666形式のファイル名の後ろの文字列（other）の先頭の語を録音機のタグとして返す"""
+    match = re.match(r'^\d{6}[_-]\d{6}[_-]\d{6}[_-]?(.*?)(\.[^.]*)?$', filename)
+    if not match:
+        return UNKNOWN_GROUP
+    return re.split(r'[_-]', match.group(1))[0] or '(なし)'
+
+def split_interval(start, end, key):
+    """
+    録音区間を集計単位（日・月・時）の境界で分割する関数
+
+    Yields
+    ------
+    tuple
+        (集計単位のラベル, その単位に含まれる秒数)
+    """
+    current = start
+    while current < end:
+        if key == 'day':
+            label = current.strftime('%Y-%m-%d')
+            boundary = datetime(current.year, current.month, current.day) + timedelta(days=1)
+        elif key == 'month':
+            label = current.strftime('%Y-%m')
+            boundary = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            label = current.strftime('%H')
+            boundary = datetime(current.year, current.month, current.day, current.hour) + timedelta(hours=1)
+        boundary = min(boundary, end)
+        yield label, (boundary - current).total_seconds()
+        current = boundary
+
+def split_interval_label(start, key):
+    """長さ0の録音を数える集計単位のラベルを返す"""
+    return start.strftime({'day': '%Y-%m-%d', 'month': '%Y-%m', 'hour': '%H'}[key])
+
+def aggregate_groups(catalog, top_dirs, display, keys, exclude_pattern=None, only_666=False):
+    """
+    複数の集計キーでの集計をカタログの1回の走査で求める関数
+
+    日・月・時の集計では、境界をまたぐ録音の時間をそれぞれの単位に按分する
+    （ファイル数とサイズは開始時刻の単位に数える）。ファイル名から開始時刻が
+    分からない録音は「不明」に数える。長さが分からない録音（解析の失敗・未解析）も
+    ファイル数とサイズには数え、録音時間は0秒とする（ディレクトリ毎の集計と一致させるため）。
+
+    Parameters
+    ----------
+    keys : list of str
+        集計キー（day, month, hour, recorder, depthN）
+
+    Returns
+    -------
+    dict
+        {集計キー: {グループ: [総録音時間（秒）, ファイル数, 総サイズ]}}
+    """
+    groups = {key: defaultdict(lambda: [0.0, 0, 0]) for key in keys}
+    root_len = display[1] - 1
+    for _, path, name, start, end, duration, size in catalog.iter_recordings(
+            list(top_dirs), ['path', 'name', 'start_time', 'end_time', 'duration', 'size'],
+            exclude_pattern, only_666, display):
+        if duration is None:
+            start = None
+            duration = 0.0
+        if start:
+            start = datetime.strptime(start, recording_catalog.TIME_FORMAT)
+            end = datetime.strptime(end, recording_catalog.TIME_FORMAT)
+        for key in keys:
+            if key in ('day', 'month', 'hour'):
+                if not start:
+                    buckets = [(UNKNOWN_GROUP, duration)]
+                else:
+                    buckets = list(split_interval(start, end, key)) or [(split_interval_label(start, key), 0.0)]
+                first = buckets[0][0]
+            else:
+                if key == 'recorder':
+                    first = get_recorder_tag(name)
+                else:
+                    parts = path[root_len:].split(os.sep)[:-1]
+                    first = os.sep.join(parts[:int(key[5:])])
+                buckets = [(first, duration)]
+            for label, seconds in buckets:
+                groups[key][label][0] += seconds
+            groups[key][first][1] += 1
+            groups[key][first][2] += size
+    return groups
+
+def iter_group_records(groups):
+    """aggregate_groups()の結果をレコードとして返す"""
+    for key, buckets in groups.items():
+        for label in sorted(buckets):
+            seconds, count, size = buckets[label]
+            yield {
+                'type': 'group',
+                'group_by': key,
+                'key': label,
+                'duration_seconds': seconds,
+                'duration': format_timedelta(timedelta(seconds=seconds)),
+                'files': count,
+                'size': size,
+            }
+
+def print_groups(groups):
+    """aggregate_groups()の結果を集計キー毎の表で表示する"""
+    for key, buckets in groups.items():
+        label = GROUP_LABELS.get(key) or f"ディレクトリ（深さ{key[5:]}）"
+        print(f"集計: {label}")
+        print(f"{'グループ':<40} {'総録音時間':<15} {'ファイル数':<10} {'総容量':<15}")
+        print("-" * 100)
+        for record in iter_group_records({key: buckets}):
+            print(f"{record['key']:<40} {record['duration']:<15} {record['files']:<10} {format_size(record['size']):<15}")
+
+def iter_recordings_at(catalog, top_dirs, display, at, exclude_pattern=None, only_666=False):
+    """指定した日時を含む録音をレコードとして返す"""
+    for filepath, start, end in catalog.recordings_at(list(top_dirs), at, exclude_pattern, only_666, display):
+        yield {'type': 'covering', 'path': filepath, 'start_time': start, 'end_time': end}
+
+def print_recordings_at(at, records):
+    """iter_recordings_at()のレコードを表示する"""
+    records = list(records)
+    print(f"{at.strftime(recording_catalog.TIME_FORMAT)} を含む録音: {len(records)}件")
+    for record in records:
+        print(f"  {record['path']} ({record['start_time']} 〜 {record['end_time']})")
+
+# ファイル毎のレコードに使うカタログの列（先頭の表示用のパスの後ろ）
+FILE_RECORD_COLUMNS = ['top', 'start_time', 'end_time', 'duration', 'duration_source', 'size', 'mtime_ns']
+
+def make_file_record(top_dirs, row):
+    """FILE_RECORD_COLUMNSで読んだカタログの行をファイル毎のレコードにする"""
+    filepath, top, start, end, duration, source, size, mtime_ns = row
+    return {
+        'type': 'file',
+        'directory': top_dirs[top],
+        'path': filepath,
+        'start_time': start,
+        'end_time': end,
+        'duration_seconds': duration,
+        'duration_source': source,
+        'size': size,
+        'last_update': format_datetime(mtime_ns / 1e9),
+    }
+
+class RecordWriter:
+    """
+    集計結果のレコードを1件ずつ書き出すクラス
+
+    ndjson と csv は1行1レコード、json は {"records": [...], "summary": {...}} の
+    1つのドキュメントを書き出す。いずれもレコードを溜めずに逐次出力するため、
+    大きなツリーでもメモリ使用量は増えない。ndjson は1行毎にフラッシュするため、
+    取り込み側は実行中から順に読み込める。
+    """
+
+    def __init__(self, fmt, stream=None):
+        self.fmt = fmt
+        self.stream = stream or sys.stdout
+        self.count = 0
+        if fmt == 'csv':
+            self.csv_writer = csv.DictWriter(self.stream, fieldnames=RECORD_FIELDS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+        elif fmt == 'json':
+            self.stream.write('{"records": [')
+
+    def write(self, record):
+        if self.fmt == 'ndjson':
+            self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.stream.flush()
+        elif self.fmt == 'csv':
+            self.csv_writer.writerow(record)
+        else:
+            self.stream.write((',\n' if self.count else '\n') + json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def close(self, summary):
+        """最後に集計全体のレコード（実行時間を含む）を書き出す"""
+        if self.fmt == 'json':
+            self.stream.write('\n],\n"summary": ' + json.dumps(summary, ensure_ascii=False) + '}\n')
+        else:
+            self.write(summary)
+        self.stream.flush()
+
+def calculate_recording_times(root_dir, verbose=False, check_filename=False, exclude_pattern=None, only_666=False, cache=None, walk_jobs=DEFAULT_WALK_JOBS, catalog=None, rebuild=False, probe_jobs=DEFAULT_PROBE_JOBS, emit=None):
     # ディレクトリごとの録音時間を格納する辞書
     dir_times = defaultdict(timedelta)
     file_count = defaultdict(int)
@@ -116,6 +721,18 @@ def calculate_recording_times(root_dir, verbose=False, check_filename=False, exc
     dir_last_update = defaultdict(float)  # ディレクトリごとの最終更新時刻
     warnings = []
     invalid_files = []
+    scan_stats = {'dirs': 0, 'rescanned': 0, 'entries': 0, 'parsed': 0, 'probed': 0, 'probe_errors': 0, 'seconds': 0.0}
+    
+    # emitを指定した場合はメッセージを溜めずに1件ずつ書き出す（大きなツリーでもメモリが増えない）
+    def warn(message):
+        if emit:
+            emit({'type': 'message', 'message': message})
+        else:
+            warnings.append(message)
+    
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = recording_catalog.RecordingCatalog(':memory:')
     
     # 指定ディレクトリの直下のディレクトリのみを対象とする
     try:
@@ -131,73 +748,121 @@ def calculate_recording_times(root_dir, verbose=False, check_filename=False, exc
                 dir_sizes[subdir] = 0
                 dir_last_update[subdir] = 0
         
+        root_abs = os.path.abspath(root_dir)
+        display = get_display(root_dir)
+        catalog.purge_missing_tops(root_abs, [os.path.join(root_abs, d) for d in subdirs])
+        
+        top_dirs = {}
         for subdir in subdirs:
             dir_path = os.path.join(root_dir, subdir)
             
             # ディレクトリが除外パターンに一致する場合はスキップ
             if exclude_pattern and should_exclude(dir_path, exclude_pattern):
                 if verbose:
-                    warnings.append(f"Info: 除外パターン '{exclude_pattern}' に一致するため、ディレクトリ '{dir_path}' をスキップしました")
+                    warn(f"Info: 除外パターン '{exclude_pattern}' に一致するため、ディレクトリ '{dir_path}' をスキップしました")
                 continue
+            top_dirs[os.path.join(root_abs, subdir)] = subdir
+        tops = list(top_dirs)
+        
+        # ファイル名から時間を取得できない集計対象のファイルは、走査と並行して音声ファイルを解析する
+        # （ファイル名チェックモードでは音声ファイルを読まない）
+        prober = None
+        on_unprobed = None
+        if not check_filename:
+            prober = DurationProber(cache, probe_jobs, show_progress=verbose or sys.stderr.isatty())
+            
+            def on_unprobed(top, path, name):
+                filepath = display[0] + path[display[1] - 1:]
+                if exclude_pattern and should_exclude(filepath, exclude_pattern):
+                    return
+                if only_666 and not is_valid_timestamp_format(name):
+                    return
+                prober.submit(top, path, filepath)
+        
+        # emitを指定した場合はファイル毎のレコードを走査・解析と並行して書き出す。長さが分かっているファイルは
+        # ディレクトリをカタログに反映した時点で、音声ファイルを解析するファイルは解析が終わった時点で書き出す
+        emit_files = None
+        on_directory = None
+        on_probed = None
+        if emit and not check_filename:
+            def emit_files(top, condition, params):
+                for row in catalog.list_recordings([top], FILE_RECORD_COLUMNS, exclude_pattern, only_666, display,
+                                                   condition=condition, condition_params=params):
+                    emit(make_file_record(top_dirs, row))
+            
+            def on_directory(top, path, include_subdirs):
+                where = 'dir = ?'
+                params = [path]
+                if include_subdirs:
+                    prefix = path.rstrip(os.sep) + os.sep
+                    where = '(dir = ? OR substr(dir, 1, ?) = ?)'
+                    params += [len(prefix), prefix]
+                emit_files(top, f"{where} AND duration_source NOT IN ('unprobed', 'failed')", params)
             
-            # 音声ファイルを検索
-            for root, _, files in os.walk(dir_path):
-                for file in files:
-                    if file.lower().endswith(('.wav', '.mp3')):
-                        filepath = os.path.join(root, file)
-                        
-                        # ファイルが除外パターンに一致する場合はスキップ
-                        if exclude_pattern and should_exclude(filepath, exclude_pattern):
-                            if verbose:
-                                warnings.append(f"Info: 除外パターン '{exclude_pattern}' に一致するため、ファイル '{filepath}' をスキップしました")
-                            continue
-                        
-                        # 666形式のチェック
-                        if only_666 and not is_valid_timestamp_format(file):
-                            if verbose:
-                                warnings.append(f"Info: 666形式でないため、ファイル '{filepath}' をスキップしました")
-                            continue
-                        
-                        # ファイル名の形式チェック
-                        if check_filename and not is_valid_timestamp_format(file):
-                            invalid_files.append(filepath)
-                            continue
-                        
-                        # ファイル名チェックモードの場合は、ffprobeを実行しない
-                        if check_filename:
-                            continue
-                        
-                        # ファイルサイズを加算
-                        dir_sizes[subdir] += get_file_size(filepath)
-                        
-                        # 最終更新時刻を更新
-                        mtime = get_file_mtime(filepath)
-                        if mtime > dir_last_update[subdir]:
-                            dir_last_update[subdir] = mtime
-                        
-                        start_time, end_time, warning = parse_filename(file)
-                        
-                        if warning:
-                            # ファイル名から時間を取得できない場合はffprobeで長さを取得
-                            duration = get_audio_duration(filepath)
-                            if duration:
-                                dir_times[subdir] += duration
-                                file_count[subdir] += 1
-                                if verbose:
-                                    warnings.append(f"Info: ファイル '{file}' の長さをffprobeで取得しました: {format_timedelta(duration)}")
-                            else:
-                                warnings.append(f"{warning} (場所: {filepath})")
-                            continue
-                        
-                        if start_time and end_time:
-                            # 録音時間を計算
-                            duration = end_time - start_time
-                            dir_times[subdir] += duration
-                            file_count[subdir] += 1
+            def on_probed(top, path):
+                emit_files(top, 'path = ?', [path])
+        
+        # カタログを差分更新
+        try:
+            walk_stats, scan_warnings = refresh_catalog(catalog, tops, walk_jobs, rebuild, on_unprobed, on_directory)
+            scan_stats.update(walk_stats)
+            for warning in scan_warnings:
+                warn(warning)
+        finally:
+            if prober is not None:
+                # 変更されていないディレクトリにある未解析のファイルと、前回失敗した後に変更されたファイルも解析する
+                for filepath, top, path, source, size, mtime_ns in catalog.list_recordings(
+                        tops, ['top', 'path', 'duration_source', 'size', 'mtime_ns'], exclude_pattern, only_666, display,
+                        condition="duration_source IN ('unprobed', 'failed')"):
+                    if source == 'failed' and not is_failed_file_changed(catalog, top, path, size, mtime_ns):
+                        if emit_files:
+                            emit_files(top, 'path = ?', [path])
+                        continue
+                    prober.submit(top, path, filepath)
+                scan_stats['probed'], scan_stats['probe_errors'] = prober.collect(catalog, on_probed)
+        
+        if verbose and exclude_pattern:
+            for (filepath,) in catalog.iter_recordings(tops, [], display=display,
+                                                       condition='instr(? || substr(path, ?), ?) > 0',
+                                                       condition_params=(display[0], display[1], exclude_pattern)):
+                warn(f"Info: 除外パターン '{exclude_pattern}' に一致するため、ファイル '{filepath}' をスキップしました")
+        
+        if only_666 and verbose:
+            for (filepath,) in catalog.iter_recordings(tops, [], exclude_pattern, display=display, condition='is_666 = 0'):
+                warn(f"Info: 666形式でないため、ファイル '{filepath}' をスキップしました")
+        
+        # ファイル名の形式チェック（ファイル名チェックモードの場合は集計しない）
+        if check_filename:
+            for (filepath,) in catalog.iter_recordings(tops, [], exclude_pattern, only_666, display, condition='is_666 = 0'):
+                if emit:
+                    emit({'type': 'invalid_file', 'path': filepath})
+                else:
+                    invalid_files.append(filepath)
+            return dir_times, file_count, dir_sizes, dir_last_update, warnings, invalid_files, scan_stats
+        
+        # ファイル名から時間を取得できなかったファイル
+        for filepath, name, duration, source, warning in catalog.iter_recordings(
+                tops, ['name', 'duration', 'duration_source', 'warning'], exclude_pattern, only_666, display,
+                condition="duration_source IN ('probe', 'failed')"):
+            if source == 'failed':
+                warn(f"{warning} (場所: {filepath})")
+            elif verbose:
+                warn(f"Info: ファイル '{name}' の長さを音声ファイルから取得しました: {format_timedelta(timedelta(seconds=duration))}")
+        
+        # ディレクトリ毎の集計はSQLで求める
+        for top, total_seconds, count, total_size, last_mtime_ns in catalog.totals_by_top(tops, exclude_pattern, only_666, display):
+            subdir = top_dirs[top]
+            dir_times[subdir] = timedelta(seconds=total_seconds)
+            file_count[subdir] = count
+            dir_sizes[subdir] = int(total_size)
+            dir_last_update[subdir] = (last_mtime_ns or 0) / 1e9
     except Exception as e:
-        warnings.append(f"Error: ディレクトリ '{root_dir}' の処理中にエラーが発生しました: {str(e)}")
+        warn(f"Error: ディレクトリ '{root_dir}' の処理中にエラーが発生しました: {str(e)}")
+    finally:
+        if own_catalog:
+            catalog.close()
     
-    return dir_times, file_count, dir_sizes, dir_last_update, warnings, invalid_files
+    return dir_times, file_count, dir_sizes, dir_last_update, warnings, invalid_files, scan_stats
 
 def format_timedelta(td):
     # timedeltaを時間:分:秒の形式に変換
@@ -217,6 +882,18 @@ def print_help():
   -c, --filename-check ファイル名が666形式（6桁の時刻が3つ）になっていないファイルを表示
   -e, --exclude       指定した文字列を含むファイルまたはディレクトリを除外（例: -e ORG）
   -o6, --only-666     666形式のファイルのみを対象とする
+  --cache-dir DIR     解析結果キャッシュの保存先（デフォルト: ~/.cache/sound_command）
+  --no-cache          解析結果キャッシュを使わない
+  --walk-jobs N       ディレクトリ走査のスレッド数（デフォルト: 16）
+  -j, --jobs N        ファイル名から時間を取得できないファイルを解析するスレッド数（デフォルト: 4）
+  --catalog PATH      録音カタログの保存先（デフォルト: ~/.cache/sound_command/recording_catalog.sqlite）
+  --no-catalog        録音カタログを保存せず、毎回全て走査する
+  --rebuild-catalog   録音カタログを作り直す（上書きされたファイルを反映する場合など）
+  -tl, --timeline     ディレクトリ毎に録音の空白と重複を表示
+  --gap-min SECONDS   --timelineで表示する空白の最短の長さ（デフォルト: 60秒）
+  --at DATETIME       指定した日時を含む録音を表示（例: --at 240512_030000）
+  -g, --group-by KEYS 日別・月別などで集計（day, month, hour, recorder, depthN をカンマ区切りで指定）
+  --format FORMAT     出力形式（text, json, csv, ndjson）
 
 使用例:
   python calculate_recording_times.py -v -d /path/to/directory
@@ -235,38 +912,113 @@ if __name__ == '__main__':
     parser.add_argument('-c', '--filename-check', action='store_true', help='ファイル名が666形式になっていないファイルを表示')
     parser.add_argument('-e', '--exclude', help='指定した文字列を含むファイルまたはディレクトリを除外')
     parser.add_argument('-o6', '--only-666', action='store_true', help='666形式のファイルのみを対象とする')
+    parser.add_argument('--cache-dir', help='解析結果キャッシュの保存先（デフォルト: ~/.cache/sound_command）')
+    parser.add_argument('--no-cache', action='store_true', help='解析結果キャッシュを使わない')
+    parser.add_argument('--walk-jobs', type=int, default=DEFAULT_WALK_JOBS, help=f'ディレクトリ走査のスレッド数（デフォルト: {DEFAULT_WALK_JOBS}）')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_PROBE_JOBS, help=f'ファイル名から時間を取得できないファイルを解析するスレッド数（デフォルト: {DEFAULT_PROBE_JOBS}）')
+    parser.add_argument('--catalog', help='録音カタログの保存先（デフォルト: ~/.cache/sound_command/recording_catalog.sqlite）')
+    parser.add_argument('--no-catalog', action='store_true', help='録音カタログを保存せず、毎回全て走査する')
+    parser.add_argument('--rebuild-catalog', action='store_true', help='録音カタログを作り直す')
+    parser.add_argument('-tl', '--timeline', action='store_true', help='ディレクトリ毎に録音の空白と重複を表示')
+    parser.add_argument('--gap-min', type=float, default=DEFAULT_GAP_MIN, help=f'--timelineで表示する空白の最短の長さ（秒、デフォルト: {DEFAULT_GAP_MIN:g}）')
+    parser.add_argument('--at', type=parse_datetime_argument, help='指定した日時を含む録音を表示（例: 240512_030000）')
+    parser.add_argument('-g', '--group-by', type=parse_group_keys, help='集計キーをカンマ区切りで指定（day, month, hour, recorder, depthN）。複数指定しても1回の走査で集計する')
+    parser.add_argument('--format', choices=['text', 'json', 'csv', 'ndjson'], default='text', help='出力形式（デフォルト: text）。text以外はファイル毎・ディレクトリ毎のレコードを逐次出力する')
     args = parser.parse_args()
 
     # helpオプションは自動的に処理されるため、明示的なチェックは不要
-    dir_times, file_count, dir_sizes, dir_last_update, warnings, invalid_files = calculate_recording_times(args.directory, args.verbose, args.filename_check, args.exclude, args.only_666)
-    
-    # 警告メッセージの表示
-    if warnings:
-        for warning in warnings:
-            print(warning)
-    
-    # ファイル名形式チェック結果の表示
-    if invalid_files:
-        for filepath in invalid_files:
-            print(filepath)
-    
-    # ファイル名チェックモードでない場合のみ、時間集計を表示
-    if not args.filename_check:
-        print(f"{'ディレクトリ名':<40} {'総録音時間':<15} {'ファイル数':<10} {'総容量':<15} {'最終更新':<20}")
-        print("-" * 100)
+    writer = RecordWriter(args.format) if args.format != 'text' else None
+    emit = writer.write if writer else None
+    cache = probe_cache.open_cache(args.cache_dir, enabled=not args.no_cache)
+    catalog = open_catalog(args.catalog, enabled=not args.no_catalog)
+    try:
+        dir_times, file_count, dir_sizes, dir_last_update, warnings, invalid_files, scan_stats = calculate_recording_times(args.directory, args.verbose, args.filename_check, args.exclude, args.only_666, cache, max(1, args.walk_jobs), catalog, args.rebuild_catalog, max(1, args.jobs), emit)
         
-        for dir_name in sorted(dir_times.keys()):
-            if not dir_name.startswith('.'):  # 隠しディレクトリを除外
-                print(f"{dir_name:<40} {format_timedelta(dir_times[dir_name]):<15} {file_count[dir_name]:<10} {format_size(dir_sizes[dir_name]):<15} {format_datetime(dir_last_update[dir_name]):<20}")
+        # 警告メッセージの表示
+        if warnings:
+            for warning in warnings:
+                print(warning)
         
-        # 合計を計算
-        total_time = sum(dir_times.values(), timedelta())
-        total_files = sum(file_count.values())
-        total_size = sum(dir_sizes.values())
-        print("-" * 100)
-        print(f"{'合計':<40} {format_timedelta(total_time):<15} {total_files:<10} {format_size(total_size):<15} {'':<20}")
+        # ファイル名形式チェック結果の表示
+        if invalid_files:
+            for filepath in invalid_files:
+                print(filepath)
+        
+        # ファイル名チェックモードでない場合のみ、時間集計を表示
+        if not args.filename_check:
+            if writer:
+                for dir_name in sorted(dir_times.keys()):
+                    if not dir_name.startswith('.'):  # 隠しディレクトリを除外
+                        writer.write({
+                            'type': 'directory',
+                            'directory': dir_name,
+                            'duration_seconds': dir_times[dir_name].total_seconds(),
+                            'duration': format_timedelta(dir_times[dir_name]),
+                            'files': file_count[dir_name],
+                            'size': dir_sizes[dir_name],
+                            'last_update': format_datetime(dir_last_update[dir_name]),
+                        })
+            else:
+                print(f"{'ディレクトリ名':<40} {'総録音時間':<15} {'ファイル数':<10} {'総容量':<15} {'最終更新':<20}")
+                print("-" * 100)
+                
+                for dir_name in sorted(dir_times.keys()):
+                    if not dir_name.startswith('.'):  # 隠しディレクトリを除外
+                        print(f"{dir_name:<40} {format_timedelta(dir_times[dir_name]):<15} {file_count[dir_name]:<10} {format_size(dir_sizes[dir_name]):<15} {format_datetime(dir_last_update[dir_name]):<20}")
+            
+            # 合計を計算
+            total_time = sum(dir_times.values(), timedelta())
+            total_files = sum(file_count.values())
+            total_size = sum(dir_sizes.values())
+            if not writer:
+                print("-" * 100)
+                print(f"{'合計':<40} {format_timedelta(total_time):<15} {total_files:<10} {format_size(total_size):<15} {'':<20}")
+        
+        # 集計キー毎の集計、タイムライン（空白と重複）と指定日時を含む録音の表示
+        if args.group_by or args.timeline or args.at:
+            top_dirs = get_top_dirs(args.directory, args.exclude)
+            display = get_display(args.directory)
+            if args.group_by and not args.filename_check:
+                groups = aggregate_groups(catalog, top_dirs, display, args.group_by, args.exclude, args.only_666)
+                if writer:
+                    for record in iter_group_records(groups):
+                        writer.write(record)
+                else:
+                    print_groups(groups)
+            if args.timeline:
+                records = iter_timeline(catalog, top_dirs, display, args.exclude, args.only_666, args.gap_min)
+                if writer:
+                    for record in records:
+                        writer.write(record)
+                else:
+                    print_timeline(records)
+            if args.at:
+                records = iter_recordings_at(catalog, top_dirs, display, args.at, args.exclude, args.only_666)
+                if writer:
+                    for record in records:
+                        writer.write(record)
+                else:
+                    print_recordings_at(args.at, records)
+    finally:
+        catalog.close()
+        if cache is not None:
+            cache.close()
     
     # 実行時間を表示
     end_time = time.time()
     execution_time = end_time - start_time
-    print(f"実行時間: {execution_time:.2f}秒") 
\ No newline at end of file
+    scan_rate = scan_stats['entries'] / scan_stats['seconds'] if scan_stats['seconds'] > 0 else 0
+    if writer:
+        summary = {'type': 'summary', 'execution_time': round(execution_time, 3)}
+        if not args.filename_check:
+            summary.update({
+                'duration_seconds': total_time.total_seconds(),
+                'duration': format_timedelta(total_time),
+                'files': total_files,
+                'size': total_size,
+            })
+        summary['scan'] = dict(scan_stats, files_per_second=round(scan_rate, 1))
+        writer.close(summary)
+    else:
+        print(f"実行時間: {execution_time:.2f}秒")
+        print(f"走査: {scan_stats['dirs']}ディレクトリ（再走査 {scan_stats['rescanned']}）, {scan_stats['entries']}エントリ ({scan_rate:.0f} files/s, {scan_stats['seconds']:.2f}秒), 解析 {scan_stats['parsed']}ファイル, 音声ファイル解析 {scan_stats['probed']}ファイル（失敗 {scan_stats['probe_errors']}）")
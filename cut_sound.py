@@ -4,7 +4,8 @@
 import argparse
 import subprocess
 import sys
-import json
+
+from utils import media_probe
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='音源の指定時刻から継続時間を指定して音源を切り取る')
@@ -43,26 +44,18 @@ def cut_audio(input_file, start_time, duration, output_file, verbose, debug):
         command.insert(2, 'error')
     
     if verbose:
-        # ffprobeを使用して音源情報をJSON形式で取得
-        command = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration:stream=codec_name,channels',
-            '-of', 'json',
-            input_file
-        ]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        # JSON出力をパース
-        info = json.loads(result.stdout)
+        # ヘッダから音源情報を取得（解析できない形式のみffprobeを使用）
+        info = media_probe.probe(input_file)
+        if info is None:
+            print(f"Error: 音源情報を取得できません: {input_file}")
+            sys.exit(1)
         
         # 整形して出力
         print("File information:")
         print(f"  File name: {input_file}")
-        print(f"  Duration: {info['format']['duration']} seconds")
-        for stream in info['streams']:
-            print(f"  Codec: {stream['codec_name']}")
-            print(f"  Channels: {stream['channels']}")
+        print(f"  Duration: {info['duration']} seconds")
+        print(f"  Codec: {info['codec']}")
+        print(f"  Channels: {info['channels']}")
         
         return  # ここで関数を終了
 
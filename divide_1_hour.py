@@ -8,14 +8,35 @@ __last_updated__ = '2025-07-09 15:05:48'
 import sys
 import os
 import re
+import signal
 import subprocess
+import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from utils import dir_watcher, media_probe, wav_file
+
 # ロギング設定
 LOG_DIR = "/var/data/sound-command"
 LOG_FILE = os.path.join(LOG_DIR, "divide_1_hour.log")
 
+# 666形式のファイル名パターン（その他情報は省略可能）
+FILENAME_666_PATTERN = r"(\d{6})_(\d{6})_(\d{6})(.*)\.(.*)"
+# 分割前の666形式ファイル（分割済みの _dN 付きファイルは含まない）
+ORIGINAL_666_PATTERN = r"\d{6}_\d{6}_\d{6}(?!_d\d+)(.*)\.(.*)"
+
+# ワーカー毎のログコンテキスト（処理中の入力ファイル名）
+log_context = threading.local()
+
+class LogContextFilter(logging.Filter):
+    """ログレコードに処理中の入力ファイル名を付与する"""
+    def filter(self, record):
+        record.context = getattr(log_context, 'name', '-')
+        return True
+
 def setup_logging():
     # ログディレクトリが存在しない場合は作成
     if not os.path.exists(LOG_DIR):
@@ -40,9 +61,11 @@ def setup_logging():
     console_handler.setLevel(logging.ERROR)  # エラーのみコンソールに表示
     
     # フォーマッタを設定
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(context)s] %(message)s')
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
+    file_handler.addFilter(LogContextFilter())
+    console_handler.addFilter(LogContextFilter())
     
     # ハンドラをロガーに追加
     logger.addHandler(file_handler)
@@ -51,32 +74,50 @@ def setup_logging():
     return logger
 
 def usage():
-    print("使用方法: python3 divide_1_hour.py [--debug|-d] [--dry-run|-dry] [--force|-f] [--check|-c] [--split-by-time|-t] [--separate-channel|-sc] [--help|-h] 入力ファイル")
+    print("使用方法: python3 divide_1_hour.py [--debug|-d] [--dry-run|-dry] [--force|-f] [--check|-c] [--split-by-time|-t] [--chunk-length|-l LEN] [--overlap-length LEN] [--separate-channel|-sc] [--use-ffmpeg|-ff] [--jobs|-j N] [--watch] [--help|-h] 入力ファイル|ディレクトリ ...")
     print("  -S, --split-by-hour: 時刻を毎時0分0秒に分割する（デフォルト・省略可）")
     print("  -t, --split-by-time: 先頭から1時間毎に分割する")
+    print("  -l, --chunk-length LEN: 分割長（例: 5m, 10m, 30m, 2h。デフォルト: 1h）。-Sでは0時0分0秒からLENの倍数の時刻で分割する")
+    print("      --overlap-length LEN: 各チャンクの終わりを次のチャンクにLENだけ重ねる（例: 10s。デフォルト: 0）")
     print("  -sc, --separate-channel: 音源をチャンネル毎に分割する（デフォルトはモノラル化）")
     print("  -d, --debug: デバッグモード")
     print("  -dry, --dry-run: 実際にファイルを生成せず、何が行われるかを表示するだけのモード")
     print("  -f, --force: 既存のファイルを強制的に上書きする（デフォルトはスキップ）")
     print("  -c, --check: 生成されたファイルの時間が666形式と一致するか検証する")
+    print("  -ff, --use-ffmpeg: PCM WAVでも内蔵の分割処理を使わずffmpegで分割する")
+    print("  -j, --jobs N: 複数の入力ファイルをN並列で処理する（デフォルト: 1）")
+    print("      --watch: 指定したディレクトリを監視し、届いた録音を順次分割する")
+    print("      --settle-time SEC: ファイルサイズがSEC秒変化しなくなったら転送完了とみなす（デフォルト: 30）")
+    print("      --poll-interval SEC: inotifyが使えない環境でのディレクトリ走査間隔（デフォルト: 5）")
     print("  -h, --help: ヘルプ")
-    print("入力ファイルは666形式のみ受け付けます。")
+    print("入力ファイルは666形式のみ受け付けます。複数のファイルやディレクトリも指定できます。")
     print("注意: デフォルトでは毎時0分0秒に分割する(-S)モードが適用されるため、-Sオプションは省略可能です。")
     sys.exit(1)
 
+# ffmpegの有無（最初にffmpegで分割するときに1回だけ確認する）
+ffmpeg_available = None
+ffmpeg_lock = threading.Lock()
+
 def check_ffmpeg():
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        subprocess.run(["ffprobe", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except FileNotFoundError:
-        logger.error("ffmpeg/ffprobeがインストールされていません。インストールしてください。")
-        print("エラー: ffmpeg/ffprobeがインストールされていません。インストールしてください。")
-        sys.exit(1)
+    """ffmpegがインストールされているか確認する
+
+    ネイティブ分割（PCM WAV/RF64）はffmpegを使わないため、ffmpegで分割するファイルが
+    現れたときに初めて確認する。結果は覚えておき、プロセスの起動は1回だけにする。
+    ffprobeはヘッダから解析できない形式でのみmedia_probeが使い、なければ解析失敗として扱う。
+    """
+    global ffmpeg_available
+    with ffmpeg_lock:
+        if ffmpeg_available is None:
+            try:
+                subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                ffmpeg_available = True
+            except FileNotFoundError:
+                logger.error("ffmpegがインストールされていません。インストールしてください。")
+                ffmpeg_available = False
+    return ffmpeg_available
 
 def parse_666_filename(filename):
-    # 修正済みの正規表現パターン: その他情報は省略可能
-    pattern = r"(\d{6})_(\d{6})_(\d{6})(.*)\.(.*)"
-    match = re.match(pattern, filename)
+    match = re.match(FILENAME_666_PATTERN, filename)
     if not match:
         logger.error(f"入力ファイル '{filename}' は666形式ではありません。")
         print(f"エラー: 入力ファイル '{filename}' は666形式ではありません。")
@@ -95,22 +136,17 @@ def parse_666_filename(filename):
     return start_datetime, end_datetime, other, ext
 
 def get_audio_duration(filepath):
-    """ffprobeを使って音声ファイルの長さを秒単位で取得"""
-    try:
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', filepath]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            return duration
-        else:
-            logger.error(f"ファイル '{filepath}' の長さ取得に失敗しました: {result.stderr}")
-            return None
-    except Exception as e:
-        logger.error(f"ファイル '{filepath}' の長さ取得に失敗しました: {str(e)}")
-        return None
+    """音声ファイルの長さを秒単位で取得（ヘッダを解析できない形式のみffprobeを使う）"""
+    duration = media_probe.get_duration(filepath)
+    if duration is None:
+        logger.error(f"ファイル '{filepath}' の長さ取得に失敗しました")
+    return duration
 
 def check_file_duration(filepath, expected_duration, tolerance=1.0):
-    """ファイルの実際の長さと期待される長さを比較"""
+    """ファイルの実際の長さと期待される長さを比較
+
+    WAV/AIFF/FLAC/MP3はヘッダから長さを求め、解析できない形式のみffprobeを使う。
+    """
     actual_duration = get_audio_duration(filepath)
     if actual_duration is None:
         return False, None
@@ -121,158 +157,410 @@ def check_file_duration(filepath, expected_duration, tolerance=1.0):
     
     return is_valid, actual_duration
 
-def get_audio_channels(input_file):
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "a:0",
-        "-show_entries", "stream=channels",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        input_file
-    ]
-    try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        channels = int(result.stdout.strip())
-        return channels
-    except Exception as e:
-        logger.error(f"音声チャンネル数の取得に失敗しました: {e}")
-        print(f"エラー: 音声チャンネル数の取得に失敗しました: {e}")
-        return 1  # デフォルトは1チャンネルとして扱う
-
-def divide_file(input_file, start_time, duration, output_file, separate_channels=False, force=False, check=False):
-    # 出力ファイルが存在し、かつforce=Falseの場合はスキップ
-    if os.path.exists(output_file) and not force:
-        logger.info(f"skipped: {output_file}")
-        print(f"skipped: {output_file}")
-        return False
-    
-    if not separate_channels:
-        cmd = [
-            "ffmpeg",
-            "-i", input_file,
-            "-ss", start_time,
-            "-t", duration,
+def log_duration_check(filepath, expected_duration, actual_duration=None, tolerance=1.0):
+    """ファイルの長さを検証し、結果をログに記録する
+
+    actual_durationが既に分かっている場合（ネイティブ分割）はffprobeを実行しない。
+    """
+    if actual_duration is None:
+        is_valid, actual_duration = check_file_duration(filepath, expected_duration, tolerance)
+    else:
+        is_valid = abs(actual_duration - expected_duration) <= tolerance
+
+    if is_valid:
+        logger.info(f"duration check passed: {filepath}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s")
+    elif actual_duration is not None:
+        logger.warning(f"duration check failed: {filepath}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s, difference: {abs(expected_duration - actual_duration):.3f}s")
+    else:
+        logger.warning(f"duration check failed: {filepath}, expected: {expected_duration:.3f}s, actual: unknown")
+
+    return is_valid
+
+def parse_time_length(value):
+    """'10m', '30s', '1h', '90' のような長さ指定をtimedeltaに変換する（単位省略時は秒）"""
+    match = re.match(r"^(\d+(?:\.\d+)?)([hms]?)$", value.strip().lower())
+    if not match:
+        raise ValueError(f"長さの形式が不正です: {value}")
+    number, unit = match.groups()
+    return timedelta(seconds=float(number) * {'h': 3600, 'm': 60, 's': 1, '': 1}[unit])
+
+def next_boundary(current_time, chunk_length, mode="-S"):
+    """次の分割位置を返す
+
+    -Sモードでは0時0分0秒からchunk_lengthの倍数の時刻（例: 10分なら毎時00,10,20...分）、
+    -tモードでは現在位置からchunk_length後を返す。
+    """
+    if mode == "-S":
+        day_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day_start + ((current_time - day_start) // chunk_length + 1) * chunk_length
+    return current_time + chunk_length  # mode == "-t"
+
+def plan_chunks(start_datetime, end_datetime, other, ext, mode="-S", chunk_length=timedelta(hours=1), overlap=timedelta(0)):
+    """分割位置をすべて事前に計算する
+
+    戻り値は (出力ファイル名, 開始秒, 長さ秒) のリスト。
+    出力ファイル名と_dN番号の付け方は従来と同じ。overlapを指定すると
+    各チャンクの終わりを次のチャンクにその分だけ重ねる（録音終了時刻を超えない）。
+    """
+    chunks = []
+    current_time = start_datetime
+    chunk_number = 1
+
+    while current_time < end_datetime:
+        next_time = min(next_boundary(current_time, chunk_length, mode), end_datetime)
+        chunk_end = min(next_time + overlap, end_datetime)
+
+        output_file = f"{current_time.strftime('%y%m%d_%H%M%S')}_{chunk_end.strftime('%H%M%S')}_d{chunk_number}{other}.{ext}"
+
+        start_time = (current_time - start_datetime).total_seconds()
+        duration = (chunk_end - current_time).total_seconds()
+        chunks.append((output_file, start_time, duration))
+
+        current_time = next_time
+        chunk_number += 1
+
+    return chunks
+
+def build_segment_command(input_file, chunks):
+    """1回のffmpeg起動で全チャンクを書き出すコマンドを組み立てる
+
+    入力は一度だけ開いてデマックスし、出力ごとに -ss/-t を指定する。
+    """
+    cmd = ["ffmpeg", "-i", input_file]
+    for output_file, start_time, duration in chunks:
+        cmd += [
+            "-ss", f"{start_time:.3f}",
+            "-t", f"{duration:.3f}",
             "-c", "copy",
             "-y",
             output_file
         ]
-        if debug_mode:
-            logger.debug(f"cmd: {cmd}")
-        
+    return cmd
+
+def get_temp_output(output_file):
+    """書き込み中に使う一時ファイル名を返す（例: .xxx_d1.part.wav）"""
+    dir_name, file_name = os.path.split(output_file)
+    base_name, ext = os.path.splitext(file_name)
+    return os.path.join(dir_name, f".{base_name}.part{ext}")
+
+def remove_temp_outputs(output_files):
+    """途中まで書き込まれた一時ファイルを削除する"""
+    for output_file in output_files:
+        temp_file = get_temp_output(output_file)
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def get_manifest_path(input_file):
+    """入力ファイルに対応するマニフェストのパスを返す（出力と同じカレントディレクトリ）"""
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    return f"{base_name}.manifest.json"
+
+def load_manifest(input_file):
+    """マニフェストを読み込む
+
+    存在しない場合や、入力ファイルのサイズ・更新時刻が前回と異なる場合は新しく作成する。
+    入力ファイルが変更されていた場合は input_changed をTrueにし、既存の出力を作り直させる。
+    """
+    manifest_path = get_manifest_path(input_file)
+    stat = os.stat(input_file)
+    manifest = {
+        'input': os.path.abspath(input_file),
+        'input_size': stat.st_size,
+        'input_mtime_ns': stat.st_mtime_ns,
+        'chunks': {},
+    }
+    input_changed = False
+    if os.path.exists(manifest_path):
         try:
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            logger.info(f"created: {output_file}")
-            
-            # チェックモードが有効の場合、ファイルの長さを検証
-            if check:
-                # 期待される時間（秒）
-                expected_duration = float(duration)
-                is_valid, actual_duration = check_file_duration(output_file, expected_duration)
-                
-                if is_valid:
-                    logger.info(f"duration check passed: {output_file}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s")
-                else:
-                    if actual_duration is not None:
-                        logger.warning(f"duration check failed: {output_file}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s, difference: {abs(expected_duration - actual_duration):.3f}s")
-                    else:
-                        logger.warning(f"duration check failed: {output_file}, expected: {expected_duration:.3f}s, actual: unknown")
-            
-            return True
-        except Exception as e:
-            logger.error(f"ファイル '{output_file}' の作成に失敗しました: {str(e)}")
-            print(f"エラー: ファイル '{output_file}' の作成に失敗しました: {str(e)}")
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('input_size') == stat.st_size and saved.get('input_mtime_ns') == stat.st_mtime_ns:
+                manifest['chunks'] = saved.get('chunks', {})
+            else:
+                logger.info(f"入力ファイルが変更されているためマニフェストを作り直します: {manifest_path}")
+                input_changed = True
+        except (OSError, ValueError) as e:
+            logger.warning(f"マニフェスト '{manifest_path}' の読み込みに失敗しました: {str(e)}")
+    manifest['path'] = manifest_path
+    manifest['input_changed'] = input_changed
+    return manifest
+
+def save_manifest(manifest):
+    """マニフェストを一時ファイル経由でアトミックに保存する"""
+    if manifest is None:
+        return
+    manifest_path = manifest['path']
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({k: v for k, v in manifest.items() if k not in ('path', 'input_changed')}, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, manifest_path)
+
+def register_chunk(manifest, output_file, start_time, duration):
+    """これから作成するチャンクをマニフェストに記録する"""
+    if manifest is None:
+        return
+    manifest['chunks'][output_file] = {
+        'start': start_time,
+        'duration': duration,
+        'status': 'pending',
+        'size': None,
+    }
+
+def should_skip_chunk(output_file, manifest, force=False):
+    """チャンクを作成済みとしてスキップするか判定する
+
+    マニフェストで完了済みかつサイズが一致するファイルのみスキップする。
+    マニフェストに記録のない既存ファイル（マニフェスト導入前の出力）は従来通りスキップする。
+    ただし入力ファイルが変更されてマニフェストを作り直した場合は、古い入力から作った出力とみなして作り直す。
+    """
+    if force or not os.path.exists(output_file):
+        return False
+    if manifest is None:
+        return True
+    entry = manifest['chunks'].get(output_file)
+    if entry is None:
+        if manifest['input_changed']:
+            logger.warning(f"入力ファイルが変更されているため作り直します: {output_file}")
             return False
+        return True
+    if entry['status'] == 'done' and entry['size'] == os.path.getsize(output_file):
+        return True
+    logger.warning(f"未完了のファイルを作り直します: {output_file}")
+    return False
+
+def commit_temp_output(output_file, manifest):
+    """一時ファイルを出力ファイル名にリネームし、マニフェストに完了を記録する"""
+    temp_file = get_temp_output(output_file)
+    if not os.path.exists(temp_file):
+        return False
+    os.replace(temp_file, output_file)
+    if manifest is not None:
+        entry = manifest['chunks'].setdefault(output_file, {})
+        entry['status'] = 'done'
+        entry['size'] = os.path.getsize(output_file)
+        save_manifest(manifest)
+    return True
+
+def new_result():
+    """分割結果の件数を集計する辞書を返す"""
+    return {'created': 0, 'skipped': 0, 'failed': 0, 'check_time': 0.0}
+
+def divide_file_single_pass(input_file, chunks, force=False, check=False, manifest=None):
+    """全チャンクを1回のデマックスでまとめて分割する
+
+    完了済みのファイルはforce=Falseの場合スキップする。作成・スキップ・失敗の件数を返す。
+    """
+    result = new_result()
+    targets = []
+    for output_file, start_time, duration in chunks:
+        if should_skip_chunk(output_file, manifest, force):
+            logger.info(f"skipped: {output_file}")
+            print(f"skipped: {output_file}")
+            result['skipped'] += 1
+            continue
+        register_chunk(manifest, output_file, start_time, duration)
+        targets.append((output_file, start_time, duration))
+
+    if not targets:
+        return result
+    save_manifest(manifest)
+
+    cmd = build_segment_command(input_file, [(get_temp_output(o), st, d) for o, st, d in targets])
+    if debug_mode:
+        logger.debug(f"cmd: {cmd}")
+
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        logger.error(f"ファイル '{input_file}' の分割に失敗しました: {str(e)}")
+        print(f"エラー: ファイル '{input_file}' の分割に失敗しました: {str(e)}")
+        remove_temp_outputs(output_file for output_file, _, _ in targets)
+        result['failed'] += len(targets)
+        return result
+
+    for output_file, start_time, duration in targets:
+        if not commit_temp_output(output_file, manifest):
+            logger.error(f"ファイル '{output_file}' の作成に失敗しました")
+            print(f"エラー: ファイル '{output_file}' の作成に失敗しました")
+            result['failed'] += 1
+            continue
+        logger.info(f"created: {output_file}")
+        print(f"created: {output_file}")
+        result['created'] += 1
+
+        # チェックモードが有効の場合、ファイルの長さを検証
+        if check:
+            check_start = time.time()
+            log_duration_check(output_file, duration)
+            result['check_time'] += time.time() - check_start
+
+    return result
+
+def get_audio_channel_info(input_file):
+    """チャンネル数とチャンネルレイアウトを取得（ヘッダから分からないレイアウトはNone）"""
+    info = media_probe.probe(input_file)
+    if info is None or not info['channels']:
+        logger.error(f"音声チャンネル数の取得に失敗しました: {input_file}")
+        print(f"エラー: 音声チャンネル数の取得に失敗しました: {input_file}")
+        return 1, None  # デフォルトは1チャンネルとして扱う
+    return info['channels'], info.get('channel_layout')
+
+def get_audio_channels(input_file):
+    channels, _ = get_audio_channel_info(input_file)
+    return channels
+
+def get_channel_output(output_file, ch):
+    """チャンネル別の出力ファイル名を返す（例: xxx_d1-ch-2.wav）"""
+    base_name, ext = os.path.splitext(output_file)
+    return f"{base_name}-ch-{ch}{ext}"
+
+def build_channel_split_command(input_file, targets, channels, layout=None):
+    """1回のデコードで全チャンク・全チャンネルを書き出すコマンドを組み立てる
+
+    targets は (チャンネル番号, 出力ファイル名, 開始秒, 長さ秒) のリスト。
+    チャンネルレイアウトが分かる場合はchannelsplit、分からない場合はpanで
+    チャンネルを取り出し、asplitでチャンク数だけ複製してatrimで切り出す。
+    """
+    filters = []
+    channel_labels = [f"c{ch}" for ch in range(1, channels + 1)]
+    if layout:
+        filters.append(f"[0:a:0]channelsplit=channel_layout={layout}" + "".join(f"[{label}]" for label in channel_labels))
     else:
-        # チャンネル数を取得
-        channels = get_audio_channels(input_file)
-        if debug_mode:
-            logger.debug(f"チャンネル数: {channels}")
-        
-        # チャンネルが1つの場合は通常の処理
-        if channels == 1:
-            cmd = [
-                "ffmpeg",
-                "-i", input_file,
-                "-ss", start_time,
-                "-t", duration,
-                "-c", "copy",
-                "-y",
-                output_file
-            ]
+        filters.append(f"[0:a:0]asplit={channels}" + "".join(f"[s{ch}]" for ch in range(1, channels + 1)))
+        for ch in range(1, channels + 1):
+            filters.append(f"[s{ch}]pan=mono|c0=c{ch - 1}[c{ch}]")
+
+    outputs = []
+    for ch in range(1, channels + 1):
+        ch_targets = [t for t in targets if t[0] == ch]
+        if not ch_targets:
+            # 出力しないチャンネルは捨てる
+            filters.append(f"[c{ch}]anullsink")
+            continue
+        filters.append(f"[c{ch}]asplit={len(ch_targets)}" + "".join(f"[c{ch}_{n}]" for n in range(1, len(ch_targets) + 1)))
+        for n, (_, ch_output, start_time, duration) in enumerate(ch_targets, 1):
+            filters.append(f"[c{ch}_{n}]atrim=start={start_time:.3f}:duration={duration:.3f},asetpts=PTS-STARTPTS[o{ch}_{n}]")
+            outputs += ["-map", f"[o{ch}_{n}]", "-y", ch_output]
+
+    return ["ffmpeg", "-i", input_file, "-filter_complex", ";".join(filters)] + outputs
+
+def divide_file_by_channel(input_file, chunks, channels, layout=None, force=False, check=False, manifest=None):
+    """全チャンクを1回のデコードでチャンネル毎に分割する
+
+    完了済みのファイルはforce=Falseの場合スキップする。作成・スキップ・失敗の件数を返す。
+    """
+    result = new_result()
+    targets = []
+    for output_file, start_time, duration in chunks:
+        for ch in range(1, channels + 1):
+            ch_output = get_channel_output(output_file, ch)
+            # チャンネル別ファイルが完了済みの場合はスキップ
+            if should_skip_chunk(ch_output, manifest, force):
+                logger.info(f"skipped: {ch_output}")
+                print(f"skipped: {ch_output}")
+                result['skipped'] += 1
+                continue
+            register_chunk(manifest, ch_output, start_time, duration)
+            targets.append((ch, ch_output, start_time, duration))
+
+    if not targets:
+        return result
+    save_manifest(manifest)
+
+    cmd = build_channel_split_command(input_file, [(ch, get_temp_output(o), st, d) for ch, o, st, d in targets], channels, layout)
+    if debug_mode:
+        logger.debug(f"cmd: {cmd}")
+
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        logger.error(f"ファイル '{input_file}' のチャンネル分割に失敗しました: {str(e)}")
+        print(f"エラー: ファイル '{input_file}' のチャンネル分割に失敗しました: {str(e)}")
+        remove_temp_outputs(ch_output for _, ch_output, _, _ in targets)
+        result['failed'] += len(targets)
+        return result
+
+    for ch, ch_output, start_time, duration in targets:
+        if not commit_temp_output(ch_output, manifest):
+            logger.error(f"ファイル '{ch_output}' の作成に失敗しました")
+            print(f"エラー: ファイル '{ch_output}' の作成に失敗しました")
+            result['failed'] += 1
+            continue
+        logger.info(f"created: {ch_output}")
+        print(f"created: {ch_output}")
+        result['created'] += 1
+
+        # チェックモードが有効の場合、ファイルの長さを検証
+        if check:
+            check_start = time.time()
+            log_duration_check(ch_output, duration)
+            result['check_time'] += time.time() - check_start
+
+    return result
+
+def get_native_wav_header(input_file):
+    """ネイティブ分割できるPCM WAV/RF64であればヘッダを返す（それ以外はNone）"""
+    if not input_file.lower().endswith('.wav'):
+        return None
+    header = wav_file.read_wav_header(input_file)
+    if not wav_file.is_pcm(header):
+        return None
+    return header
+
+def divide_file_native(input_file, header, chunks, separate_channels=False, force=False, check=False, manifest=None):
+    """PCM WAVをffmpegを使わずにサンプル単位で分割する
+
+    入力をメモリマップし、fmtチャンクから各チャンクのバイト位置を計算して
+    データ区間を新しいヘッダ付きでそのままコピーする。作成・スキップ・失敗の件数を返す。
+    出力は一時ファイルに書き込み、完了後にリネームする。
+    """
+    channels = header['channels'] if separate_channels else 1
+    result = new_result()
+    targets = []
+    for output_file, start_time, duration in chunks:
+        for ch in range(1, channels + 1):
+            target_file = get_channel_output(output_file, ch) if channels > 1 else output_file
+            if should_skip_chunk(target_file, manifest, force):
+                logger.info(f"skipped: {target_file}")
+                print(f"skipped: {target_file}")
+                result['skipped'] += 1
+                continue
+            register_chunk(manifest, target_file, start_time, duration)
+            targets.append((ch, target_file, start_time, duration))
+
+    if not targets:
+        return result
+    save_manifest(manifest)
+
+    source = wav_file.open_wav_mmap(input_file)
+    try:
+        for ch, target_file, start_time, duration in targets:
+            start_frame, end_frame = wav_file.frame_range(header, start_time, duration)
             if debug_mode:
-                logger.debug(f"cmd: {cmd}")
-            
+                logger.debug(f"native: {target_file}, frames: {start_frame}-{end_frame}, channel: {ch if channels > 1 else 'all'}")
             try:
-                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                logger.info(f"created: {output_file}")
-                
-                # チェックモードが有効の場合、ファイルの長さを検証
-                if check:
-                    expected_duration = float(duration)
-                    is_valid, actual_duration = check_file_duration(output_file, expected_duration)
-                    
-                    if is_valid:
-                        logger.info(f"duration check passed: {output_file}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s")
-                    else:
-                        if actual_duration is not None:
-                            logger.warning(f"duration check failed: {output_file}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s, difference: {abs(expected_duration - actual_duration):.3f}s")
-                        else:
-                            logger.warning(f"duration check failed: {output_file}, expected: {expected_duration:.3f}s, actual: unknown")
-                
-                return True
+                frames = wav_file.write_wav_segment(source, header, get_temp_output(target_file), start_frame, end_frame,
+                                                    channel=ch - 1 if channels > 1 else None)
+                commit_temp_output(target_file, manifest)
             except Exception as e:
-                logger.error(f"ファイル '{output_file}' の作成に失敗しました: {str(e)}")
-                print(f"エラー: ファイル '{output_file}' の作成に失敗しました: {str(e)}")
-                return False
-        else:
-            # 複数チャンネルの場合、各チャンネルごとに分割
-            base_name, ext = os.path.splitext(output_file)
-            any_created = False
-            for ch in range(1, channels + 1):
-                ch_output = f"{base_name}-ch-{ch}{ext}"
-                # チャンネル別ファイルが存在する場合はスキップ
-                if os.path.exists(ch_output) and not force:
-                    logger.info(f"skipped: {ch_output}")
-                    print(f"skipped: {ch_output}")
-                    continue
-                
-                cmd = [
-                    "ffmpeg",
-                    "-i", input_file,
-                    "-ss", start_time,
-                    "-t", duration,
-                    "-map_channel", f"0.0.{ch-1}",
-                    "-ac", "1",
-                    "-y",
-                    ch_output
-                ]
-                if debug_mode:
-                    logger.debug(f"cmd: {cmd}")
-                
-                try:
-                    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    logger.info(f"created: {ch_output}")
-                    print(f"created: {ch_output}")
-                    
-                    # チェックモードが有効の場合、ファイルの長さを検証
-                    if check:
-                        expected_duration = float(duration)
-                        is_valid, actual_duration = check_file_duration(ch_output, expected_duration)
-                        
-                        if is_valid:
-                            logger.info(f"duration check passed: {ch_output}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s")
-                        else:
-                            if actual_duration is not None:
-                                logger.warning(f"duration check failed: {ch_output}, expected: {expected_duration:.3f}s, actual: {actual_duration:.3f}s, difference: {abs(expected_duration - actual_duration):.3f}s")
-                            else:
-                                logger.warning(f"duration check failed: {ch_output}, expected: {expected_duration:.3f}s, actual: unknown")
-                    
-                    any_created = True
-                except Exception as e:
-                    logger.error(f"ファイル '{ch_output}' の作成に失敗しました: {str(e)}")
-                    print(f"エラー: ファイル '{ch_output}' の作成に失敗しました: {str(e)}")
-            
-            return any_created
+                logger.error(f"ファイル '{target_file}' の作成に失敗しました: {str(e)}")
+                print(f"エラー: ファイル '{target_file}' の作成に失敗しました: {str(e)}")
+                remove_temp_outputs([target_file])
+                result['failed'] += 1
+                continue
+            logger.info(f"created: {target_file}")
+            print(f"created: {target_file}")
+            result['created'] += 1
+
+            # チェックモードが有効の場合、書き出したサンプル数から長さを検証
+            if check:
+                check_start = time.time()
+                log_duration_check(target_file, duration, frames / header['sample_rate'])
+                result['check_time'] += time.time() - check_start
+    finally:
+        source.close()
+
+    return result
 
 def is_option(arg):
     """引数がオプションかどうかを判定する"""
@@ -282,6 +570,233 @@ def is_audio_file(filename):
     """ファイルが音声ファイルかどうかを判定する"""
     return filename.lower().endswith(('.wav', '.mp3', '.aiff', '.flac', '.ogg'))
 
+def collect_input_files(paths):
+    """入力パスを展開して処理対象のファイル一覧を返す
+
+    ディレクトリが指定された場合は直下の666形式の音声ファイルを対象とする。
+    分割済みのファイル（_dN付き）は再分割しないよう除外する。
+    """
+    input_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if not entry.is_file() or not is_audio_file(entry.name):
+                        continue
+                    if not re.match(ORIGINAL_666_PATTERN, entry.name):
+                        logger.info(f"666形式でないため対象外: {entry.path}")
+                        continue
+                    input_files.append(entry.path)
+        else:
+            input_files.append(path)
+    return input_files
+
+def process_file(input_file, options):
+    """1つの入力ファイルを分割し、ファイル毎の集計結果を返す"""
+    log_context.name = os.path.basename(input_file)
+    start = time.time()
+    summary = {'file': input_file, **new_result()}
+
+    try:
+        summary.update(divide_input_file(input_file, options))
+    except Exception as e:
+        logger.error(f"入力ファイル '{input_file}' の処理に失敗しました: {str(e)}")
+        print(f"エラー: 入力ファイル '{input_file}' の処理に失敗しました: {str(e)}")
+        summary['failed'] += 1
+
+    summary['elapsed'] = time.time() - start
+    logger.info(f"summary: created: {summary['created']}, skipped: {summary['skipped']}, failed: {summary['failed']}, elapsed: {summary['elapsed']:.2f}s")
+    if options['check']:
+        logger.info(f"verification time: {summary['check_time']:.3f}s")
+    log_context.name = "-"
+    return summary
+
+def divide_input_file(input_file, options):
+    """1つの入力ファイルの分割位置を決め、選択されたエンジンで分割する"""
+    mode = options['mode']
+    dry_run = options['dry_run']
+    force = options['force']
+    check_mode = options['check']
+    separate_channels = options['separate_channels']
+    use_ffmpeg = options['use_ffmpeg']
+
+    if not debug_mode and not dry_run and not os.path.exists(input_file):
+        logger.error(f"入力ファイル '{input_file}' が見つかりません。")
+        print(f"エラー: 入力ファイル '{input_file}' が見つかりません。")
+        return {'failed': 1}
+    
+    file_body_with_ext = os.path.basename(input_file)
+    if debug_mode:
+        logger.debug(f"file_body_with_ext: {file_body_with_ext}")
+    
+    if not re.match(FILENAME_666_PATTERN, file_body_with_ext):
+        logger.error(f"入力ファイル '{input_file}' は666形式ではありません。")
+        print(f"エラー: 入力ファイル '{input_file}' は666形式ではありません。")
+        print("入力ファイルは666形式（YYMMDD_HHMMSS_HHMMSS）である必要があります。")
+        return {'failed': 1}
+    start_datetime, end_datetime, other, ext = parse_666_filename(file_body_with_ext)
+    
+    if debug_mode:
+        logger.debug(f"デバッグ情報:")
+        logger.debug(f"  開始日時: {start_datetime}")
+        logger.debug(f"  終了日時: {end_datetime}")
+        logger.debug(f"  その他情報: {other}")
+        logger.debug(f"  拡張子: {ext}")
+        logger.debug(f"  入力ファイル: {input_file}")
+        logger.debug(f"  モード: {mode}")
+        logger.debug(f"  チャンネル分割: {separate_channels}")
+        logger.debug(f"  ドライラン: {dry_run}")
+        logger.debug(f"  強制上書き: {force}")
+        logger.debug(f"  チェックモード: {check_mode}")
+        logger.debug(f"  ffmpeg強制: {use_ffmpeg}")
+        logger.debug(f"  分割長: {options['chunk_length']}")
+        logger.debug(f"  オーバーラップ: {options['overlap']}")
+    
+    chunks = plan_chunks(start_datetime, end_datetime, other, ext, mode, options['chunk_length'], options['overlap'])
+    if debug_mode:
+        for output_file, start_time, duration in chunks:
+            logger.debug(f"chunk: {output_file}, start: {start_time:.3f}s, duration: {duration:.3f}s")
+    
+    result = new_result()
+    if dry_run:
+        for output_file, start_time, duration in chunks:
+            file_exists = os.path.exists(output_file)
+            if not separate_channels:
+                if file_exists and not force:
+                    logger.info(f"dry-run: skipped: {output_file}")
+                    print(f"dry-run: skipped: {output_file}")
+                else:
+                    logger.info(f"dry-run: {output_file}")
+                    print(f"dry-run: {output_file}")
+            else:
+                channels = 2  # ドライランモードでは仮に2チャンネルとして表示
+                for ch in range(1, channels + 1):
+                    ch_output = get_channel_output(output_file, ch)
+                    file_exists = os.path.exists(ch_output)
+                    if file_exists and not force:
+                        logger.info(f"dry-run: skipped: {ch_output}")
+                        print(f"dry-run: skipped: {ch_output}")
+                    else:
+                        logger.info(f"dry-run: {ch_output}")
+                        print(f"dry-run: {ch_output}")
+    elif not debug_mode:
+        # 再実行時は未完了のチャンクだけを作成する
+        manifest = load_manifest(input_file)
+        native_header = None if use_ffmpeg else get_native_wav_header(input_file)
+        if native_header:
+            # PCM WAVはffmpegを使わずにサンプル単位で分割する
+            result = divide_file_native(input_file, native_header, chunks, separate_channels, force, check_mode, manifest)
+        else:
+            if not check_ffmpeg():
+                print(f"エラー: ffmpegがインストールされていないため '{input_file}' を分割できません。")
+                return {'failed': 1}
+            channels, layout = 1, None
+            if separate_channels:
+                # チャンネル数は入力ファイル毎に1回だけ取得する
+                channels, layout = get_audio_channel_info(input_file)
+            
+            if channels == 1:
+                # 全チャンクを1回のffmpeg起動で書き出す
+                result = divide_file_single_pass(input_file, chunks, force, check_mode, manifest)
+            else:
+                # 1回のデコードで全チャンネル・全チャンクを書き出す
+                result = divide_file_by_channel(input_file, chunks, channels, layout, force, check_mode, manifest)
+    
+    return result
+
+def get_option_value(i, option):
+    """値を取るオプションの値（正の数）を返す"""
+    try:
+        value = float(sys.argv[i])
+        if value <= 0:
+            raise ValueError
+        return value
+    except (IndexError, ValueError):
+        logger.error(f"{option} には正の数を指定してください。")
+        print(f"エラー: {option} には正の数を指定してください。")
+        usage()
+
+def get_time_length_option(i, option, allow_zero=False):
+    """長さを取るオプションの値をtimedeltaで返す"""
+    try:
+        value = parse_time_length(sys.argv[i])
+        if value <= timedelta(0) and not allow_zero:
+            raise ValueError
+        return value
+    except (IndexError, ValueError):
+        logger.error(f"{option} には長さ（例: 10m, 30s, 1h）を指定してください。")
+        print(f"エラー: {option} には長さ（例: 10m, 30s, 1h）を指定してください。")
+        usage()
+
+def is_watch_candidate(path):
+    """監視モードで分割対象とするファイルか判定する（隠しファイル・分割済みファイルは除外）"""
+    name = os.path.basename(path)
+    return (not name.startswith('.') and is_audio_file(name)
+            and re.match(ORIGINAL_666_PATTERN, name) is not None)
+
+def stop_watching(signum, frame):
+    """SIGTERMで監視を終了する"""
+    raise KeyboardInterrupt
+
+def watch_directories(directories, options, jobs=1, settle_time=30.0, poll_interval=5.0):
+    """ディレクトリを監視し、届いた666形式の録音を分割する
+
+    ファイルサイズがsettle_time秒変化しなくなった時点で転送完了とみなし、
+    jobs並列のワーカーに渡す。起動前に届いていて未処理（マニフェストなし）の
+    ファイルも対象にする。
+    """
+    watcher = dir_watcher.DirectoryWatcher(directories, poll_interval)
+    logger.info(f"監視を開始しました: {', '.join(watcher.directories)} ({watcher.backend})")
+    print(f"監視を開始しました: {', '.join(watcher.directories)} ({watcher.backend})")
+    signal.signal(signal.SIGTERM, stop_watching)
+
+    pending = {}  # パス -> (前回のサイズ, サイズが最後に変化した時刻)
+    running = {}  # future -> パス
+    for path in watcher.existing_files():
+        if is_watch_candidate(path) and not os.path.exists(get_manifest_path(path)):
+            pending[path] = (-1, time.time())
+
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        while True:
+            for path in watcher.wait(min(poll_interval, settle_time)):
+                if is_watch_candidate(path) and path not in running.values():
+                    pending.setdefault(path, (-1, time.time()))
+
+            now = time.time()
+            for path, (last_size, last_change) in list(pending.items()):
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    del pending[path]  # 転送途中で削除・リネームされた
+                    continue
+                if size != last_size:
+                    pending[path] = (size, now)
+                elif now - last_change >= settle_time:
+                    del pending[path]
+                    running[executor.submit(process_file, path, options)] = path
+                    logger.info(f"queued: {path}")
+
+            for future in [f for f in running if f.done()]:
+                path = running.pop(future)
+                if future.exception():
+                    logger.error(f"入力ファイル '{path}' の処理に失敗しました: {future.exception()}")
+    except KeyboardInterrupt:
+        logger.info("監視を終了します")
+        print("監視を終了します")
+    finally:
+        watcher.close()
+        executor.shutdown(wait=True)
+
+def print_summaries(summaries):
+    """ファイル毎の集計結果を表示する"""
+    print(f"{'入力ファイル':<50} {'作成':>6} {'スキップ':>8} {'失敗':>6} {'処理時間':>10}")
+    print("-" * 86)
+    for summary in summaries:
+        print(f"{os.path.basename(summary['file']):<50} {summary['created']:>6} {summary['skipped']:>8} {summary['failed']:>6} {summary['elapsed']:>9.2f}s")
+    print("-" * 86)
+    print(f"{'合計':<50} {sum(s['created'] for s in summaries):>6} {sum(s['skipped'] for s in summaries):>8} {sum(s['failed'] for s in summaries):>6}")
+
 def main():
     global debug_mode, logger
     
@@ -292,15 +807,20 @@ def main():
     if len(sys.argv) < 2:
         usage()
     
-    check_ffmpeg()
-    
     mode = "-S"  # デフォルトのモードを設定
     debug_mode = False
     dry_run = False
     force = False
     check_mode = False
     separate_channels = False
-    input_file = None  # 入力ファイルを初期化
+    use_ffmpeg = False
+    chunk_length = timedelta(hours=1)
+    overlap = timedelta(0)
+    jobs = 1
+    watch = False
+    settle_time = 30.0
+    poll_interval = 5.0
+    input_paths = []  # 入力ファイル・ディレクトリ
     
     i = 1
     # 引数を解析
@@ -334,10 +854,36 @@ def main():
         elif arg in ["-sc", "--separate-channel"]:
             separate_channels = True
             logger.info("チャンネル分割モードが有効になりました")
+        elif arg in ["-ff", "--use-ffmpeg"]:
+            use_ffmpeg = True
+            logger.info("PCM WAVでもffmpegで分割するモードが有効になりました")
+        elif arg in ["-l", "--chunk-length"]:
+            i += 1
+            chunk_length = get_time_length_option(i, arg)
+            logger.info(f"分割長: {chunk_length}")
+        elif arg in ["--overlap-length"]:
+            i += 1
+            overlap = get_time_length_option(i, arg, allow_zero=True)
+            logger.info(f"オーバーラップ: {overlap}")
+        elif arg in ["-j", "--jobs"]:
+            i += 1
+            jobs = max(1, int(get_option_value(i, arg)))
+            logger.info(f"並列数: {jobs}")
+        elif arg in ["--watch"]:
+            watch = True
+            logger.info("監視モードが有効になりました")
+        elif arg in ["--settle-time"]:
+            i += 1
+            settle_time = get_option_value(i, arg)
+            logger.info(f"ファイルサイズが変化しなくなってから処理するまでの時間: {settle_time}秒")
+        elif arg in ["--poll-interval"]:
+            i += 1
+            poll_interval = get_option_value(i, arg)
+            logger.info(f"監視間隔: {poll_interval}秒")
         elif not is_option(arg):
-            # オプションでない場合は入力ファイルと判断
-            input_file = arg
-            logger.info(f"入力ファイル: {input_file}")
+            # オプションでない場合は入力ファイル（またはディレクトリ）と判断
+            input_paths.append(arg)
+            logger.info(f"入力: {arg}")
         else:
             logger.error(f"不明なオプション '{arg}'")
             print(f"エラー: 不明なオプション '{arg}'")
@@ -345,89 +891,65 @@ def main():
             sys.exit(1)
         i += 1
     
+    # 分割長は666形式の終了時刻で表せる24時間未満に限る
+    if chunk_length >= timedelta(days=1):
+        logger.error("--chunk-length は24時間未満を指定してください。")
+        print("エラー: --chunk-length は24時間未満を指定してください。")
+        sys.exit(1)
+    if overlap >= chunk_length:
+        logger.error("--overlap-length は分割長より短くしてください。")
+        print("エラー: --overlap-length は分割長より短くしてください。")
+        sys.exit(1)
+    
     # 入力ファイルの存在確認
-    if input_file is None:
+    if not input_paths:
         logger.error("入力ファイルが指定されていません。")
         print("エラー: 入力ファイルが指定されていません。")
         usage()
         sys.exit(1)
-    if not debug_mode and not dry_run and not os.path.exists(input_file):
-        logger.error(f"入力ファイル '{input_file}' が見つかりません。")
-        print(f"エラー: 入力ファイル '{input_file}' が見つかりません。")
-        sys.exit(1)
     
-    file_body_with_ext = os.path.basename(input_file)
-    if debug_mode:
-        logger.debug(f"file_body_with_ext: {file_body_with_ext}")
+    options = {
+        'mode': mode,
+        'dry_run': dry_run,
+        'force': force,
+        'check': check_mode,
+        'separate_channels': separate_channels,
+        'use_ffmpeg': use_ffmpeg,
+        'chunk_length': chunk_length,
+        'overlap': overlap,
+    }
     
-    try:
-        start_datetime, end_datetime, other, ext = parse_666_filename(file_body_with_ext)
-    except Exception as e:
-        logger.error(f"入力ファイル '{input_file}' の解析に失敗しました: {str(e)}")
-        print(f"エラー: 入力ファイル '{input_file}' の解析に失敗しました: {str(e)}")
-        print("入力ファイルは666形式（YYMMDD_HHMMSS_HHMMSS）である必要があります。")
-        sys.exit(1)
+    if watch:
+        not_dirs = [path for path in input_paths if not os.path.isdir(path)]
+        if not_dirs:
+            logger.error(f"監視モードではディレクトリを指定してください: {not_dirs}")
+            print(f"エラー: 監視モードではディレクトリを指定してください: {not_dirs}")
+            sys.exit(1)
+        watch_directories(input_paths, options, jobs, settle_time, poll_interval)
+        logger.info("divide_1_hour.py を終了しました")
+        return
     
-    if debug_mode:
-        logger.debug(f"デバッグ情報:")
-        logger.debug(f"  開始日時: {start_datetime}")
-        logger.debug(f"  終了日時: {end_datetime}")
-        logger.debug(f"  その他情報: {other}")
-        logger.debug(f"  拡張子: {ext}")
-        logger.debug(f"  入力ファイル: {input_file}")
-        logger.debug(f"  モード: {mode}")
-        logger.debug(f"  チャンネル分割: {separate_channels}")
-        logger.debug(f"  ドライラン: {dry_run}")
-        logger.debug(f"  強制上書き: {force}")
-        logger.debug(f"  チェックモード: {check_mode}")
+    input_files = collect_input_files(input_paths)
+    if not input_files:
+        logger.error("処理対象の入力ファイルがありません。")
+        print("エラー: 処理対象の入力ファイルがありません。")
+        sys.exit(1)
     
-    current_time = start_datetime
-    chunk_number = 1
+    if jobs == 1 or len(input_files) == 1:
+        summaries = [process_file(input_file, options) for input_file in input_files]
+    else:
+        # ffmpegの起動やファイルI/Oが主なのでスレッドで並列処理する
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            summaries = list(executor.map(lambda f: process_file(f, options), input_files))
     
-    while current_time < end_datetime:
-        if mode == "-S":
-            next_time = current_time.replace(minute=0, second=0) + timedelta(hours=1)
-        else:  # mode == "-t"
-            next_time = current_time + timedelta(hours=1)
-        
-        if next_time > end_datetime:
-            next_time = end_datetime
-        
-        output_file = f"{current_time.strftime('%y%m%d_%H%M%S')}_{next_time.strftime('%H%M%S')}_d{chunk_number}{other}.{ext}"
-        
-        start_time = (current_time - start_datetime).total_seconds()
-        duration = (next_time - current_time).total_seconds()
-        
-        if dry_run:
-            file_exists = os.path.exists(output_file)
-            if not separate_channels:
-                if file_exists and not force:
-                    logger.info(f"dry-run: skipped: {output_file}")
-                    print(f"dry-run: skipped: {output_file}")
-                else:
-                    logger.info(f"dry-run: {output_file}")
-                    print(f"dry-run: {output_file}")
-            else:
-                channels = 2  # ドライランモードでは仮に2チャンネルとして表示
-                base_name, ext_name = os.path.splitext(output_file)
-                for ch in range(1, channels + 1):
-                    ch_output = f"{base_name}-ch-{ch}{ext_name}"
-                    file_exists = os.path.exists(ch_output)
-                    if file_exists and not force:
-                        logger.info(f"dry-run: skipped: {ch_output}")
-                        print(f"dry-run: skipped: {ch_output}")
-                    else:
-                        logger.info(f"dry-run: {ch_output}")
-                        print(f"dry-run: {ch_output}")
-        elif not debug_mode:
-            file_created = divide_file(input_file, f"{start_time:.3f}", f"{duration:.3f}", output_file, separate_channels, force, check_mode)
-            if file_created and not separate_channels:
-                print(f"created: {output_file}")
-        
-        current_time = next_time
-        chunk_number += 1
+    if len(summaries) > 1:
+        print_summaries(summaries)
+    if check_mode:
+        logger.info(f"total verification time: {sum(summary['check_time'] for summary in summaries):.3f}s")
     
     logger.info("divide_1_hour.py を終了しました")
+    if any(summary['failed'] for summary in summaries):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -10,20 +10,19 @@ import sys
 from datetime import datetime, timedelta
 import subprocess
 from pathlib import Path
-import json
+
+from utils import probe_cache
+
+# 解析結果キャッシュ（main()で開く。Noneの場合はキャッシュを使わない）
+audio_cache = None
 
 def get_duration(file_path):
-    """ffprobeを使用してメディアファイルの長さを取得"""
-    try:
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-             '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
-            capture_output=True, text=True, check=True
-        )
-        return float(result.stdout.strip())
-    except (subprocess.CalledProcessError, ValueError):
+    """メディアファイルの長さを取得（ヘッダを解析できない形式のみffprobeを使用）"""
+    duration = probe_cache.get_duration(file_path, audio_cache)
+    if duration is None:
         print(f"エラー: ファイル '{file_path}' の長さを取得できません", file=sys.stderr)
         sys.exit(1)
+    return duration
 
 def format_timestamp(dt):
     """datetimeオブジェクトを666フォーマットの日時文字列に変換"""
@@ -45,17 +44,13 @@ def get_audio_info(file_path):
         file_stat = os.stat(file_path)
         file_time = datetime.fromtimestamp(file_stat.st_mtime)
         
-        # Get audio information using ffprobe
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
-             '-show_entries', 'format=duration,size : stream=channels,sample_rate,codec_name',
-             '-of', 'json', file_path],
-            capture_output=True, text=True, check=True
-        )
-        info = json.loads(result.stdout)
+        # Get audio information from the header (ffprobe only as a fallback)
+        info = probe_cache.probe(file_path, audio_cache, file_stat)
+        if info is None:
+            raise ValueError("unsupported or unreadable audio file")
         
         # Calculate duration in HH:MM:SS format
-        duration_seconds = float(info['format']['duration'])
+        duration_seconds = info['duration']
         hours = int(duration_seconds // 3600)
         minutes = int((duration_seconds % 3600) // 60)
         seconds = duration_seconds % 60
@@ -64,16 +59,16 @@ def get_audio_info(file_path):
         # Format information
         details = {
             'Filename': os.path.basename(file_path),
-            'File size': f"{int(info['format']['size']) / 1024 / 1024:.1f} MB",
+            'File size': f"{file_stat.st_size / 1024 / 1024:.1f} MB",
             'Timestamp': file_time.strftime('%Y-%m-%d %H:%M:%S'),
             'Duration': f"{duration_seconds:.1f} seconds ({duration_hhmmss})",
-            'Codec': info['streams'][0]['codec_name'],
-            'Channels': info['streams'][0]['channels'],
-            'Sample rate': f"{int(info['streams'][0]['sample_rate'])/1000:.1f} kHz",
+            'Codec': info['codec'],
+            'Channels': info['channels'],
+            'Sample rate': f"{int(info['sample_rate'])/1000:.1f} kHz",
         }
         return details
     
-    except (subprocess.CalledProcessError, KeyError, ValueError, json.JSONDecodeError) as e:
+    except (OSError, KeyError, TypeError, ValueError) as e:
         print(f"Warning: Failed to get file information - {e}", file=sys.stderr)
         return None
 
@@ -168,7 +163,7 @@ def revert_to_original(args, input_file):
     
     # 詳細情報の表示
     if args.verbose:
-        print("\n# === File Information (ffprobe) ===")
+        print("\n# === File Information (audio) ===")
         details = get_audio_info(input_file)
         if details:
             for key, value in details.items():
@@ -206,7 +201,7 @@ def generate_filename(args, input_file):
 
     # Display detailed information
     if args.verbose:
-        print("# === File Information (ffprobe) ===")
+        print("# === File Information (audio) ===")
         details = get_audio_info(input_file)
         if details:
             for key, value in details.items():
@@ -311,6 +306,10 @@ def main():
     parser.add_argument('-l', '--location', help='場所（森下フォーマット用）')
     parser.add_argument('-n', '--observer', help='観察者名（森下フォーマット用）')
 
+    # Probe cache options
+    parser.add_argument('--cache-dir', help='解析結果キャッシュの保存先（デフォルト: ~/.cache/sound_command）')
+    parser.add_argument('--no-cache', action='store_true', help='解析結果キャッシュを使わない')
+
     args = parser.parse_args()
 
     # Verify time difference format (only if not in revert mode)
@@ -323,6 +322,16 @@ def main():
         print(f"Error: Output directory '{args.output_dir}' not found", file=sys.stderr)
         sys.exit(1)
 
+    global audio_cache
+    audio_cache = probe_cache.open_cache(args.cache_dir, enabled=not args.no_cache)
+    try:
+        process_files(args)
+    finally:
+        if audio_cache is not None:
+            audio_cache.close()
+
+def process_files(args):
+    """入力ファイル毎にコマンドを表示する"""
     for input_file in args.files:
         if not os.path.exists(input_file):
             print(f"Error: File '{input_file}' not found", file=sys.stderr)
@@ -1,284 +1,540 @@
 #!/usr/bin/env python3
 
 import json
-import sqlite3
 import sys
+import time
 import argparse
 import os
+import glob
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
 
-def create_database():
-    # データベースに接続（存在しない場合は新規作成）
-    conn = sqlite3.connect('/var/www/data/call-database/call-database.db')
-    cursor = conn.cursor()
+from utils import call_database
 
-    # sound_metadataテーブルの作成
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sound_metadata (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            origin TEXT NOT NULL,
-            recording_id INTEGER NOT NULL,
-            page INTEGER NOT NULL,
-            num_recordings INTEGER NOT NULL,
-            num_species INTEGER NOT NULL,
-            num_pages INTEGER NOT NULL,
-            gen TEXT NOT NULL,
-            sp TEXT NOT NULL,
-            ssp TEXT,
-            group_name TEXT,
-            en TEXT,
-            rec TEXT,
-            cnt TEXT,
-            loc TEXT,
-            lat TEXT,
-            lng TEXT,
-            alt TEXT,
-            type TEXT,
-            sex TEXT,
-            stage TEXT,
-            method TEXT,
-            url TEXT,
-            file TEXT,
-            file_name TEXT,
-            ext TEXT,
-            sono_small TEXT,
-            sono_med TEXT,
-            sono_large TEXT,
-            sono_full TEXT,
-            osci_small TEXT,
-            osci_med TEXT,
-            osci_large TEXT,
-            lic TEXT,
-            quality TEXT,
-            length TEXT,
-            time TEXT,
-            date TEXT,
-            uploaded TEXT,
-            remarks TEXT,
-            bird_seen TEXT,
-            animal_seen TEXT,
-            playback_used TEXT,
-            temp TEXT,
-            regnr TEXT,
-            auto TEXT,
-            dvc TEXT,
-            mic TEXT,
-            smp TEXT,
-            UNIQUE(origin, recording_id),
-            UNIQUE(origin, gen, sp, recording_id)
-        )
-    ''')
-
-    # annotation_statusテーブルの作成
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS annotation_status (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            origin TEXT NOT NULL,
-            recording_id INTEGER NOT NULL,
-            is_annotated BOOLEAN DEFAULT FALSE,
-            counts_annotation INTEGER DEFAULT 0,
-            FOREIGN KEY (origin, recording_id) REFERENCES sound_metadata(origin, recording_id),
-            UNIQUE(origin, recording_id)
-        )
-    ''')
-    
-    conn.commit()
+# 先読みするJSONファイルの数（読み込み済みのページをメモリに溜めすぎないため）
+READ_AHEAD = 4
+
+# --stream で1回に挿入する件数と、1回に読み込む文字数
+STREAM_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 1 << 20
+# 1つの値（録音データ1件など）として許容する最大の文字数（壊れたファイルを際限なく読み込まないため）
+STREAM_MAX_VALUE_SIZE = 64 << 20
+
+def create_database(db_path=None):
+    # データベースに接続（存在しない場合は新規作成し、スキーマを最新に移行）
+    conn = call_database.connect(db_path)
+    cursor = conn.cursor()
     return conn, cursor
 
+INSERT_STATUS_SQL = '''
+    INSERT OR IGNORE INTO annotation_status (origin, recording_id, is_annotated)
+    VALUES (?, ?, FALSE)
+'''
+
+def get_extension(file_name):
+    """ファイル名から拡張子を抽出する（小文字で保存）"""
+    # 最後のドットの位置を見つける
+    last_dot_index = file_name.rfind('.')
+    # ドットが見つかり、それが最後の文字でない場合のみ拡張子を抽出
+    extension = file_name[last_dot_index + 1:].lower() if last_dot_index > 0 and last_dot_index < len(file_name) - 1 else ''
+    # 拡張子が異常に長い場合は空文字を設定（正常な拡張子は通常10文字以下）
+    return extension if len(extension) <= 10 else ''
+
+def recording_values(recording, origin, page_info):
+    """
+    1件の録音データからsound_metadataに挿入する値のタプルを作る
+
+    Parameters
+    ----------
+    recording : dict
+        JSONのrecordingsの1要素
+    origin : str
+        音源元（例：xeno-canto）
+    page_info : tuple
+        (page, num_recordings, num_species, num_pages)
+
+    Returns
+    -------
+    tuple
+        call_database.METADATA_COLUMNSの順の値
+    """
+    sono = recording.get('sono', {})
+    osci = recording.get('osci', {})
+    return (
+        origin,
+        *page_info,
+        recording['id'], recording['gen'], recording['sp'], recording.get('ssp', ''),
+        recording.get('group', ''), recording['en'], recording['rec'], recording['cnt'],
+        recording['loc'], recording['lat'], recording['lng'], recording.get('alt', ''),
+        recording.get('type', ''), recording.get('sex', ''), recording.get('stage', ''),
+        recording.get('method', ''),
+        recording.get('url', ''), recording.get('file', ''), recording.get('file-name', ''),
+        get_extension(recording.get('file-name', '')),
+        sono.get('small', ''), sono.get('med', ''), sono.get('large', ''), sono.get('full', ''),
+        osci.get('small', ''), osci.get('med', ''), osci.get('large', ''),
+        recording.get('lic', ''), recording.get('q', ''),
+        recording.get('length', ''), recording.get('time', ''),
+        recording.get('date', ''), recording.get('uploaded', ''),
+        recording.get('rmk', ''),
+        recording.get('bird-seen', ''), recording.get('animal-seen', ''),
+        recording.get('playback-used', ''), recording.get('temp', ''),
+        recording.get('regnr', ''), recording.get('auto', ''),
+        recording.get('dvc', ''), recording.get('mic', ''),
+        recording.get('smp', '')
+    )
+
+def insert_recordings(cursor, origin, page_info, recordings):
+    """
+    録音データをexecutemanyでまとめて挿入する
+
+    既に存在するレコード（UNIQUE(origin, recording_id) などに一致するもの）は
+    無視し、種・ページ情報・URLのテンプレートも追加・更新しない。重複の判定はUNIQUE制約の索引（originが先頭の列）で
+    行うため、データベースの件数が増えても1件毎の重複の確認に全件の走査は起きない。
+    コミットは呼び出し側で行うため、同じトランザクション内で何度呼んでもよい。
+
+    Returns
+    -------
+    int
+        recordingsに挿入した件数
+    """
+    # 種・ページ情報・URLは正規化したテーブルに1回だけ保存される
+    inserted = call_database.insert_metadata(
+        cursor.connection, [recording_values(rec, origin, page_info) for rec in recordings])
+    # 対応するannotation_statusレコードを作成（既に存在する場合は無視）
+    cursor.executemany(INSERT_STATUS_SQL, ((origin, rec['id']) for rec in recordings))
+    return inserted
+
 def verify_data(cursor, data, origin, verbose=False):
-    """データベースに保存されたデータの検証を行う"""
+    """
+    データベースに保存されたデータの検証を行う
+
+    ページのrecording_idを一時テーブルに入れ、一時テーブル側から recordings の
+    UNIQUE(origin, recording_id) の索引を引く。IN (...) の文字列を組み立てないため、
+    データベースの件数によらずページの件数分の索引の検索だけで済む。
+    """
+    reset_verify_ids(cursor)
+    add_verify_ids(cursor, data['recordings'])
+    return verify_ids(cursor, origin, verbose)
+
+def reset_verify_ids(cursor):
+    """検証対象のrecording_idを入れる一時テーブルを空にする"""
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS verify_ids (recording_id INTEGER PRIMARY KEY)')
+    cursor.execute('DELETE FROM verify_ids')
+
+def add_verify_ids(cursor, recordings):
+    """処理対象のrecording_idを一時テーブルに入れる（ページ内の重複は1件として数える）"""
+    cursor.executemany('INSERT OR IGNORE INTO verify_ids (recording_id) VALUES (?)',
+                       ((rec['id'],) for rec in recordings))
+
+def verify_ids(cursor, origin, verbose=False):
+    """一時テーブルのrecording_idが全て保存されているかを検証する"""
     print("\n=== データ検証開始 ===")
-    
-    # 処理対象のrecording_idリストを作成
-    recording_ids = [rec['id'] for rec in data['recordings']]
-    recording_ids_str = ','.join(f"'{rid}'" for rid in recording_ids)
-    
+
+    expected_count = cursor.execute('SELECT COUNT(*) FROM verify_ids').fetchone()[0]
+
     # originとrecording_idに基づいて保存されたレコード数を確認
-    cursor.execute(f"""
-        SELECT COUNT(*) FROM sound_metadata 
-        WHERE origin = ? AND recording_id IN ({recording_ids_str})
-    """, (origin,))
-    
-    saved_count = cursor.fetchone()[0]
-    expected_count = len(data['recordings'])
-    
+    # （CROSS JOINで一時テーブルを外側に固定し、recordingsのoriginの全件を走査させない）
+    saved_count = cursor.execute("""
+        SELECT COUNT(*) FROM verify_ids v
+        CROSS JOIN recordings m ON m.origin = ? AND m.recording_id = v.recording_id
+    """, (origin,)).fetchone()[0]
+
     print(f"期待されるレコード数: {expected_count}")
     print(f"保存されたレコード数（origin={origin}のみ）: {saved_count}")
     
     if saved_count != expected_count:
-        print("⚠️ レコード数が一致しません")
+        print(f"⚠️ レコード数が一致しません（期待: {expected_count}, 保存: {saved_count}）")
         if verbose:
-            # 詳細な不一致情報を表示
-            cursor.execute(f"""
-                SELECT recording_id, gen, sp FROM sound_metadata 
-                WHERE origin = ? AND recording_id IN ({recording_ids_str})
+            # 保存されていないrecording_idを表示
+            cursor.execute("""
+                SELECT v.recording_id FROM verify_ids v
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM recordings m WHERE m.origin = ? AND m.recording_id = v.recording_id
+                )
             """, (origin,))
-            saved_records = cursor.fetchall()
-            print("\n保存されているレコード:")
-            for rec in saved_records:
-                print(f"- {rec[0]} ({rec[1]} {rec[2]})")
+            missing_records = cursor.fetchall()
+            print("\n保存されていないレコード:")
+            for rec in missing_records:
+                print(f"- {rec[0]}")
         return False
     
     return True
 
-def import_json_to_sqlite(json_file_path, origin, debug=False, verbose=False):
-    # JSONファイルの拡張子チェック
-    if not json_file_path.endswith('.json'):
-        print(f"エラー: JSONファイルではありません: {json_file_path}")
+def expand_json_paths(paths):
+    """
+    ファイル・ディレクトリ・globパターンをJSONファイルのリストに展開する
+
+    ディレクトリの場合はxeno-canto_to_HTML_table.pyと同じく配下の page*.json を再帰的に探す。
+    """
+    json_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            json_paths.extend(sorted(str(p) for p in Path(path).rglob('page*.json')))
+        elif os.path.isfile(path):
+            # JSONファイルの拡張子チェック
+            if not path.endswith('.json'):
+                print(f"エラー: JSONファイルではありません: {path}")
+                sys.exit(1)
+            json_paths.append(path)
+        else:
+            matched = sorted(p for p in glob.glob(path, recursive=True) if p.endswith('.json') and os.path.isfile(p))
+            if not matched:
+                print(f"警告: 一致するJSONファイルがありません: {path}")
+            json_paths.extend(matched)
+    return json_paths
+
+def load_page(json_file_path):
+    with open(json_file_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def iter_pages(json_paths):
+    """
+    JSONファイルを別スレッドで先読みしながら1ページずつ返す
+
+    読み込み（JSONの解析）とデータベースへの書き込みを並行して行うため、書き込みは
+    呼び出し側の1つの接続だけで行う。先読みはREAD_AHEADファイルまで。
+
+    Yields
+    ------
+    tuple
+        (JSONファイルのパス, 読み込んだデータ, エラー)。読み込みに失敗した場合はデータがNone
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        paths = iter(json_paths)
+        pending = deque((path, executor.submit(load_page, path)) for path in islice(paths, READ_AHEAD))
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(load_page, next_path)))
+            try:
+                yield path, future.result(), None
+            except (OSError, ValueError) as e:
+                yield path, None, e
+
+class JsonStreamReader:
+    """
+    JSONファイルを少しずつ読みながら値を1つずつ取り出すクラス
+
+    json.JSONDecoder.raw_decode() をバッファに対して使い、値の途中でバッファが
+    尽きた場合は次のチャンクを読み足して解析し直す。読み終わった部分は捨てるため、
+    メモリに保持するのは読み込み中のチャンクと1つの値だけになる。
+    """
+
+    def __init__(self, file, chunk_size=STREAM_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """次のチャンクを読み足す。ファイルの終わりに達している場合はFalse"""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 読み終わった部分を捨てる
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """空白を読み飛ばし、次の文字を返す（読み進めない）"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("JSONが途中で終わっています")
+
+    def expect(self, chars):
+        """次の文字がcharsのいずれかであることを確認して読み進め、その文字を返す"""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"JSONの形式が正しくありません: '{chars}' が必要な位置に '{char}' があります")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """次の値（オブジェクト・配列・文字列・数値など）を1つ解析して返す"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 数値がバッファの終わりで切れている可能性があるため、続きを読んで確かめる
+                if end < len(self.buffer) or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if len(self.buffer) - self.pos > STREAM_MAX_VALUE_SIZE or not self._fill():
+                    raise
+
+def iter_page_stream(file):
+    """
+    ページのJSON（トップレベルのオブジェクト）を先頭から順に解析する
+
+    recordings 配列は1要素ずつ、それ以外のフィールド（page, numRecordings など）は
+    値ごとに返す。
+
+    Yields
+    ------
+    tuple
+        ('field', キー, 値) または ('recording', 録音データ)
+    """
+    reader = JsonStreamReader(file)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'recordings' and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield 'recording', reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            yield 'field', key, reader.value()
+        if reader.expect(',}') == '}':
+            return
+
+def import_stream(cursor, json_file_path, origin, batch_size=STREAM_BATCH_SIZE, verbose=False):
+    """
+    JSONファイルを逐次解析しながらbatch_size件ずつ挿入して検証する（--stream）
+
+    ファイル全体を読み込まないため、巨大なダンプでもメモリの使用量は一定になる。
+    ページ情報（page, numRecordings など）がrecordingsより後にある場合や
+    numRecordingsがない場合は、最後にこのファイルから挿入した行のページ情報を更新する。
+
+    Returns
+    -------
+    tuple
+        (処理したレコード数, 挿入したレコード数, 検証に成功したか)
+    """
+    fields = {}
+    page_info = None
+    batch = []
+    processed_count = 0
+    inserted_count = 0
+
+    def page_info_from(fields, count):
+        # ページ情報の取得（存在しない場合はデフォルト値を使用）
+        return (fields.get('page', 1), int(fields.get('numRecordings', count or 0)),
+                int(fields.get('numSpecies', 1)), fields.get('numPages', 1))
+
+    def flush():
+        nonlocal page_info, inserted_count
+        if page_info is None:
+            # 件数はまだ分からないため、numRecordingsがない場合は最後に更新する
+            page_info = page_info_from(fields, None)
+        inserted_count += insert_recordings(cursor, origin, page_info, batch)
+        add_verify_ids(cursor, batch)
+        batch.clear()
+
+    cursor.execute('SAVEPOINT import_page')
+    reset_verify_ids(cursor)
+    last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM recordings').fetchone()[0]
+    try:
+        with open(json_file_path, 'r', encoding='utf-8') as file:
+            for event in iter_page_stream(file):
+                if event[0] == 'field':
+                    fields[event[1]] = event[2]
+                    continue
+                batch.append(event[1])
+                processed_count += 1
+                if len(batch) >= batch_size:
+                    flush()
+                    if verbose:
+                        print(f"挿入中: {processed_count}件")
+            if batch:
+                flush()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"JSONファイルを読み込めません: {json_file_path}: {e}")
+        cursor.execute('ROLLBACK TO import_page')
+        cursor.execute('RELEASE import_page')
+        return processed_count, 0, False
+
+    if verbose:
+        print("データ構造:", list(fields.keys()) + ['recordings'])
+    if processed_count == 0:
+        print(f"警告: {json_file_path} に録音データが見つかりません")
+        cursor.execute('RELEASE import_page')
+        return 0, 0, True
+
+    # recordingsより後に読んだページ情報をこのファイルから挿入した行に反映する
+    final_info = page_info_from(fields, processed_count)
+    if verbose:
+        print(f"ページ情報: page={final_info[0]}, recordings={final_info[1]}, species={final_info[2]}, pages={final_info[3]}")
+    if final_info != page_info and inserted_count:
+        old_page_id = call_database.get_page_id(cursor.connection, origin, page_info)
+        cursor.execute('UPDATE recordings SET page_id = ? WHERE id > ?',
+                       (call_database.get_page_id(cursor.connection, origin, final_info), last_id))
+        # 仮のページ情報が使われなくなった場合は削除する
+        cursor.execute('DELETE FROM pages WHERE id = ? AND NOT EXISTS (SELECT 1 FROM recordings WHERE page_id = ?)',
+                       (old_page_id, old_page_id))
+
+    if verbose:
+        print(f"挿入: {inserted_count}件, 既に存在するためスキップ: {processed_count - inserted_count}件")
+
+    # データの検証
+    if not verify_ids(cursor, origin, verbose):
+        print(f"⚠️ データの検証に失敗しました: {json_file_path}")
+        cursor.execute('ROLLBACK TO import_page')
+        cursor.execute('RELEASE import_page')
+        return processed_count, 0, False
+    cursor.execute('RELEASE import_page')
+    return processed_count, inserted_count, True
+
+def import_page(cursor, json_file_path, data, origin, verbose=False):
+    """
+    1ページ分のJSONデータを挿入して検証する
+
+    ページ毎にSAVEPOINTを置き、検証に失敗した場合はそのページの挿入だけを取り消す。
+
+    Returns
+    -------
+    tuple
+        (処理したレコード数, 挿入したレコード数, 検証に成功したか)
+    """
+    # データ構造の検証
+    if verbose:
+        print("データ構造:", list(data.keys()))
+
+    # ページ情報の取得（存在しない場合はデフォルト値を使用）
+    page = data.get('page', 1)
+    num_recordings = int(data.get('numRecordings', len(data.get('recordings', []))))
+    num_species = int(data.get('numSpecies', 1))
+    num_pages = data.get('numPages', 1)
+
+    if verbose:
+        print(f"ページ情報: page={page}, recordings={num_recordings}, species={num_species}, pages={num_pages}")
+
+    # recordingsの各アイテムを処理
+    recordings = data.get('recordings', [])
+    if not recordings:
+        print(f"警告: {json_file_path} に録音データが見つかりません")
+        return 0, 0, True
+
+    cursor.execute('SAVEPOINT import_page')
+    # 値のタプルをまとめて作り、1回のexecutemanyで挿入する（重複はUNIQUE制約で無視）
+    inserted_count = insert_recordings(cursor, origin, (page, num_recordings, num_species, num_pages), recordings)
+    if verbose:
+        print(f"挿入: {inserted_count}件, 既に存在するためスキップ: {len(recordings) - inserted_count}件")
+
+    # データの検証
+    if not verify_data(cursor, data, origin, verbose):
+        print(f"⚠️ データの検証に失敗しました: {json_file_path}")
+        cursor.execute('ROLLBACK TO import_page')
+        cursor.execute('RELEASE import_page')
+        return len(recordings), 0, False
+    cursor.execute('RELEASE import_page')
+    return len(recordings), inserted_count, True
+
+def import_json_to_sqlite(json_paths, origin, debug=False, verbose=False, stream=False, batch_size=STREAM_BATCH_SIZE, db_path=None,
+                          vacuum=False):
+    """
+    JSONファイル（複数可）をデータベースにインポートする
+
+    全てのページを1つの接続・1つのトランザクションで挿入し、最後にまとめてコミットする。
+
+    Parameters
+    ----------
+    json_paths : str or list of str
+        JSONファイル・ディレクトリ（配下の page*.json）・globパターン
+    origin : str
+        音源データの音源元（例：xeno-canto）
+    stream : bool, optional
+        Trueの場合はファイル全体を読み込まず、逐次解析してbatch_size件ずつ挿入する
+    db_path : str, optional
+        データベースのパス。Noneの場合は環境変数 CALL_DATABASE_PATH か既定のパス
+    vacuum : bool, optional
+        Trueの場合はインポートの後に空き領域を解放する（VACUUM）
+
+    Returns
+    -------
+    bool
+        全てのページの検証に成功したか
+    """
+    if isinstance(json_paths, str):
+        json_paths = [json_paths]
+    json_paths = expand_json_paths(json_paths)
+    if not json_paths:
+        print("エラー: インポートするJSONファイルがありません")
         sys.exit(1)
 
+    show_progress = sys.stderr.isatty() and not verbose
     try:
         # データベースに接続
-        conn, cursor = create_database()
+        conn, cursor = create_database(db_path)
         
         # デバッグモードの場合、テーブルを削除して再作成
         if debug:
             if verbose:
                 print("デバッグモード: テーブルを初期化します")
-            cursor.execute("DROP TABLE IF EXISTS annotation_status")
-            cursor.execute("DROP TABLE IF EXISTS sound_metadata")
-            conn, cursor = create_database()
-
-        # JSONファイルを読み込む
-        if verbose:
-            print(f"JSONファイル読み込み中: {json_file_path}")
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        # データ構造の検証
-        if verbose:
-            print("データ構造:", list(data.keys()))
-        
-        # ページ情報の取得（存在しない場合はデフォルト値を使用）
-        page = data.get('page', 1)
-        num_recordings = int(data.get('numRecordings', len(data.get('recordings', []))))
-        num_species = int(data.get('numSpecies', 1))
-        num_pages = data.get('numPages', 1)
-        
-        if verbose:
-            print(f"ページ情報: page={page}, recordings={num_recordings}, species={num_species}, pages={num_pages}")
-        
-        # recordingsの各アイテムを処理
-        recordings = data.get('recordings', [])
-        if not recordings:
-            print(f"警告: {json_file_path} に録音データが見つかりません")
-            return
+            call_database.reset(conn)
 
-        # カラム名を明示的に指定
-        columns = '''(
-            origin, page, num_recordings, num_species, num_pages,
-            recording_id, gen, sp, ssp, group_name, en,
-            rec, cnt, loc, lat, lng, alt, type, sex,
-            stage, method, url, file, file_name, ext,
-            sono_small, sono_med, sono_large, sono_full,
-            osci_small, osci_med, osci_large,
-            lic, quality, length, time, date, uploaded,
-            remarks, bird_seen, animal_seen, playback_used,
-            temp, regnr, auto, dvc, mic, smp
-        )'''
-
-        skipped_count = 0
+        processed_count = 0
         inserted_count = 0
-        
-        for recording in recordings:
+        failed_files = []
+        cursor.execute('BEGIN')
+        # --stream では先読みせず、各ファイルをimport_stream()で逐次解析する
+        pages = ((path, None, None) for path in json_paths) if stream else iter_pages(json_paths)
+        for index, (json_file_path, data, error) in enumerate(pages, 1):
             if verbose:
-                print(f"\n処理中のレコード: {recording['id']}")
-            
-            # 重複チェック
-            cursor.execute('''
-                SELECT COUNT(*) FROM sound_metadata 
-                WHERE recording_id = ? AND gen = ? AND sp = ?
-            ''', (recording['id'], recording['gen'], recording['sp']))
-            
-            if cursor.fetchone()[0] > 0:
-                if verbose:
-                    print(f"スキップ: レコード {recording['id']} ({recording['gen']} {recording['sp']}) は既に存在します")
-                skipped_count += 1
-                continue
-            
-            # ファイル名から拡張子を抽出（小文字で保存）
-            file_name = recording.get('file-name', '')
-            # 最後のドットの位置を見つける
-            last_dot_index = file_name.rfind('.')
-            # ドットが見つかり、それが最後の文字でない場合のみ拡張子を抽出
-            extension = file_name[last_dot_index + 1:].lower() if last_dot_index > 0 and last_dot_index < len(file_name) - 1 else ''
-            # 拡張子が異常に長い場合は空文字を設定（正常な拡張子は通常10文字以下）
-            extension = extension if len(extension) <= 10 else ''
-
-            values = [
-                origin,
-                page, num_recordings, num_species, num_pages,
-                recording['id'], recording['gen'], recording['sp'], recording.get('ssp', ''),
-                recording.get('group', ''), recording['en'], recording['rec'], recording['cnt'],
-                recording['loc'], recording['lat'], recording['lng'], recording.get('alt', ''),
-                recording.get('type', ''), recording.get('sex', ''), recording.get('stage', ''),
-                recording.get('method', ''),
-                recording.get('url', ''), recording.get('file', ''), recording.get('file-name', ''),
-                extension,
-                recording.get('sono', {}).get('small', ''),
-                recording.get('sono', {}).get('med', ''),
-                recording.get('sono', {}).get('large', ''),
-                recording.get('sono', {}).get('full', ''),
-                recording.get('osci', {}).get('small', ''),
-                recording.get('osci', {}).get('med', ''),
-                recording.get('osci', {}).get('large', ''),
-                recording.get('lic', ''), recording.get('q', ''),
-                recording.get('length', ''), recording.get('time', ''),
-                recording.get('date', ''), recording.get('uploaded', ''),
-                recording.get('rmk', ''),
-                recording.get('bird-seen', ''), recording.get('animal-seen', ''),
-                recording.get('playback-used', ''), recording.get('temp', ''),
-                recording.get('regnr', ''), recording.get('auto', ''),
-                recording.get('dvc', ''), recording.get('mic', ''),
-                recording.get('smp', '')
-            ]
-
-            # 値の数をチェック
-            if verbose:
-                print(f"挿入する値の数: {len(values)}")
-                
-            placeholders = ','.join(['?' for _ in values])
-            
-            try:
-                cursor.execute(f'''
-                    INSERT INTO sound_metadata {columns}
-                    VALUES ({placeholders})
-                ''', values)
-                
-                # sound_metadataの挿入後、対応するannotation_statusレコードを作成
-                cursor.execute('''
-                    INSERT INTO annotation_status (origin, recording_id, is_annotated)
-                    VALUES (?, ?, ?)
-                ''', (origin, recording['id'], False))
-                
-                inserted_count += 1
-                if verbose:
-                    print(f"✓ レコード {recording['id']} ({recording['gen']} {recording['sp']}) を挿入しました")
-                    
-            except sqlite3.IntegrityError:
-                if verbose:
-                    print(f"スキップ: レコード {recording['id']} ({recording['gen']} {recording['sp']}) は既に存在します")
-                skipped_count += 1
+                print(f"\nJSONファイル読み込み中 ({index}/{len(json_paths)}): {json_file_path}")
+            if error is not None:
+                if show_progress:
+                    print(file=sys.stderr)
+                print(f"JSONファイルを読み込めません: {json_file_path}: {error}")
+                failed_files.append(json_file_path)
                 continue
+            if stream:
+                processed, inserted, ok = import_stream(cursor, json_file_path, origin, batch_size, verbose)
+            else:
+                processed, inserted, ok = import_page(cursor, json_file_path, data, origin, verbose)
+            processed_count += processed
+            inserted_count += inserted
+            if not ok:
+                failed_files.append(json_file_path)
+            if show_progress:
+                print(f"\rページ {index}/{len(json_paths)}  挿入 {inserted_count}件  スキップ {processed_count - inserted_count}件",
+                      end='', file=sys.stderr, flush=True)
+        if show_progress:
+            print(file=sys.stderr)
+        conn.commit()
 
         # 結果サマリーの表示
         print(f"\n=== 処理結果 ===")
-        print(f"処理したレコード数: {len(recordings)}")
+        print(f"処理したファイル数: {len(json_paths)}")
+        print(f"処理したレコード数: {processed_count}")
         print(f"挿入したレコード数: {inserted_count}")
-        print(f"スキップしたレコード数: {skipped_count}")
+        print(f"スキップしたレコード数: {processed_count - inserted_count}")
+
+        if vacuum:
+            start_time = time.perf_counter()
+            print("空き領域を解放しています（VACUUM）...")
+            call_database.vacuum(conn)
+            print(f"空き領域を解放しました（{time.perf_counter() - start_time:.2f}秒）")
 
-        # データの検証
-        if not verify_data(cursor, data, origin, verbose):
-            print("⚠️ データの検証に失敗しました")
-            conn.rollback()
+        if failed_files:
+            print(f"⚠️ 読み込みまたはデータの検証に失敗したファイル: {len(failed_files)}件（これらのファイルの挿入は取り消しました）")
+            for json_file_path in failed_files:
+                print(f"- {json_file_path}")
             return False
-        else:
-            print("✅ データの検証に成功しました")
-            conn.commit()
-            return True
+        print("✅ データの検証に成功しました")
+        return True
 
-    except json.JSONDecodeError:
-        print(f"JSONファイルの形式が正しくありません: {json_file_path}")
-        sys.exit(1)
     except Exception as e:
         print(f"エラーが発生しました: {e}")
         if verbose:
@@ -292,10 +548,14 @@ def import_json_to_sqlite(json_file_path, origin, debug=False, verbose=False):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='JSONデータをSQLiteデータベースにインポートします')
-    parser.add_argument('json_file', help='インポートするJSONファイルのパス (.json)')
+    parser.add_argument('json_files', nargs='+', help='インポートするJSONファイル (.json)、ディレクトリ（配下の page*.json）またはglobパターン（例: "data/**/page*.json"）')
     parser.add_argument('--origin', required=True, help='音源データの音源元（例：xeno-canto）')
     parser.add_argument('--debug', '-d', action='store_true', help='データベースを初期化して処理（デバッグ用）')
     parser.add_argument('--verbose', '-v', action='store_true', help='詳細な出力を表示')
+    parser.add_argument('--db', help=f'データベースのパス（デフォルト: 環境変数 {call_database.DB_PATH_ENV}、なければ {call_database.DEFAULT_DB_PATH}）')
+    parser.add_argument('--stream', action='store_true', help='ファイル全体を読み込まずに逐次解析して挿入する（巨大なダンプ用。メモリ使用量が一定）')
+    parser.add_argument('--batch-size', type=int, default=STREAM_BATCH_SIZE, help=f'--stream で1回に挿入する件数（デフォルト: {STREAM_BATCH_SIZE}）')
+    parser.add_argument('--vacuum', action='store_true', help='インポートの後に空き領域を解放する（正規化前のデータベースを移行した後などに使う。ファイル全体を書き直すため時間がかかる）')
     
     args = parser.parse_args()
-    import_json_to_sqlite(args.json_file, args.origin, args.debug, args.verbose)
\ No newline at end of file
+    import_json_to_sqlite(args.json_files, args.origin, args.debug, args.verbose, args.stream, max(1, args.batch_size), args.db, args.vacuum)
\ No newline at end of file
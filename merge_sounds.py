@@ -4,6 +4,11 @@ import subprocess
 from datetime import datetime, timedelta
 import time  # 追加
 
+from utils import probe_cache
+
+# 解析結果キャッシュ（main()で開く。Noneの場合はキャッシュを使わない）
+audio_cache = None
+
 def usage():
     print("使用方法: python merge_sounds.py [オプション] <file1> <file2> ...")
     print("音声ファイルをソートして結合します。ファイル名は666形式である必要があります。")
@@ -12,6 +17,7 @@ def usage():
     print("オプション:")
     print("  -h ヘルプを表示")
     print("  -d デバッグモードを有効化")
+    print("  -nc 解析結果キャッシュを使わない（保存先は環境変数 SOUND_COMMAND_CACHE_DIR で変更可能）")
 
 def is_installed_ffmpeg():
     result = subprocess.run(
@@ -30,12 +36,11 @@ def is_installed_ffprobe():
     return result.returncode == 0
 
 def get_duration(file_path):
-    result = subprocess.run(
-        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", file_path],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    return float(result.stdout)
+    # ヘッダから長さを取得し、解析できない形式のみffprobeを使う
+    duration = probe_cache.get_duration(file_path, audio_cache)
+    if duration is None:
+        raise ValueError(f"ファイル '{file_path}' の長さを取得できません")
+    return duration
 
 def parse_filename(file_path):
     filename = os.path.basename(file_path)
@@ -77,7 +82,7 @@ def create_filelist(files, filelist_path):
             f.write(f"file '{file}'\n")
 
 def main():
-    global debug_mode
+    global debug_mode, audio_cache
     if len(sys.argv) < 2:
         usage()
         sys.exit(0)
@@ -92,12 +97,15 @@ def main():
         sys.exit(1)
 
     files=[]
+    use_cache = True
     for arg in sys.argv[1:]:
         if arg == "-h":
             usage()
             sys.exit(0)
         elif arg == "-d":
             debug_mode = True
+        elif arg == "-nc":
+            use_cache = False
         else:
             files.append(arg)
 
@@ -112,16 +120,21 @@ def main():
 
     # ファイルをソート
     sorted_files = sorted(files)
-    for file in sorted_files:
-        duration = get_duration(file)
-        total_duration += duration
-        if debug_mode:
-            duration_str = f"{int(duration // 3600)}:{int(duration % 3600 // 60)}:{duration % 60}"
-            total_duration_str = f"{int(total_duration // 3600)}:{int(total_duration % 3600 // 60)}:{total_duration % 60}"
-            print(f"デバッグ: filepath=\"{file}\" duration=\"{duration_str}\" total_duration=\"{total_duration_str}\"")
-        _, remaining_name, ext = parse_filename(file)
-        original_names += f"_{remaining_name}"
-        ext_parts.append(ext)
+    audio_cache = probe_cache.open_cache(enabled=use_cache)
+    try:
+        for file in sorted_files:
+            duration = get_duration(file)
+            total_duration += duration
+            if debug_mode:
+                duration_str = f"{int(duration // 3600)}:{int(duration % 3600 // 60)}:{duration % 60}"
+                total_duration_str = f"{int(total_duration // 3600)}:{int(total_duration % 3600 // 60)}:{total_duration % 60}"
+                print(f"デバッグ: filepath=\"{file}\" duration=\"{duration_str}\" total_duration=\"{total_duration_str}\"")
+            _, remaining_name, ext = parse_filename(file)
+            original_names += f"_{remaining_name}"
+            ext_parts.append(ext)
+    finally:
+        if audio_cache is not None:
+            audio_cache.close()
         
     # すべての拡張子が同じかチェック
     if len(set(ext_parts)) != 1:
@@ -4,6 +4,11 @@ import subprocess
 from datetime import datetime, timedelta
 import time  # 追加
 
+from utils import probe_cache
+
+# 解析結果キャッシュ（main()で開く。Noneの場合はキャッシュを使わない）
+audio_cache = None
+
 def usage():
     print("使用方法: python merge_sounds_same_birth_time.py [オプション] <ディレクトリ>")
     print("ディレクトリ内のファイルを読み込み、ModifyTimeが同じファイルをマージします。")
@@ -14,6 +19,7 @@ def usage():
     print("  -e [date] [time] タイムスタンプを指定する")
     print("  -h ヘルプを表示")
     print("  -d デバッグモードを有効化")
+    print("  -nc 解析結果キャッシュを使わない（保存先は環境変数 SOUND_COMMAND_CACHE_DIR で変更可能）")
 
 def get_mtime(file_path):
     stat = os.stat(file_path)
@@ -21,12 +27,11 @@ def get_mtime(file_path):
     return mtime
 
 def get_duration(file_path):
-    result = subprocess.run(
-        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", file_path],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    return float(result.stdout)
+    # ヘッダから長さを取得し、解析できない形式のみffprobeを使う
+    duration = probe_cache.get_duration(file_path, audio_cache)
+    if duration is None:
+        raise ValueError(f"ファイル '{file_path}' の長さを取得できません")
+    return duration
 
 def merge_files(files, output_file):
     input_files = '|'.join(files)
@@ -59,7 +64,7 @@ def create_filelist(files, filelist_path):
             f.write(f"file '{file}'\n")
 
 def main():
-    global debug_mode
+    global debug_mode, audio_cache
     if len(sys.argv) < 2:
         usage()
         sys.exit(0)
@@ -67,6 +72,7 @@ def main():
     mode = "-S"
     debug_mode = False
     directory = None
+    use_cache = True
 
     for arg in sys.argv[1:]:
         if arg == "-h":
@@ -74,6 +80,8 @@ def main():
             sys.exit(0)
         elif arg == "-d":
             debug_mode = True
+        elif arg == "-nc":
+            use_cache = False
         elif arg in ["-S", "-E", "-e"]:
             mode = arg
             if mode == "-e":
@@ -104,25 +112,30 @@ def main():
     # ソートされたsound_filesからファイル名を取り出す
     sorted_sound_files = [os.path.normpath(os.path.join(directory, file)) for file in sound_files]
 
-    for file in sorted_sound_files:
-        file_path = os.path.join(directory, file)
-        mtime = get_mtime(file_path)
+    audio_cache = probe_cache.open_cache(enabled=use_cache)
+    try:
+        for file in sorted_sound_files:
+            file_path = os.path.join(directory, file)
+            mtime = get_mtime(file_path)
         
-        # mtime_dictにキーが存在しない場合、新しいリストを作成
-        if mtime not in mtime_dict:
-            mtime_dict[mtime] = []
+            # mtime_dictにキーが存在しない場合、新しいリストを作成
+            if mtime not in mtime_dict:
+                mtime_dict[mtime] = []
         
-        mtime_dict[mtime].append(file_path)
-
-        duration = get_duration(file_path)
-        total_duration += duration
-        if debug_mode:
-            duration_str = f"{int(duration // 3600)}:{int(duration % 3600 // 60)}:{duration % 60}"
-            total_duration_str = f"{int(total_duration // 3600)}:{int(total_duration % 3600 // 60)}:{total_duration % 60}"
-            print(f"デバッグ: filepath=\"{file_path}\" ModifyTime=\"{mtime.strftime('%Y-%m-%d %H:%M:%S')}\" duration=\"{duration_str}\" total_duration=\"{total_duration_str}\"")
-        _, remaining_name, ext = parse_filename(file_path)
-        original_names += f"_{remaining_name}"
-        ext_parts.append(ext)
+            mtime_dict[mtime].append(file_path)
+
+            duration = get_duration(file_path)
+            total_duration += duration
+            if debug_mode:
+                duration_str = f"{int(duration // 3600)}:{int(duration % 3600 // 60)}:{duration % 60}"
+                total_duration_str = f"{int(total_duration // 3600)}:{int(total_duration % 3600 // 60)}:{total_duration % 60}"
+                print(f"デバッグ: filepath=\"{file_path}\" ModifyTime=\"{mtime.strftime('%Y-%m-%d %H:%M:%S')}\" duration=\"{duration_str}\" total_duration=\"{total_duration_str}\"")
+            _, remaining_name, ext = parse_filename(file_path)
+            original_names += f"_{remaining_name}"
+            ext_parts.append(ext)
+    finally:
+        if audio_cache is not None:
+            audio_cache.close()
         
     # すべての拡張子が同じかチェック
     if len(set(ext_parts)) != 1:
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import argparse
+import sqlite3
+import sys
+import time
+
+from utils import call_database
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='音声メタデータのデータベースを全文検索します（remarks, loc, en, rec, type）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+例:
+  search_sound_metadata.py "dawn chorus"
+  search_sound_metadata.py --origin xeno-canto Tokyo flight*
+  search_sound_metadata.py --raw 'loc:Hokkaido AND (call OR song)'
+  search_sound_metadata.py --rebuild
+''')
+    parser.add_argument('query', nargs='*', help='検索する語（空白区切りで全ての語を含むレコードに一致。末尾に * で前方一致）')
+    parser.add_argument('--db', help=f'データベースのパス（デフォルト: 環境変数 {call_database.DB_PATH_ENV}、なければ {call_database.DEFAULT_DB_PATH}）')
+    parser.add_argument('-n', '--limit', type=int, default=20, help='表示する最大件数（デフォルト: 20）')
+    parser.add_argument('--origin', help='音源元で絞り込む（例：xeno-canto）')
+    parser.add_argument('--raw', action='store_true', help='queryをFTS5の検索式としてそのまま使う（列の指定 loc:... や AND/OR/NOT）')
+    parser.add_argument('--rebuild', action='store_true', help='全文検索の索引を作り直す')
+    args = parser.parse_args()
+
+    if not args.query and not args.rebuild:
+        parser.error('検索する語を指定してください')
+
+    start_time = time.perf_counter()
+    try:
+        if args.rebuild:
+            conn = call_database.connect(args.db)
+            try:
+                call_database.rebuild_search_index(conn)
+            finally:
+                conn.close()
+            print(f"全文検索の索引を作り直しました（{time.perf_counter() - start_time:.2f}秒）")
+            if not args.query:
+                return
+            start_time = time.perf_counter()
+
+        conn = call_database.connect_readonly(args.db)
+        try:
+            results = call_database.search(conn, ' '.join(args.query), args.limit, args.origin, args.raw)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    for origin, recording_id, gen, sp, en, rank, snippet in results:
+        print(f"{origin}:{recording_id}\t{gen} {sp} ({en})\t{-rank:.2f}\t{snippet}")
+    print(f"{len(results)}件（{elapsed_ms:.1f} ms）")
+
+if __name__ == "__main__":
+    main()
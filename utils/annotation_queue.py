@@ -0,0 +1,171 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import time
+
+# 取り出した録音を他の人に渡さない時間（秒）。過ぎると再び取り出せるようになる
+DEFAULT_LEASE_SECONDS = 3600
+
+def get_species_id(conn, species):
+    """
+    学名（"Parus minor"）または英名から種のidを返す
+
+    Raises
+    ------
+    ValueError
+        種が見つからない場合
+    """
+    parts = species.split()
+    row = None
+    if len(parts) == 2:
+        row = conn.execute('SELECT id FROM species WHERE gen = ? COLLATE NOCASE AND sp = ? COLLATE NOCASE', parts).fetchone()
+    if row is None:
+        row = conn.execute('SELECT id FROM species WHERE en = ? COLLATE NOCASE', (species,)).fetchone()
+    if row is None:
+        raise ValueError(f"種が見つかりません: {species}")
+    return row[0]
+
+def _filter(conn, species=None, quality=None, origin=None):
+    """種・品質・音源元の絞り込みのJOIN句・WHERE句とパラメータを返す"""
+    join = ''
+    where = []
+    params = []
+    if species or quality:
+        join = 'JOIN recordings r ON r.origin = a.origin AND r.recording_id = a.recording_id'
+        if species:
+            where.append('r.species_id = ?')
+            params.append(get_species_id(conn, species))
+        if quality:
+            where.append(f"r.quality IN ({', '.join('?' * len(quality))})")
+            params.extend(quality)
+    if origin:
+        where.append('a.origin = ?')
+        params.append(origin)
+    return join, where, params
+
+def claim(conn, annotator, limit=1, species=None, quality=None, origin=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    未アノテーションの録音を最大limit件取り出し、annotatorの作業中にする
+
+    取り出しは BEGIN IMMEDIATE のトランザクション内の1つの UPDATE ... RETURNING で行うため、
+    複数の人が同時に取り出しても同じ録音が2人に渡ることはない。
+    取り出してからlease_seconds秒経っても完了していない録音は、再び取り出せるようになる。
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        call_database.connect() の接続
+    annotator : str
+        作業者の名前
+    limit : int, optional
+        取り出す最大件数
+    species : str, optional
+        学名（"Parus minor"）または英名で絞り込む
+    quality : list of str, optional
+        品質（'A', 'B' など）で絞り込む
+    origin : str, optional
+        音源元で絞り込む
+
+    Returns
+    -------
+    list of tuple
+        取り出した録音の (origin, recording_id)
+    """
+    now = int(time.time())
+    join, where, params = _filter(conn, species, quality, origin)
+    where = ['a.is_annotated = 0', 'a.claimed_at < ?'] + where
+    conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        claimed = conn.execute(f'''
+            UPDATE annotation_status SET claimed_by = ?, claimed_at = ?
+            WHERE id IN (
+                SELECT a.id FROM annotation_status a {join}
+                WHERE {' AND '.join(where)}
+                LIMIT ?
+            )
+            RETURNING origin, recording_id
+        ''', [annotator, now, now - lease_seconds] + params + [limit]).fetchall()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return sorted(claimed)
+
+def mark_done(conn, annotator, items, count=None):
+    """
+    annotatorが取り出している録音をアノテーション済みにする
+
+    取り出していない録音や、期限が切れて他の作業者に取り出された録音は更新しない
+    （他の作業者の結果を上書きしないため）。
+
+    Parameters
+    ----------
+    items : list of tuple
+        (origin, recording_id) のリスト
+    count : int, optional
+        アノテーションの数（counts_annotation）。Noneの場合は変更しない
+
+    Returns
+    -------
+    list of tuple
+        アノテーション済みにした (origin, recording_id) のリスト。
+        itemsのうち含まれないものは取り出しが失われている
+    """
+    now = int(time.time())
+    done = []
+    try:
+        for origin, recording_id in items:
+            done += conn.execute('''
+                UPDATE annotation_status
+                SET is_annotated = 1, counts_annotation = COALESCE(?, counts_annotation),
+                    annotated_by = ?, annotated_at = ?, claimed_by = NULL, claimed_at = 0
+                WHERE origin = ? AND recording_id = ? AND claimed_by = ?
+                RETURNING origin, recording_id
+            ''', (count, annotator, now, origin, recording_id, annotator)).fetchall()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return done
+
+def release(conn, annotator, items=None):
+    """
+    annotatorが取り出した未完了の録音を戻す（itemsを省略した場合は全て）
+
+    Returns
+    -------
+    int
+        戻した件数
+    """
+    sql = 'UPDATE annotation_status SET claimed_by = NULL, claimed_at = 0 WHERE claimed_by = ? AND is_annotated = 0'
+    if items is None:
+        cursor = conn.execute(sql, (annotator,))
+    else:
+        cursor = conn.executemany(sql + ' AND origin = ? AND recording_id = ?',
+                                  [(annotator, origin, recording_id) for origin, recording_id in items])
+    conn.commit()
+    return cursor.rowcount
+
+def progress(conn, species=None, quality=None, origin=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    種毎のアノテーションの進み具合を返す
+
+    Returns
+    -------
+    list of tuple
+        (gen, sp, en, 録音数, アノテーション済み, 作業中) を学名の順に
+    """
+    join, where, params = _filter(conn, species, quality, origin)
+    if not join:
+        join = 'JOIN recordings r ON r.origin = a.origin AND r.recording_id = a.recording_id'
+    return conn.execute(f'''
+        SELECT s.gen, s.sp, s.en, COUNT(*),
+               SUM(a.is_annotated != 0),
+               SUM(a.is_annotated = 0 AND a.claimed_at >= ?)
+        FROM annotation_status a {join}
+        JOIN species s ON s.id = r.species_id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        GROUP BY s.id
+        ORDER BY s.gen, s.sp
+    ''', [int(time.time()) - lease_seconds] + params).fetchall()
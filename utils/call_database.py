@@ -0,0 +1,662 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import os
+import re
+import sqlite3
+from datetime import datetime
+from urllib.parse import quote
+
+# データベースのパスを指定する環境変数
+DB_PATH_ENV = 'CALL_DATABASE_PATH'
+DEFAULT_DB_PATH = '/var/www/data/call-database/call-database.db'
+
+# ロックされている場合に待つ時間（ミリ秒）
+BUSY_TIMEOUT_MS = 10000
+# ページキャッシュの大きさ（KiB）とメモリマップするサイズ（バイト）
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 << 20
+
+# スキーマの移行（user_version が i の場合、MIGRATIONS[i:] を順に適用する）
+MIGRATIONS = [
+    # 1: sound_metadata と annotation_status
+    '''
+    CREATE TABLE IF NOT EXISTS sound_metadata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        origin TEXT NOT NULL,
+        recording_id INTEGER NOT NULL,
+        page INTEGER NOT NULL,
+        num_recordings INTEGER NOT NULL,
+        num_species INTEGER NOT NULL,
+        num_pages INTEGER NOT NULL,
+        gen TEXT NOT NULL,
+        sp TEXT NOT NULL,
+        ssp TEXT,
+        group_name TEXT,
+        en TEXT,
+        rec TEXT,
+        cnt TEXT,
+        loc TEXT,
+        lat TEXT,
+        lng TEXT,
+        alt TEXT,
+        type TEXT,
+        sex TEXT,
+        stage TEXT,
+        method TEXT,
+        url TEXT,
+        file TEXT,
+        file_name TEXT,
+        ext TEXT,
+        sono_small TEXT,
+        sono_med TEXT,
+        sono_large TEXT,
+        sono_full TEXT,
+        osci_small TEXT,
+        osci_med TEXT,
+        osci_large TEXT,
+        lic TEXT,
+        quality TEXT,
+        length TEXT,
+        time TEXT,
+        date TEXT,
+        uploaded TEXT,
+        remarks TEXT,
+        bird_seen TEXT,
+        animal_seen TEXT,
+        playback_used TEXT,
+        temp TEXT,
+        regnr TEXT,
+        auto TEXT,
+        dvc TEXT,
+        mic TEXT,
+        smp TEXT,
+        UNIQUE(origin, recording_id),
+        UNIQUE(origin, gen, sp, recording_id)
+    );
+    CREATE TABLE IF NOT EXISTS annotation_status (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        origin TEXT NOT NULL,
+        recording_id INTEGER NOT NULL,
+        is_annotated BOOLEAN DEFAULT FALSE,
+        counts_annotation INTEGER DEFAULT 0,
+        FOREIGN KEY (origin, recording_id) REFERENCES sound_metadata(origin, recording_id),
+        UNIQUE(origin, recording_id)
+    );
+    ''',
+    # 2: 全文検索（FTS5）。sound_metadataを外部コンテンツとし、トリガーで同期する
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS sound_metadata_fts USING fts5(
+        remarks, loc, en, rec, type,
+        content = 'sound_metadata', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS sound_metadata_fts_insert AFTER INSERT ON sound_metadata BEGIN
+        INSERT INTO sound_metadata_fts (rowid, remarks, loc, en, rec, type)
+        VALUES (new.id, new.remarks, new.loc, new.en, new.rec, new.type);
+    END;
+    CREATE TRIGGER IF NOT EXISTS sound_metadata_fts_delete AFTER DELETE ON sound_metadata BEGIN
+        INSERT INTO sound_metadata_fts (sound_metadata_fts, rowid, remarks, loc, en, rec, type)
+        VALUES ('delete', old.id, old.remarks, old.loc, old.en, old.rec, old.type);
+    END;
+    CREATE TRIGGER IF NOT EXISTS sound_metadata_fts_update AFTER UPDATE OF remarks, loc, en, rec, type ON sound_metadata BEGIN
+        INSERT INTO sound_metadata_fts (sound_metadata_fts, rowid, remarks, loc, en, rec, type)
+        VALUES ('delete', old.id, old.remarks, old.loc, old.en, old.rec, old.type);
+        INSERT INTO sound_metadata_fts (rowid, remarks, loc, en, rec, type)
+        VALUES (new.id, new.remarks, new.loc, new.en, new.rec, new.type);
+    END;
+    INSERT INTO sound_metadata_fts (sound_metadata_fts) VALUES ('rebuild');
+    ''',
+    # 3: 正規化したスキーマ（sound_metadataは互換用のビューになる）
+    lambda conn: migrate_to_normalized(conn),
+    # 4: アノテーションの作業キュー（utils/annotation_queue.py）
+    '''
+    ALTER TABLE annotation_status ADD COLUMN claimed_by TEXT;
+    ALTER TABLE annotation_status ADD COLUMN claimed_at INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE annotation_status ADD COLUMN annotated_by TEXT;
+    ALTER TABLE annotation_status ADD COLUMN annotated_at INTEGER;
+    -- 未アノテーションの録音を取り出す（条件なし）ための部分索引
+    CREATE INDEX idx_annotation_status_pending ON annotation_status(claimed_at, origin, recording_id)
+        WHERE is_annotated = 0;
+    -- 種・品質で絞り込んで取り出すためのカバリング索引
+    CREATE INDEX idx_annotation_status_claim ON annotation_status(origin, recording_id, is_annotated, claimed_at);
+    DROP INDEX IF EXISTS idx_recordings_species;
+    CREATE INDEX idx_recordings_species_quality ON recordings(species_id, quality, origin, recording_id);
+    ''',
+    # 5: 英名・グループ名を録音毎に保存する（speciesには最後にインポートした値）
+    lambda conn: add_recording_species_names(conn),
+]
+
+# 全文検索の対象のカラム（sound_metadata_ftsの列の順）
+SEARCH_COLUMNS = ('remarks', 'loc', 'en', 'rec', 'type')
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# sound_metadata（互換用のビュー）の列のうち、json_to_sqlite.py が挿入する列（idを除く）
+METADATA_COLUMNS = (
+    'origin', 'page', 'num_recordings', 'num_species', 'num_pages',
+    'recording_id', 'gen', 'sp', 'ssp', 'group_name', 'en',
+    'rec', 'cnt', 'loc', 'lat', 'lng', 'alt', 'type', 'sex',
+    'stage', 'method', 'url', 'file', 'file_name', 'ext',
+    'sono_small', 'sono_med', 'sono_large', 'sono_full',
+    'osci_small', 'osci_med', 'osci_large',
+    'lic', 'quality', 'length', 'time', 'date', 'uploaded',
+    'remarks', 'bird_seen', 'animal_seen', 'playback_used',
+    'temp', 'regnr', 'auto', 'dvc', 'mic', 'smp'
+)
+
+# recording_idと {key}（xeno-cantoのアップロード先のディレクトリ名）から組み立てるURLの列
+URL_COLUMNS = ('url', 'file', 'sono_small', 'sono_med', 'sono_large', 'sono_full',
+               'osci_small', 'osci_med', 'osci_large')
+URL_KEY_PATTERN = re.compile(r'/uploaded/([^/]+)/')
+
+# recordingsにそのまま保存する列（en・group_nameは録音毎の値。speciesには最後にインポートした値を保存する）
+RECORDING_TEXT_COLUMNS = ('ssp', 'en', 'group_name', 'rec', 'cnt', 'loc', 'alt', 'type', 'sex', 'stage', 'method',
+                          'file_name', 'ext', 'lic', 'quality', 'time', 'uploaded', 'remarks',
+                          'bird_seen', 'animal_seen', 'playback_used', 'temp', 'regnr', 'auto',
+                          'dvc', 'mic', 'smp')
+
+RECORDING_COLUMNS = (('origin', 'recording_id', 'page_id', 'species_id', 'url_template_id', 'url_key')
+                     + RECORDING_TEXT_COLUMNS
+                     + ('lat', 'lng', 'length_seconds', 'recorded_date',
+                        'lat_text', 'lng_text', 'length_text', 'date_text'))
+
+NORMALIZED_SCHEMA = '''
+CREATE TABLE species (
+    id INTEGER PRIMARY KEY,
+    gen TEXT NOT NULL,
+    sp TEXT NOT NULL,
+    en TEXT,
+    group_name TEXT,
+    UNIQUE(gen, sp)
+);
+CREATE TABLE pages (
+    id INTEGER PRIMARY KEY,
+    origin TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    num_recordings INTEGER NOT NULL,
+    num_species INTEGER NOT NULL,
+    num_pages INTEGER NOT NULL,
+    UNIQUE(origin, page, num_recordings, num_species, num_pages)
+);
+-- {id} は recording_id、{key} は recordings.url_key に置き換える
+CREATE TABLE url_templates (
+    id INTEGER PRIMARY KEY,
+    url TEXT, file TEXT,
+    sono_small TEXT, sono_med TEXT, sono_large TEXT, sono_full TEXT,
+    osci_small TEXT, osci_med TEXT, osci_large TEXT,
+    UNIQUE(url, file, sono_small, sono_med, sono_large, sono_full, osci_small, osci_med, osci_large)
+);
+-- lat/lng/length_seconds/recorded_date は型付きの値。*_text は元の文字列で、型付きの値から
+-- 元の文字列を復元できない場合（空文字・'2019-00-00' など）だけ保存する
+CREATE TABLE recordings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    recording_id INTEGER NOT NULL,
+    page_id INTEGER NOT NULL REFERENCES pages(id),
+    species_id INTEGER NOT NULL REFERENCES species(id),
+    url_template_id INTEGER REFERENCES url_templates(id),
+    url_key TEXT,
+    ssp TEXT, en TEXT, group_name TEXT, rec TEXT, cnt TEXT, loc TEXT, alt TEXT, type TEXT, sex TEXT, stage TEXT, method TEXT,
+    file_name TEXT, ext TEXT, lic TEXT, quality TEXT, time TEXT, uploaded TEXT, remarks TEXT,
+    bird_seen TEXT, animal_seen TEXT, playback_used TEXT, temp TEXT, regnr TEXT, auto TEXT,
+    dvc TEXT, mic TEXT, smp TEXT,
+    lat REAL,
+    lng REAL,
+    length_seconds INTEGER,
+    recorded_date TEXT,
+    lat_text TEXT,
+    lng_text TEXT,
+    length_text TEXT,
+    date_text TEXT,
+    UNIQUE(origin, recording_id)
+);
+CREATE INDEX idx_recordings_species ON recordings(species_id);
+CREATE INDEX idx_recordings_date ON recordings(recorded_date);
+CREATE INDEX idx_recordings_lat_lng ON recordings(lat, lng);
+CREATE TABLE annotation_status_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    recording_id INTEGER NOT NULL,
+    is_annotated BOOLEAN DEFAULT FALSE,
+    counts_annotation INTEGER DEFAULT 0,
+    FOREIGN KEY (origin, recording_id) REFERENCES recordings(origin, recording_id),
+    UNIQUE(origin, recording_id)
+);
+INSERT INTO annotation_status_new SELECT id, origin, recording_id, is_annotated, counts_annotation FROM annotation_status;
+DROP TABLE annotation_status;
+ALTER TABLE annotation_status_new RENAME TO annotation_status;
+'''
+
+# 互換用のビュー（以前のsound_metadataテーブルと同じ列・同じ値）
+SOUND_METADATA_VIEW = '''
+CREATE VIEW sound_metadata AS
+SELECT r.id, r.origin, r.recording_id, p.page, p.num_recordings, p.num_species, p.num_pages,
+       s.gen, s.sp, r.ssp, r.group_name, r.en, r.rec, r.cnt, r.loc,
+       COALESCE(r.lat_text, CAST(r.lat AS TEXT)) AS lat,
+       COALESCE(r.lng_text, CAST(r.lng AS TEXT)) AS lng,
+       r.alt, r.type, r.sex, r.stage, r.method,
+       {urls[0]} AS url, {urls[1]} AS file, r.file_name, r.ext,
+       {urls[2]} AS sono_small, {urls[3]} AS sono_med, {urls[4]} AS sono_large, {urls[5]} AS sono_full,
+       {urls[6]} AS osci_small, {urls[7]} AS osci_med, {urls[8]} AS osci_large,
+       r.lic, r.quality,
+       COALESCE(r.length_text, CASE
+           WHEN r.length_seconds >= 3600 THEN printf('%d:%02d:%02d', r.length_seconds / 3600, r.length_seconds / 60 % 60, r.length_seconds % 60)
+           ELSE printf('%d:%02d', r.length_seconds / 60, r.length_seconds % 60)
+       END) AS length,
+       r.time, COALESCE(r.date_text, r.recorded_date) AS date, r.uploaded, r.remarks,
+       r.bird_seen, r.animal_seen, r.playback_used, r.temp, r.regnr, r.auto, r.dvc, r.mic, r.smp
+FROM recordings r
+JOIN pages p ON p.id = r.page_id
+JOIN species s ON s.id = r.species_id
+LEFT JOIN url_templates u ON u.id = r.url_template_id
+'''.format(urls=[f"replace(replace(u.{column}, '{{key}}', COALESCE(r.url_key, '')), '{{id}}', r.recording_id)"
+                 for column in URL_COLUMNS])
+
+# 全文検索の索引（sound_metadata_fts）をrecordingsと同期するトリガー
+RECORDINGS_FTS_TRIGGERS = '''
+DROP TRIGGER IF EXISTS sound_metadata_fts_insert;
+DROP TRIGGER IF EXISTS sound_metadata_fts_delete;
+DROP TRIGGER IF EXISTS sound_metadata_fts_update;
+DROP TRIGGER IF EXISTS recordings_fts_insert;
+DROP TRIGGER IF EXISTS recordings_fts_delete;
+DROP TRIGGER IF EXISTS recordings_fts_update;
+CREATE TRIGGER recordings_fts_insert AFTER INSERT ON recordings BEGIN
+    INSERT INTO sound_metadata_fts (rowid, remarks, loc, en, rec, type)
+    VALUES (new.id, new.remarks, new.loc, new.en, new.rec, new.type);
+END;
+CREATE TRIGGER recordings_fts_delete AFTER DELETE ON recordings BEGIN
+    INSERT INTO sound_metadata_fts (sound_metadata_fts, rowid, remarks, loc, en, rec, type)
+    VALUES ('delete', old.id, old.remarks, old.loc, old.en, old.rec, old.type);
+END;
+CREATE TRIGGER recordings_fts_update AFTER UPDATE OF remarks, loc, en, rec, type ON recordings BEGIN
+    INSERT INTO sound_metadata_fts (sound_metadata_fts, rowid, remarks, loc, en, rec, type)
+    VALUES ('delete', old.id, old.remarks, old.loc, old.en, old.rec, old.type);
+    INSERT INTO sound_metadata_fts (rowid, remarks, loc, en, rec, type)
+    VALUES (new.id, new.remarks, new.loc, new.en, new.rec, new.type);
+END;
+'''
+
+# 移行時に一度に読み込む行数
+MIGRATE_BATCH_SIZE = 10000
+
+def default_db_path():
+    """データベースのパスを返す（環境変数 > DEFAULT_DB_PATH の順）"""
+    return os.environ.get(DB_PATH_ENV) or DEFAULT_DB_PATH
+
+def configure(conn, read_only=False):
+    """
+    接続にPRAGMAを設定する
+
+    書き込み用の接続はWALモードにし、インポート中もWebのフロントエンドなどが
+    読み込めるようにする（WALでは読み込みと書き込みが互いを待たない）。
+    """
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    if read_only:
+        conn.execute('PRAGMA query_only = ON')
+    else:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def execute_statements(conn, script):
+    """SQL文を1つずつ実行する（executescript()と違い、途中でコミットしない）"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+
+def migrate(conn):
+    """
+    user_version を見て未適用のスキーマの移行を順に適用する
+
+    各移行は user_version の更新と同じトランザクションで行うため、途中で失敗しても
+    中途半端な状態にはならない。移行はSQL文か、接続を受け取る関数。
+    正規化したスキーマに移した後の空き領域は解放しない（ファイル全体を書き直すため、
+    必要な場合は vacuum() を明示的に呼ぶ）。
+
+    Returns
+    -------
+    int
+        移行後のスキーマのバージョン
+    """
+    version = get_schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"データベースのスキーマ（バージョン {version}）はこのスクリプト（バージョン {SCHEMA_VERSION}）より新しいです")
+    for target, step in enumerate(MIGRATIONS[version:], version + 1):
+        conn.commit()
+        conn.execute('BEGIN')
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                execute_statements(conn, step)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return SCHEMA_VERSION
+
+def vacuum(conn):
+    """
+    空き領域を解放する（VACUUM）
+
+    データベースのファイル全体を書き直すため、大きなデータベースでは時間がかかり、
+    一時的にデータベースと同じ程度の空きディスク容量が必要になる。実行中は他の接続から
+    書き込めない。正規化したスキーマへの移行後など、大量の行を削除した後に使う。
+    """
+    conn.commit()
+    conn.execute('VACUUM')
+
+def connect(db_path=None, migrate_schema=True):
+    """
+    書き込み用の接続を開く（必要ならスキーマを移行する）
+
+    Parameters
+    ----------
+    db_path : str, optional
+        データベースのパス。Noneの場合はdefault_db_path()
+    migrate_schema : bool, optional
+        Trueの場合は未適用のスキーマの移行を適用する
+
+    Returns
+    -------
+    sqlite3.Connection
+    """
+    db_path = db_path or default_db_path()
+    if db_path != ':memory:':
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = configure(sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000))
+    if migrate_schema:
+        migrate(conn)
+    return conn
+
+def connect_readonly(db_path=None):
+    """
+    検索ツール用の読み込み専用の接続を開く
+
+    mode=ro で開くため、データベースが存在しない場合や誤って書き込もうとした場合は
+    sqlite3.OperationalError になる。インポート中でも（WALモードのため）待たずに読める。
+    読み込み専用ではスキーマを移行できないため、スキーマのバージョンが異なる場合は
+    sqlite3.DatabaseError にする。
+    """
+    db_path = db_path or default_db_path()
+    conn = sqlite3.connect(f'file:{quote(os.path.abspath(db_path))}?mode=ro', uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        configure(conn, read_only=True)
+        version = get_schema_version(conn)
+        if version < SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(
+                f"データベースのスキーマ（バージョン {version}）が古いです。json_to_sqlite.py でインポートするか "
+                f"call_database.connect() で開いてバージョン {SCHEMA_VERSION} に移行してください: {db_path}")
+        if version > SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(
+                f"データベースのスキーマ（バージョン {version}）はこのスクリプト（バージョン {SCHEMA_VERSION}）より新しいです")
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+# --- 正規化したスキーマへの変換 ---
+
+def to_real(text):
+    """緯度・経度の文字列を (数値, 元の文字列) に変換する。数値から復元できる場合は元の文字列はNone"""
+    if text is None:
+        return None, None
+    try:
+        value = float(text)
+    except (TypeError, ValueError):
+        return None, text
+    # SQLiteは有効桁数15桁で文字列に戻すため、それを超える場合は元の文字列も保存する
+    digits = len(str(text).lstrip('-').replace('.', '').lstrip('0'))
+    if repr(value) == str(text) and digits <= 15:
+        return value, None
+    return value, str(text)
+
+def format_length(seconds):
+    """秒数をxeno-cantoの長さの形式（m:ss または h:mm:ss）にする"""
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def to_length_seconds(text):
+    """長さの文字列（m:ss, h:mm:ss）を (秒数, 元の文字列) に変換する"""
+    if text is None:
+        return None, None
+    parts = str(text).split(':')
+    if not all(part.isdigit() for part in parts) or len(parts) > 3:
+        return None, text
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds, (None if format_length(seconds) == text else text)
+
+def to_iso_date(text):
+    """録音日の文字列を (ISO形式の日付, 元の文字列) に変換する。'2019-00-00' などは日付をNoneにする"""
+    if text is None:
+        return None, None
+    try:
+        datetime.strptime(text, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None, text
+    return (text, None) if len(text) == 10 else (None, text)
+
+def to_url_template(value, recording_id, key):
+    """URLのrecording_idを {id} に、アップロード先のディレクトリ名を {key} に置き換える"""
+    if not value:
+        return value
+    if key:
+        value = value.replace(f'/uploaded/{key}/', '/uploaded/{key}/')
+    return re.sub(rf'(?<!\d){re.escape(str(recording_id))}(?!\d)', '{id}', value)
+
+def insert_metadata(conn, rows):
+    """
+    録音データを正規化したテーブルに挿入する
+
+    種・ページ情報・URLのテンプレートはそれぞれ1回だけ保存し、recordingsからはidで参照する。
+    英名・グループ名は録音毎にrecordingsに保存し、speciesの値は最後に挿入した録音の値に更新する。
+    既に存在する録音（UNIQUE(origin, recording_id)）は種・ページ情報・URLのテンプレートを
+    追加・更新する前に除くため、重複した録音を再インポートしてもこれらは変わらない。
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        書き込み用の接続
+    rows : iterable of tuple
+        METADATA_COLUMNSの順の値。先頭にidを付けたタプルの場合（長さが1つ多い）はそのidで挿入する
+
+    Returns
+    -------
+    int
+        recordingsに挿入した件数
+    """
+    cache = {}
+
+    def lookup(table, columns, values, extra_columns=(), extra_values=()):
+        # 種・ページ情報・URLのテンプレートのidを返す（なければextraの列と一緒に追加し、
+        # あればextraの列を最後の値に更新する）
+        cache_key = (table, values)
+        if cache_key not in cache:
+            where = ' AND '.join(f'{column} IS ?' for column in columns)
+            row = conn.execute(f"SELECT {', '.join(('id',) + extra_columns)} FROM {table} WHERE {where}", values).fetchone()
+            if row is None:
+                insert_columns = columns + extra_columns
+                conn.execute(f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+                             f"VALUES ({', '.join('?' * len(insert_columns))})", values + extra_values)
+                row = conn.execute(f'SELECT id FROM {table} WHERE {where}', values).fetchone() + extra_values
+            cache[cache_key] = row
+        row = cache[cache_key]
+        if tuple(row[1:]) != extra_values:
+            assignments = ', '.join(f'{column} = ?' for column in extra_columns)
+            conn.execute(f'UPDATE {table} SET {assignments} WHERE id = ?', extra_values + (row[0],))
+            cache[cache_key] = (row[0],) + extra_values
+        return row[0]
+
+    with_id = []
+    without_id = []
+    seen = set()
+    for row in rows:
+        record_id = row[0] if len(row) > len(METADATA_COLUMNS) else None
+        r = dict(zip(METADATA_COLUMNS, row[1:] if record_id is not None else row))
+        recording_key = (r['origin'], r['recording_id'])
+        if recording_key in seen or conn.execute('SELECT 1 FROM recordings WHERE origin = ? AND recording_id = ?',
+                                                 recording_key).fetchone():
+            continue
+        seen.add(recording_key)
+        key = next((m.group(1) for m in (URL_KEY_PATTERN.search(r[c] or '') for c in URL_COLUMNS) if m), None)
+        templates = tuple(to_url_template(r[c], r['recording_id'], key) for c in URL_COLUMNS)
+        lat, lat_text = to_real(r['lat'])
+        lng, lng_text = to_real(r['lng'])
+        length_seconds, length_text = to_length_seconds(r['length'])
+        recorded_date, date_text = to_iso_date(r['date'])
+        values = (
+            r['origin'], r['recording_id'],
+            lookup('pages', ('origin', 'page', 'num_recordings', 'num_species', 'num_pages'),
+                   (r['origin'], r['page'], r['num_recordings'], r['num_species'], r['num_pages'])),
+            lookup('species', ('gen', 'sp'), (r['gen'], r['sp']), ('en', 'group_name'), (r['en'], r['group_name'])),
+            lookup('url_templates', URL_COLUMNS, templates),
+            key,
+            *(r[c] for c in RECORDING_TEXT_COLUMNS),
+            lat, lng, length_seconds, recorded_date,
+            lat_text, lng_text, length_text, date_text,
+        )
+        if record_id is not None:
+            with_id.append((record_id,) + values)
+        else:
+            without_id.append(values)
+
+    inserted = 0
+    cursor = conn.cursor()
+    if with_id:
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO recordings (id, {', '.join(RECORDING_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(RECORDING_COLUMNS) + 1))})", with_id)
+        inserted += cursor.rowcount
+    if without_id:
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO recordings ({', '.join(RECORDING_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(RECORDING_COLUMNS))})", without_id)
+        inserted += cursor.rowcount
+    return inserted
+
+def get_page_id(conn, origin, page_info):
+    """ページ情報 (page, num_recordings, num_species, num_pages) のidを返す（なければ追加する）"""
+    values = (origin, *page_info)
+    conn.execute('INSERT OR IGNORE INTO pages (origin, page, num_recordings, num_species, num_pages) VALUES (?, ?, ?, ?, ?)', values)
+    return conn.execute('SELECT id FROM pages WHERE origin = ? AND page = ? AND num_recordings = ? '
+                        'AND num_species = ? AND num_pages = ?', values).fetchone()[0]
+
+def migrate_to_normalized(conn):
+    """
+    sound_metadataテーブルを正規化したテーブルに移し、互換用のビューに置き換える
+
+    idはそのまま引き継ぐため、全文検索の索引やannotation_statusはそのまま使える。
+    """
+    execute_statements(conn, NORMALIZED_SCHEMA)
+    execute_statements(conn, 'DROP TRIGGER IF EXISTS sound_metadata_fts_insert;\n'
+                             'DROP TRIGGER IF EXISTS sound_metadata_fts_delete;\n'
+                             'DROP TRIGGER IF EXISTS sound_metadata_fts_update;\n')
+    old = conn.execute(f"SELECT id, {', '.join(METADATA_COLUMNS)} FROM sound_metadata ORDER BY id")
+    while True:
+        rows = old.fetchmany(MIGRATE_BATCH_SIZE)
+        if not rows:
+            break
+        insert_metadata(conn, rows)
+    conn.execute('DROP TABLE sound_metadata')
+    conn.execute(SOUND_METADATA_VIEW)
+    execute_statements(conn, RECORDINGS_FTS_TRIGGERS)
+
+def add_recording_species_names(conn):
+    """
+    recordingsに英名・グループ名の列を追加し、ビューと全文検索のトリガーを録音毎の値に切り替える
+
+    以前のスキーマではspeciesに最初にインポートした値しか残っていないため、その値で埋める。
+    正規化の移行（3）で作ったrecordingsには既に列があるため、ない場合だけ追加する。
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(recordings)')}
+    if 'en' not in columns:
+        conn.execute('ALTER TABLE recordings ADD COLUMN en TEXT')
+        conn.execute('ALTER TABLE recordings ADD COLUMN group_name TEXT')
+        conn.execute('UPDATE recordings SET (en, group_name) = '
+                     '(SELECT en, group_name FROM species WHERE species.id = recordings.species_id)')
+    conn.execute('DROP VIEW IF EXISTS sound_metadata')
+    conn.execute(SOUND_METADATA_VIEW)
+    execute_statements(conn, RECORDINGS_FTS_TRIGGERS)
+
+def rebuild_search_index(conn):
+    """全文検索の索引をsound_metadataから作り直し、最適化する"""
+    conn.execute("INSERT INTO sound_metadata_fts (sound_metadata_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO sound_metadata_fts (sound_metadata_fts) VALUES ('optimize')")
+    conn.commit()
+
+def to_match_query(text):
+    """
+    自由入力の文字列をFTS5の検索式に変換する
+
+    空白で区切った語をそれぞれフレーズとして引用符で囲むため、記号を含んでいても
+    構文エラーにならない（全ての語を含むレコードに一致する）。末尾が * の語は前方一致にする。
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*') and len(word) > 1
+        word = word.rstrip('*') if prefix else word
+        terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+def search(conn, query, limit=20, origin=None, raw=False, snippet_tokens=12):
+    """
+    全文検索を行い、関連度の高い順に返す
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        connect() または connect_readonly() の接続
+    query : str
+        検索する文字列。raw=Trueの場合はFTS5の検索式（例: 'loc:Tokyo AND (call OR song)'）
+    limit : int, optional
+        返す最大件数
+    origin : str, optional
+        指定した場合はその音源元のレコードだけを返す
+
+    Returns
+    -------
+    list of tuple
+        (origin, recording_id, gen, sp, en, 関連度（bm25。小さいほど関連が高い）, 一致箇所の抜粋)
+    """
+    match = query if raw else to_match_query(query)
+    where = 'sound_metadata_fts MATCH ?'
+    params = [match]
+    if origin:
+        where += ' AND m.origin = ?'
+        params.append(origin)
+    params.append(limit)
+    return conn.execute(f'''
+        SELECT m.origin, m.recording_id, m.gen, m.sp, m.en,
+               bm25(sound_metadata_fts) AS rank,
+               snippet(sound_metadata_fts, -1, '[', ']', '…', {int(snippet_tokens)})
+        FROM sound_metadata_fts
+        JOIN sound_metadata m ON m.id = sound_metadata_fts.rowid
+        WHERE {where}
+        ORDER BY rank
+        LIMIT ?
+    ''', params).fetchall()
+
+def reset(conn):
+    """全てのビューとテーブルを削除してスキーマを作り直す（デバッグ用）"""
+    objects = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('view', 'table') AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY type = 'table', rowid").fetchall()
+    conn.execute('PRAGMA foreign_keys = OFF')
+    for object_type, name in objects:
+        conn.execute(f'DROP {object_type.upper()} IF EXISTS "{name}"')
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+    migrate(conn)
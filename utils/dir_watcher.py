@@ -0,0 +1,129 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotifyのイベントマスク（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+class DirectoryWatcher:
+    """
+    ディレクトリ直下のファイルの追加・更新を監視するクラス
+
+    Linuxではinotifyを使い、使えない環境（macOSなど）ではディレクトリを
+    定期的に走査するポーリングで代用する。ポーリングでは新しく現れた
+    ファイル名だけを報告するため、大量のファイルがあってもstatは発生しない。
+    """
+
+    def __init__(self, directories, poll_interval=5.0, use_inotify=True):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.poll_interval = poll_interval
+        self.inotify_fd = None
+        self.watch_dirs = {}
+        self.known_names = {}
+
+        if use_inotify and sys.platform.startswith('linux'):
+            self._init_inotify()
+        if self.inotify_fd is None:
+            for directory in self.directories:
+                self.known_names[directory] = self._list_names(directory)
+
+    @property
+    def backend(self):
+        return 'inotify' if self.inotify_fd is not None else 'polling'
+
+    def _init_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return
+            for directory in self.directories:
+                wd = libc.inotify_add_watch(fd, directory.encode(), WATCH_MASK)
+                if wd < 0:
+                    os.close(fd)
+                    return
+                self.watch_dirs[wd] = directory
+            self.inotify_fd = fd
+        except (OSError, AttributeError):
+            self.inotify_fd = None
+
+    @staticmethod
+    def _list_names(directory):
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries}
+
+    def existing_files(self):
+        """監視開始時点で存在するファイルのパスを返す"""
+        for directory in self.directories:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        yield entry.path
+
+    def wait(self, timeout=None):
+        """
+        変更のあったファイルのパスを返す
+
+        Parameters
+        ----------
+        timeout : float, optional
+            待ち時間（秒）。Noneの場合はpoll_interval
+
+        Returns
+        -------
+        set
+            追加・更新されたファイルのパス
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        if self.inotify_fd is not None:
+            return self._wait_inotify(timeout)
+        return self._wait_polling(timeout)
+
+    def _wait_inotify(self, timeout):
+        changed = set()
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not readable:
+            return changed
+        try:
+            data = os.read(self.inotify_fd, 65536)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].split(b'\0', 1)[0].decode(errors='surrogateescape')
+            offset += name_len
+            if name and wd in self.watch_dirs:
+                changed.add(os.path.join(self.watch_dirs[wd], name))
+        return changed
+
+    def _wait_polling(self, timeout):
+        time.sleep(timeout)
+        changed = set()
+        for directory in self.directories:
+            names = self._list_names(directory)
+            for name in names - self.known_names[directory]:
+                changed.add(os.path.join(directory, name))
+            self.known_names[directory] = names
+        return changed
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
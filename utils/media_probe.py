@@ -0,0 +1,375 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import json
+import mmap
+import os
+import struct
+import subprocess
+
+from utils import wav_file
+
+def read_id3v2_size(f):
+    """先頭にID3v2タグがあればそのサイズを返し、ファイル位置をタグの直後に移動する"""
+    head = f.read(10)
+    if len(head) == 10 and head[:3] == b'ID3':
+        size = (head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | (head[9] & 0x7F)
+        if head[5] & 0x10:  # フッタ付き
+            size += 10
+        f.seek(10 + size)
+        return 10 + size
+    f.seek(0)
+    return 0
+
+def parse_extended_float(data):
+    """AIFFのサンプリングレートに使われる80ビット拡張浮動小数点数を変換する"""
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def probe_wav(filepath):
+    """
+    WAV/RF64/BWFのヘッダから音声情報を取得する
+
+    フレーム数をデータサイズ÷block_alignで求めるため、非圧縮PCM（整数・浮動小数点）のみ対応する。
+    ADPCMやμ-lawなどの圧縮形式はblock_alignが1フレームの大きさではないためNoneを返し、ffprobeに任せる。
+    """
+    header = wav_file.read_wav_header(filepath)
+    if not wav_file.is_pcm(header) or not header['sample_rate']:
+        return None
+    return {
+        'duration': header['frames'] / header['sample_rate'],
+        'channels': header['channels'],
+        'sample_rate': header['sample_rate'],
+        'bits_per_sample': header['bits_per_sample'],
+        'codec': 'pcm_f' if header['sub_format'] == wav_file.WAVE_FORMAT_IEEE_FLOAT else 'pcm',
+    }
+
+def probe_aiff(filepath):
+    """AIFF/AIFCのCOMMチャンクから音声情報を取得する"""
+    with open(filepath, 'rb') as f:
+        form = f.read(12)
+        if len(form) < 12 or form[:4] != b'FORM' or form[8:12] not in (b'AIFF', b'AIFC'):
+            return None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack('>4sI', chunk_header)
+            if chunk_id == b'COMM':
+                comm = f.read(chunk_size)
+                if len(comm) < 18:
+                    return None
+                channels, frames, bits = struct.unpack('>hIh', comm[:8])
+                sample_rate = parse_extended_float(comm[8:18])
+                if sample_rate <= 0:
+                    return None
+                codec = comm[18:22].decode('ascii', 'replace').strip() if form[8:12] == b'AIFC' and len(comm) >= 22 else 'pcm'
+                return {
+                    'duration': frames / sample_rate,
+                    'channels': channels,
+                    'sample_rate': int(sample_rate),
+                    'bits_per_sample': bits,
+                    'codec': codec,
+                }
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+def probe_flac(filepath):
+    """FLACのSTREAMINFOブロックから音声情報を取得する"""
+    with open(filepath, 'rb') as f:
+        read_id3v2_size(f)
+        if f.read(4) != b'fLaC':
+            return None
+        block_header = f.read(4)
+        if len(block_header) < 4 or block_header[0] & 0x7F != 0:  # 最初のブロックはSTREAMINFO
+            return None
+        streaminfo = f.read(34)
+        if len(streaminfo) < 34:
+            return None
+        value = int.from_bytes(streaminfo[10:18], 'big')
+        sample_rate = value >> 44
+        channels = ((value >> 41) & 0x7) + 1
+        bits = ((value >> 36) & 0x1F) + 1
+        total_samples = value & 0xFFFFFFFFF
+        if not sample_rate or not total_samples:
+            return None  # 総サンプル数が不明なストリーム
+        return {
+            'duration': total_samples / sample_rate,
+            'channels': channels,
+            'sample_rate': sample_rate,
+            'bits_per_sample': bits,
+            'codec': 'flac',
+        }
+
+# MPEGオーディオのビットレート表（kbps）。キーは (MPEG1か, レイヤー)
+MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# サンプリングレート表。キーはバージョンビット（0: MPEG2.5, 2: MPEG2, 3: MPEG1）
+MP3_SAMPLE_RATES = {0: [11025, 12000, 8000], 2: [22050, 24000, 16000], 3: [44100, 48000, 32000]}
+
+def parse_mp3_frame_header(data, offset):
+    """
+    MPEGオーディオのフレームヘッダを解析する
+
+    Returns
+    -------
+    dict or None
+        sample_rate, channels, bitrate（bps）, samples（フレームあたりのサンプル数）, length（フレーム長）,
+        side_info（サイド情報のバイト数）を持つ辞書。フレームヘッダでない場合はNone
+    """
+    if offset + 4 > len(data):
+        return None
+    header = int.from_bytes(data[offset:offset + 4], 'big')
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 0x3
+    layer = 4 - ((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0x3
+    padding = (header >> 9) & 0x1
+    mono = ((header >> 6) & 0x3) == 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+    if mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    return {
+        'sample_rate': sample_rate,
+        'channels': 1 if mono else 2,
+        'bitrate': bitrate,
+        'samples': samples,
+        'length': length,
+        'side_info': side_info,
+        'layer': layer,
+    }
+
+# 固定ビットレートか確かめるために読む先頭のフレーム数と、ファイル内で調べる位置の数
+MP3_CBR_CHECK_FRAMES = 16
+MP3_CBR_CHECK_POINTS = 8
+# 途中・末尾のフレームを探す範囲（MPEGオーディオの最大のフレーム長の数倍）
+MP3_FRAME_SEARCH_SIZE = 8 * 1024
+
+def find_mp3_frame(data, start, end):
+    """
+    start以降で最初のフレームヘッダを探す（次のフレームヘッダも続くものだけを採用する）
+
+    Returns
+    -------
+    tuple
+        (フレームの位置, parse_mp3_frame_header()の辞書)。見つからない場合は (None, None)
+    """
+    offset = start
+    while offset < end:
+        offset = data.find(b'\xff', offset, end)
+        if offset < 0:
+            break
+        frame = parse_mp3_frame_header(data, offset)
+        if frame and frame['length'] > 0:
+            following = parse_mp3_frame_header(data, offset + frame['length'])
+            if following and following['sample_rate'] == frame['sample_rate']:
+                return offset, frame
+        offset += 1
+    return None, None
+
+def is_mp3_cbr(data, offset, first, audio_end):
+    """
+    先頭のフレームと、ファイル内の等間隔の位置・末尾の範囲にあるフレームのビットレートが全て同じかを調べる
+
+    全フレームを走査すると数時間の録音ではffprobeより遅いため、決まった数のフレームだけを読む。
+    """
+    for _ in range(MP3_CBR_CHECK_FRAMES):
+        frame = parse_mp3_frame_header(data, offset)
+        if frame is None or offset + frame['length'] > audio_end:
+            break
+        if frame['bitrate'] != first['bitrate']:
+            return False
+        offset += frame['length']
+    positions = [offset + (audio_end - offset) * i // MP3_CBR_CHECK_POINTS for i in range(1, MP3_CBR_CHECK_POINTS)]
+    positions.append(max(offset, audio_end - MP3_FRAME_SEARCH_SIZE))
+    for position in positions:
+        window_end = min(audio_end, position + MP3_FRAME_SEARCH_SIZE)
+        frame_offset, frame = find_mp3_frame(data, position, window_end)
+        while frame is not None and frame_offset + frame['length'] <= window_end:
+            if frame['bitrate'] != first['bitrate']:
+                return False
+            frame_offset += frame['length']
+            frame = parse_mp3_frame_header(data, frame_offset)
+    return True
+
+def probe_mp3(filepath):
+    """
+    MP3のXing/Info・VBRIヘッダ、なければ固定ビットレートとみなせる場合のみデータサイズから音声情報を取得する
+
+    ヘッダのない可変ビットレートのファイルはNoneを返し、ffprobeに任せる。
+    """
+    with open(filepath, 'rb') as f:
+        audio_start = read_id3v2_size(f)
+        if os.fstat(f.fileno()).st_size <= audio_start:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # 最初のフレームヘッダを探す（タグの後ろの埋め草を読み飛ばす）
+        offset, first = find_mp3_frame(data, audio_start, min(len(data), audio_start + 64 * 1024))
+        if first is None:
+            return None
+
+        info = {
+            'channels': first['channels'],
+            'sample_rate': first['sample_rate'],
+            'bits_per_sample': None,
+            'codec': f"mp{first['layer']}",
+        }
+
+        # Xing/Infoヘッダ（VBR/CBRのフレーム数）
+        xing = offset + 4 + first['side_info']
+        if data[xing:xing + 4] in (b'Xing', b'Info'):
+            flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+            if flags & 0x1:
+                frames = int.from_bytes(data[xing + 8:xing + 12], 'big')
+                info['duration'] = frames * first['samples'] / first['sample_rate']
+                return info
+
+        # VBRIヘッダ（Fraunhoferエンコーダ）
+        vbri = offset + 4 + 32
+        if data[vbri:vbri + 4] == b'VBRI':
+            frames = int.from_bytes(data[vbri + 14:vbri + 18], 'big')
+            info['duration'] = frames * first['samples'] / first['sample_rate']
+            return info
+
+        # ヘッダがない固定ビットレートのファイルはデータサイズとビットレートから求める（末尾のID3v1タグは除く）
+        audio_end = len(data)
+        if audio_end - offset >= 128 and data[audio_end - 128:audio_end - 125] == b'TAG':
+            audio_end -= 128
+        if not is_mp3_cbr(data, offset, first, audio_end):
+            return None
+        info['duration'] = (audio_end - offset) * 8 / first['bitrate']
+        return info
+    finally:
+        data.close()
+
+# 拡張子毎のヘッダ解析関数
+HEADER_PROBES = {
+    '.wav': probe_wav,
+    '.aif': probe_aiff,
+    '.aiff': probe_aiff,
+    '.aifc': probe_aiff,
+    '.flac': probe_flac,
+    '.mp3': probe_mp3,
+}
+
+def probe_header(filepath):
+    """
+    コンテナのヘッダだけを読んで音声情報を取得する関数（外部プロセスを起動しない）
+
+    Parameters
+    ----------
+    filepath : str
+        音声ファイルのパス
+
+    Returns
+    -------
+    dict or None
+        duration（秒）, channels, sample_rate, bits_per_sample, codec を持つ辞書。
+        ヘッダを解析できない形式の場合はNone
+    """
+    probe = HEADER_PROBES.get(os.path.splitext(filepath)[1].lower())
+    if probe is None:
+        return None
+    try:
+        return probe(filepath)
+    except (OSError, ValueError, struct.error):
+        return None
+
+def get_duration_from_header(filepath):
+    """ヘッダから音声ファイルの長さ（秒）を取得する。解析できない場合はNone"""
+    info = probe_header(filepath)
+    return info['duration'] if info else None
+
+def probe_ffprobe(filepath):
+    """ffprobeを1回だけ実行して音声情報を取得する（ヘッダを解析できない形式用）"""
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+        '-show_entries', 'format=duration:stream=channels,channel_layout,sample_rate,codec_name,bits_per_sample,bits_per_raw_sample',
+        '-of', 'json', filepath
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+        stream = data['streams'][0] if data.get('streams') else {}
+        bits = int(stream.get('bits_per_raw_sample') or stream.get('bits_per_sample') or 0) or None
+        layout = stream.get('channel_layout')
+        return {
+            'duration': float(data['format']['duration']),
+            'channels': int(stream['channels']) if 'channels' in stream else None,
+            'sample_rate': int(stream['sample_rate']) if 'sample_rate' in stream else None,
+            'bits_per_sample': bits,
+            'codec': stream.get('codec_name'),
+            'channel_layout': layout if layout not in (None, '', 'unknown', 'N/A') else None,
+        }
+    except (OSError, subprocess.CalledProcessError, KeyError, ValueError):
+        return None
+
+def probe(filepath, use_ffprobe=True):
+    """
+    音声ファイルの情報を1回の呼び出しで取得する関数
+
+    WAV/RF64/BWF, AIFF, FLAC, MP3はヘッダを直接読み、それ以外の形式や
+    ヘッダを解析できない場合のみffprobeを使う。
+
+    Parameters
+    ----------
+    filepath : str
+        音声ファイルのパス
+    use_ffprobe : bool, optional
+        Falseの場合はffprobeにフォールバックしない
+
+    Returns
+    -------
+    dict or None
+        duration（秒）, channels, sample_rate, bits_per_sample, codec, channel_layout,
+        source（'header' または 'ffprobe'）を持つ辞書。取得できない場合はNone
+    """
+    info = probe_header(filepath)
+    if info is not None:
+        info.setdefault('channel_layout', None)
+        info['source'] = 'header'
+        return info
+    if not use_ffprobe:
+        return None
+    info = probe_ffprobe(filepath)
+    if info is not None:
+        info['source'] = 'ffprobe'
+    return info
+
+def get_duration(filepath):
+    """音声ファイルの長さ（秒）を取得する。取得できない場合はNone"""
+    info = probe(filepath)
+    return info['duration'] if info else None
+
+def get_channels(filepath):
+    """音声ファイルのチャンネル数を取得する。取得できない場合はNone"""
+    info = probe(filepath)
+    return info['channels'] if info else None
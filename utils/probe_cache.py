@@ -0,0 +1,192 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from utils import media_probe
+
+# キャッシュディレクトリを指定する環境変数
+CACHE_DIR_ENV = 'SOUND_COMMAND_CACHE_DIR'
+CACHE_FILENAME = 'probe_cache.sqlite'
+
+# キャッシュに保持する最大件数（超えた分は最後に使われた時刻が古いものから削除）
+DEFAULT_MAX_ENTRIES = 200000
+
+# この件数の書き込み毎にコミットする
+COMMIT_INTERVAL = 1000
+
+# 解析結果のバージョン。media_probeの修正で結果が変わる場合に上げ、古いキャッシュを破棄する
+# （2: 圧縮WAVとヘッダのない可変ビットレートのMP3をffprobeで解析するようにした）
+CACHE_VERSION = 2
+
+PROBE_FIELDS = ('duration', 'channels', 'sample_rate', 'bits_per_sample', 'codec', 'channel_layout', 'source')
+
+def default_cache_dir():
+    """キャッシュディレクトリを返す（環境変数 > XDG_CACHE_HOME > ~/.cache の順）"""
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'sound_command')
+
+class ProbeCache:
+    """
+    音声ファイルの解析結果（長さ・チャンネル数など）をSQLiteに保存するキャッシュ
+
+    キーは (実パス, ファイルサイズ, 更新時刻ns) で、ファイルが変更されると自動的に
+    解析し直す。複数スレッドから同時に使用できる。
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        キャッシュファイルを置くディレクトリ。Noneの場合はdefault_cache_dir()
+    max_entries : int, optional
+        保持する最大件数。close()時に古いものから削除する
+    """
+
+    def __init__(self, cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.path = os.path.join(self.cache_dir, CACHE_FILENAME)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.pending_writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS probe')
+            self.conn.execute(f'PRAGMA user_version = {CACHE_VERSION}')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS probe (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                duration REAL,
+                channels INTEGER,
+                sample_rate INTEGER,
+                bits_per_sample INTEGER,
+                codec TEXT,
+                channel_layout TEXT,
+                source TEXT,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_probe_last_used ON probe(last_used)')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _written(self):
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.conn.commit()
+            self.pending_writes = 0
+
+    def probe(self, filepath, stat_result=None):
+        """
+        キャッシュを使って音声ファイルの情報を取得する
+
+        Parameters
+        ----------
+        filepath : str
+            音声ファイルのパス
+        stat_result : os.stat_result, optional
+            既に取得済みのstat結果（DirEntry.stat()など）。Noneの場合はos.stat
+
+        Returns
+        -------
+        dict or None
+            media_probe.probe()と同じ辞書。解析できない場合はNone（失敗はキャッシュしない）
+        """
+        path = os.path.realpath(filepath)
+        try:
+            st = stat_result or os.stat(path)
+        except OSError:
+            return None
+
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                f'SELECT {", ".join(PROBE_FIELDS)} FROM probe WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (path, st.st_size, st.st_mtime_ns)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute('UPDATE probe SET last_used = ? WHERE path = ?', (now, path))
+                self._written()
+                self.hits += 1
+                return dict(zip(PROBE_FIELDS, row))
+
+        info = media_probe.probe(path)
+        with self.lock:
+            self.misses += 1
+            if info is not None:
+                self.conn.execute(
+                    f'INSERT OR REPLACE INTO probe (path, size, mtime_ns, {", ".join(PROBE_FIELDS)}, last_used) '
+                    f'VALUES (?, ?, ?, {", ".join("?" * len(PROBE_FIELDS))}, ?)',
+                    (path, st.st_size, st.st_mtime_ns, *(info.get(field) for field in PROBE_FIELDS), now)
+                )
+                self._written()
+        return info
+
+    def get_duration(self, filepath, stat_result=None):
+        """キャッシュを使って音声ファイルの長さ（秒）を取得する。取得できない場合はNone"""
+        info = self.probe(filepath, stat_result)
+        return info['duration'] if info else None
+
+    def evict(self):
+        """max_entriesを超えた分を最後に使われた時刻が古いものから削除する"""
+        with self.lock:
+            count = self.conn.execute('SELECT COUNT(*) FROM probe').fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    'DELETE FROM probe WHERE path IN (SELECT path FROM probe ORDER BY last_used LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+                self.conn.commit()
+            return max(0, count - self.max_entries)
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.evict()
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+def open_cache(cache_dir=None, enabled=True):
+    """
+    キャッシュを開く。無効化されている場合や開けない場合はNoneを返す
+
+    キャッシュディレクトリに書き込めない環境でもスクリプトが動くように、
+    失敗時は警告を出してキャッシュなしで続行する。
+    """
+    if not enabled:
+        return None
+    try:
+        return ProbeCache(cache_dir)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: 解析結果キャッシュを開けません（キャッシュなしで続行します）: {e}", file=sys.stderr)
+        return None
+
+def probe(filepath, cache=None, stat_result=None):
+    """cacheがあればキャッシュを使い、なければmedia_probe.probe()を直接呼ぶ"""
+    if cache is None:
+        return media_probe.probe(filepath)
+    return cache.probe(filepath, stat_result)
+
+def get_duration(filepath, cache=None, stat_result=None):
+    """cacheがあればキャッシュを使って音声ファイルの長さ（秒）を取得する"""
+    info = probe(filepath, cache, stat_result)
+    return info['duration'] if info else None
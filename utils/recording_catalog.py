@@ -0,0 +1,240 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import os
+import sqlite3
+from datetime import timedelta
+
+CATALOG_FILENAME = 'recording_catalog.sqlite'
+# 2: 音声ファイルから取得した長さを解析し直すため作り直す（probe_cache.CACHE_VERSION 2 と同時）
+SCHEMA_VERSION = 2
+
+# 開始・終了時刻の保存形式（文字列のまま大小比較できる）
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 発見したがまだ走査していないディレクトリの更新時刻（必ず再走査される）
+UNSCANNED_MTIME = -1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS directories (
+    top TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (top, path)
+);
+CREATE INDEX IF NOT EXISTS idx_directories_parent ON directories(top, parent);
+CREATE TABLE IF NOT EXISTS recordings (
+    top TEXT NOT NULL,
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    duration REAL,
+    duration_source TEXT,
+    is_666 INTEGER NOT NULL,
+    warning TEXT,
+    PRIMARY KEY (top, path)
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_dir ON recordings(top, dir);
+CREATE INDEX IF NOT EXISTS idx_recordings_start ON recordings(top, start_time);
+'''
+
+class RecordingCatalog:
+    """
+    録音ファイルの一覧（カタログ）をSQLiteに保存するクラス
+
+    直下のディレクトリ（top）毎に、その配下のディレクトリの更新時刻と
+    録音ファイル1つ1行（開始・終了時刻、長さとその取得元、サイズ、更新時刻）を保持する。
+    更新時刻が変わっていないディレクトリは再走査せずにカタログの内容を使う。
+
+    Parameters
+    ----------
+    db_path : str
+        カタログファイルのパス。':memory:' の場合は保存しない
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript('DROP TABLE IF EXISTS directories; DROP TABLE IF EXISTS recordings;')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # --- ディレクトリ ---
+
+    def get_directory_mtime(self, top, path):
+        """保存されているディレクトリの更新時刻（ns）を返す。未登録の場合はNone"""
+        row = self.conn.execute('SELECT mtime_ns FROM directories WHERE top = ? AND path = ?', (top, path)).fetchone()
+        return row[0] if row else None
+
+    def get_child_directories(self, top, path):
+        """保存されている直下のサブディレクトリのパスを返す"""
+        return [row[0] for row in self.conn.execute(
+            'SELECT path FROM directories WHERE top = ? AND parent = ?', (top, path))]
+
+    def save_directory(self, top, path, parent, mtime_ns):
+        self.conn.execute('INSERT OR REPLACE INTO directories (top, path, parent, mtime_ns) VALUES (?, ?, ?, ?)',
+                          (top, path, parent, mtime_ns))
+
+    def add_directory(self, top, path, parent):
+        """新しく見つかったディレクトリを未走査として登録する（既に登録済みなら何もしない）"""
+        self.conn.execute('INSERT OR IGNORE INTO directories (top, path, parent, mtime_ns) VALUES (?, ?, ?, ?)',
+                          (top, path, parent, UNSCANNED_MTIME))
+
+    def delete_directory_tree(self, top, path):
+        """ディレクトリとその配下のディレクトリ・録音ファイルを削除する"""
+        prefix = path.rstrip(os.sep) + os.sep
+        self.conn.execute('DELETE FROM directories WHERE top = ? AND (path = ? OR substr(path, 1, ?) = ?)',
+                          (top, path, len(prefix), prefix))
+        self.conn.execute('DELETE FROM recordings WHERE top = ? AND (dir = ? OR substr(dir, 1, ?) = ?)',
+                          (top, path, len(prefix), prefix))
+
+    def delete_top(self, top):
+        self.conn.execute('DELETE FROM directories WHERE top = ?', (top,))
+        self.conn.execute('DELETE FROM recordings WHERE top = ?', (top,))
+
+    def purge_missing_tops(self, root, existing_tops):
+        """rootの直下から消えたディレクトリのカタログを削除する"""
+        existing = set(existing_tops)
+        for (top,) in self.conn.execute('SELECT DISTINCT top FROM directories').fetchall():
+            if os.path.dirname(top) == root and top not in existing:
+                self.delete_top(top)
+
+    # --- 録音ファイル ---
+
+    def get_files(self, top, directory):
+        """ディレクトリ直下の録音ファイルの {パス: (サイズ, 更新時刻ns)} を返す"""
+        return {row[0]: (row[1], row[2]) for row in self.conn.execute(
+            'SELECT path, size, mtime_ns FROM recordings WHERE top = ? AND dir = ?', (top, directory))}
+
+    def save_recording(self, top, path, directory, name, size, mtime_ns, start_time, end_time,
+                       duration, duration_source, is_666, warning):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO recordings (top, path, dir, name, size, mtime_ns, start_time, end_time, '
+            'duration, duration_source, is_666, warning) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (top, path, directory, name, size, mtime_ns, start_time, end_time,
+             duration, duration_source, int(is_666), warning))
+
+    def set_duration(self, top, path, duration, duration_source):
+        """音声ファイルから取得した長さを保存する"""
+        self.conn.execute('UPDATE recordings SET duration = ?, duration_source = ? WHERE top = ? AND path = ?',
+                          (duration, duration_source, top, path))
+
+    def set_file_stat(self, top, path, size, mtime_ns):
+        """録音ファイルのサイズと更新時刻を更新する（前回解析に失敗したファイルが変更された場合）"""
+        self.conn.execute('UPDATE recordings SET size = ?, mtime_ns = ? WHERE top = ? AND path = ?',
+                          (size, mtime_ns, top, path))
+
+    def delete_recordings(self, top, paths):
+        self.conn.executemany('DELETE FROM recordings WHERE top = ? AND path = ?', [(top, p) for p in paths])
+
+    # --- 集計 ---
+
+    def _filter(self, tops, exclude_pattern=None, only_666=False, display=None):
+        """集計対象の録音ファイルを絞り込むWHERE句とパラメータを返す
+
+        displayは (表示用の接頭辞, 切り取り開始位置)。除外パターンはコマンドラインで
+        指定されたディレクトリから組み立てた表示用のパスに対して判定する。
+        """
+        where = [f"top IN ({', '.join('?' * len(tops))})"]
+        params = list(tops)
+        if exclude_pattern:
+            where.append('instr(? || substr(path, ?), ?) = 0')
+            params.extend([display[0], display[1], exclude_pattern])
+        if only_666:
+            where.append('is_666 = 1')
+        return ' AND '.join(where), params
+
+    def totals_by_top(self, tops, exclude_pattern=None, only_666=False, display=None):
+        """
+        直下のディレクトリ毎の集計をSQLで求める
+
+        Returns
+        -------
+        list of tuple
+            (top, 総録音時間（秒）, ファイル数, 総サイズ, 最終更新時刻ns)
+            長さが分からないファイルも総サイズと同じくファイル数に数える
+        """
+        if not tops:
+            return []
+        where, params = self._filter(tops, exclude_pattern, only_666, display)
+        return self.conn.execute(
+            f'SELECT top, TOTAL(duration), COUNT(*), TOTAL(size), MAX(mtime_ns) '
+            f'FROM recordings WHERE {where} GROUP BY top', params).fetchall()
+
+    def iter_recordings(self, tops, columns, exclude_pattern=None, only_666=False, display=None,
+                        condition=None, condition_params=(), order_by='path'):
+        """条件に合う録音ファイルをorder_byの順に1件ずつ返す（先頭の列は表示用のパス）"""
+        if not tops:
+            return iter(())
+        where, params = self._filter(tops, exclude_pattern, only_666, display)
+        if condition:
+            where += f' AND ({condition})'
+            params.extend(condition_params)
+        return self.conn.execute(
+            f'SELECT {", ".join(["? || substr(path, ?) AS display_path"] + list(columns))} '
+            f'FROM recordings WHERE {where} ORDER BY {order_by}', [display[0], display[1]] + params)
+
+    def list_recordings(self, *args, **kwargs):
+        """iter_recordings()の結果をリストで返す"""
+        return list(self.iter_recordings(*args, **kwargs))
+
+    def max_duration(self, tops):
+        """ファイル名から開始・終了時刻が分かる録音の最大の長さ（秒）を返す"""
+        if not tops:
+            return None
+        return self.conn.execute(
+            f"SELECT MAX(duration) FROM recordings WHERE top IN ({', '.join('?' * len(tops))}) "
+            f"AND start_time IS NOT NULL", list(tops)).fetchone()[0]
+
+    def recordings_at(self, tops, at, exclude_pattern=None, only_666=False, display=None):
+        """
+        指定した日時を含む録音を返す
+
+        開始時刻の索引を使い、開始時刻が「指定日時 - 最大の録音の長さ」から指定日時までの
+        録音だけを調べるため、カタログ全体を走査しない。
+
+        Parameters
+        ----------
+        at : datetime
+            調べる日時
+
+        Returns
+        -------
+        list of tuple
+            (表示用のパス, 開始時刻, 終了時刻) のリスト
+        """
+        max_duration = self.max_duration(tops)
+        if max_duration is None:
+            return []
+        lower = (at - timedelta(seconds=max_duration)).strftime(TIME_FORMAT)
+        at_str = at.strftime(TIME_FORMAT)
+        return self.list_recordings(
+            tops, ['start_time', 'end_time'], exclude_pattern, only_666, display,
+            condition='start_time BETWEEN ? AND ? AND end_time > ?',
+            condition_params=(lower, at_str, at_str), order_by='start_time')
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
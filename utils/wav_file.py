@@ -0,0 +1,185 @@
+__version__ = 'v0.0.1'
+__last_updated__ = '2026-10-16 10:00:00'
+
+import mmap
+import os
+import struct
+
+# RIFFサイズフィールドの上限（これを超える場合はRF64で書き出す）
+RIFF_MAX_SIZE = 0xFFFFFFFF
+
+# 1回の書き込みでコピーするバイト数
+COPY_BLOCK_SIZE = 16 * 1024 * 1024
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def read_wav_header(filepath):
+    """
+    WAV/RF64/BWFファイルのヘッダを解析する関数
+
+    Parameters
+    ----------
+    filepath : str
+        WAVファイルのパス
+
+    Returns
+    -------
+    dict or None
+        format_tag, channels, sample_rate, byte_rate, block_align,
+        bits_per_sample, sub_format, data_offset, data_size, frames, is_rf64
+        を持つ辞書。WAVとして解析できない場合はNone
+    """
+    try:
+        file_size = os.path.getsize(filepath)
+        with open(filepath, 'rb') as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[8:12] != b'WAVE' or riff[0:4] not in (b'RIFF', b'RF64', b'BW64'):
+                return None
+            is_rf64 = riff[0:4] != b'RIFF'
+
+            header = {'is_rf64': is_rf64}
+            ds64_data_size = None
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+                chunk_start = f.tell()
+
+                if chunk_id == b'ds64':
+                    _, ds64_data_size = struct.unpack('<QQ', f.read(16))
+                elif chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                    if len(fmt) < 16:
+                        return None
+                    (header['format_tag'], header['channels'], header['sample_rate'],
+                     header['byte_rate'], header['block_align'], header['bits_per_sample']) = struct.unpack('<HHIIHH', fmt[:16])
+                    header['sub_format'] = header['format_tag']
+                    if header['format_tag'] == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                        # SubFormat GUIDの先頭2バイトが実際のフォーマット
+                        header['sub_format'] = struct.unpack('<H', fmt[24:26])[0]
+                elif chunk_id == b'data':
+                    if 'format_tag' not in header:
+                        return None
+                    data_size = chunk_size
+                    if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                        data_size = ds64_data_size
+                    # 録音中断などでヘッダのサイズが実ファイルより大きい場合は切り詰める
+                    data_size = min(data_size, file_size - chunk_start)
+                    header['data_offset'] = chunk_start
+                    header['data_size'] = data_size
+                    header['frames'] = data_size // header['block_align'] if header['block_align'] else 0
+                    return header
+
+                # チャンクは2バイト境界に揃えられている
+                f.seek(chunk_start + chunk_size + (chunk_size & 1))
+    except (OSError, struct.error):
+        return None
+
+def is_pcm(header):
+    """ヘッダが非圧縮PCM（整数または浮動小数点）かどうかを判定する"""
+    return (header is not None
+            and header['sub_format'] in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT)
+            and header['block_align'] > 0
+            and header['block_align'] == header['channels'] * ((header['bits_per_sample'] + 7) // 8))
+
+def build_wav_header(header, data_size, channels=None):
+    """
+    出力ファイル用の新しいWAVヘッダを生成する関数
+
+    data_sizeがRIFFの上限を超える場合はRF64（ds64チャンク付き）で生成する。
+    channelsを指定した場合はそのチャンネル数でfmtチャンクを作り直す。
+    """
+    channels = channels or header['channels']
+    bytes_per_sample = (header['bits_per_sample'] + 7) // 8
+    block_align = channels * bytes_per_sample
+    byte_rate = header['sample_rate'] * block_align
+
+    if header['format_tag'] == WAVE_FORMAT_EXTENSIBLE:
+        channel_mask = 0
+        sub_format_guid = struct.pack('<H', header['sub_format']) + b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+        fmt = struct.pack('<HHIIHHHHI', WAVE_FORMAT_EXTENSIBLE, channels, header['sample_rate'], byte_rate,
+                          block_align, header['bits_per_sample'], 22, header['bits_per_sample'], channel_mask) + sub_format_guid
+    else:
+        fmt = struct.pack('<HHIIHH', header['format_tag'], channels, header['sample_rate'], byte_rate,
+                          block_align, header['bits_per_sample'])
+
+    fmt_chunk = b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+    riff_size = 4 + len(fmt_chunk) + 8 + data_size + (data_size & 1)
+
+    if riff_size <= RIFF_MAX_SIZE:
+        return b'RIFF' + struct.pack('<I', riff_size) + b'WAVE' + fmt_chunk + b'data' + struct.pack('<I', data_size)
+
+    ds64 = struct.pack('<QQQI', riff_size + 36, data_size, data_size // block_align, 0)
+    ds64_chunk = b'ds64' + struct.pack('<I', len(ds64)) + ds64
+    return (b'RF64' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE' + ds64_chunk + fmt_chunk
+            + b'data' + struct.pack('<I', 0xFFFFFFFF))
+
+def frame_range(header, start_seconds, duration_seconds):
+    """開始秒と長さ秒からサンプル単位の区間 (開始フレーム, 終了フレーム) を求める"""
+    start_frame = min(round(start_seconds * header['sample_rate']), header['frames'])
+    end_frame = min(round((start_seconds + duration_seconds) * header['sample_rate']), header['frames'])
+    return start_frame, max(start_frame, end_frame)
+
+def write_wav_segment(source, header, output_file, start_frame, end_frame, channel=None):
+    """
+    メモリマップしたWAVのデータ区間を新しいヘッダを付けて書き出す関数
+
+    Parameters
+    ----------
+    source : mmap.mmap
+        入力WAVファイルのメモリマップ
+    header : dict
+        read_wav_headerの戻り値
+    output_file : str
+        出力ファイルのパス
+    start_frame, end_frame : int
+        書き出すサンプル区間
+    channel : int, optional
+        指定した場合はそのチャンネル（0始まり）だけをモノラルで書き出す
+
+    Returns
+    -------
+    int
+        書き出したフレーム数
+    """
+    block_align = header['block_align']
+    frames = end_frame - start_frame
+    start = header['data_offset'] + start_frame * block_align
+    view = memoryview(source)
+
+    try:
+        with open(output_file, 'wb') as out:
+            if channel is None:
+                data_size = frames * block_align
+                out.write(build_wav_header(header, data_size))
+                # データ区間をそのままコピーする
+                for offset in range(start, start + data_size, COPY_BLOCK_SIZE):
+                    out.write(view[offset:min(offset + COPY_BLOCK_SIZE, start + data_size)])
+            else:
+                bytes_per_sample = block_align // header['channels']
+                data_size = frames * bytes_per_sample
+                out.write(build_wav_header(header, data_size, channels=1))
+                # インターリーブされたデータからストライド付きスライスで1チャンネルを取り出す
+                block_frames = max(1, COPY_BLOCK_SIZE // block_align)
+                for frame in range(start_frame, end_frame, block_frames):
+                    n = min(block_frames, end_frame - frame)
+                    block_start = header['data_offset'] + frame * block_align
+                    block = source[block_start:block_start + n * block_align]
+                    mono = bytearray(n * bytes_per_sample)
+                    for b in range(bytes_per_sample):
+                        mono[b::bytes_per_sample] = block[channel * bytes_per_sample + b::block_align]
+                    out.write(mono)
+            if data_size & 1:
+                out.write(b'\x00')
+    finally:
+        view.release()
+
+    return frames
+
+def open_wav_mmap(filepath):
+    """WAVファイルを読み取り専用でメモリマップする"""
+    with open(filepath, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
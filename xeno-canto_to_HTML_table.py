@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
-__version__ = 'v0.0.5'
-__last_updated__ = '2025-02-28 16:39:16'
+__version__ = 'v0.0.6'
+__last_updated__ = '2026-10-16 10:00:00'
 
 import argparse
 import json
@@ -20,6 +20,8 @@ SONO_ROOT = '../dataset/spectrogram'  # スペクトログラムのルートデ
 METADATA_DIR = './dataset/metadata'  # メタデータのルートディレクトリ
 SPECTROGRAM_DIR = "./dataset/spectrogram"  # スペクトログラムの出力ディレクトリ
 HTML_DIR = "./html"  # HTMLファイルの出力ディレクトリ
+PAGE_SIZE = 200  # 1ページに表示する録音の数
+WRITE_BUFFER_SIZE = 1 << 16  # HTMLファイルの書き込みバッファのサイズ（バイト）
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='xeno-cantoのデータからHTML表を生成する')
@@ -27,6 +29,8 @@ def parse_arguments():
                        help='学名 (例: "Emberiza aureola")')
     parser.add_argument('-fi', '--file_items', type=str, default='',
                        help='メタデータの表示項目ファイル（指定がなければ全項目を表示）')
+    parser.add_argument('-ps', '--page_size', type=int, default=PAGE_SIZE,
+                       help=f'1ページに表示する録音の数（0でページに分けない、デフォルト: {PAGE_SIZE}）')
     parser.add_argument('-d', '--debug', action='store_true',
                        help='デバッグモードを有効にする')
     return parser.parse_args()
@@ -71,62 +75,122 @@ def load_metadata(science_name, debug=False):
     
     return recordings
 
-def generate_html_table(recordings, items):
-    """HTMLテーブルを生成"""
-    output_dir = Path(HTML_DIR)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    html = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Xeno-canto Recordings</title>
-        <style>
-            table { border-collapse: collapse; width: 100%; }
-            th, td { border: 1px solid black; padding: 8px; text-align: left; }
-            th { background-color: #f2f2f2; }
-            img { max-width: 300px; }
-            audio { width: 300px; }
-        </style>
-    </head>
-    <body>
-        <table>
-            <tr>
+def write_html_header(f, title):
+    """HTMLのヘッダーを書き込む"""
+    f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>
+        table {{ border-collapse: collapse; width: 100%; }}
+        th, td {{ border: 1px solid black; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; }}
+        img {{ max-width: 300px; }}
+        audio {{ width: 300px; }}
+        nav {{ margin: 8px 0; }}
+        nav a, nav span {{ margin-right: 6px; }}
+    </style>
+</head>
+<body>
+""")
+
+def get_page_file(dir_name, page):
+    """種のページのファイル名（1ページ目は従来と同じ 学名.html、2ページ目以降は 学名_pageN.html）"""
+    return f"{dir_name}.html" if page == 1 else f"{dir_name}_page{page}.html"
+
+def write_page_nav(f, index_file, dir_name, page, num_pages):
+    """一覧とページ番号のリンクを書き込む"""
+    if not index_file and num_pages == 1:
+        return
+    f.write("<nav>")
+    if index_file:
+        f.write(f'<a href="{index_file}">一覧</a>')
+    if num_pages > 1:
+        for i in range(1, num_pages + 1):
+            if i == page:
+                f.write(f"<span>{i}</span>")
+            else:
+                f.write(f'<a href="{get_page_file(dir_name, i)}">{i}</a>')
+    f.write("</nav>\n")
+
+def write_species_page(output_file, recordings, items, dir_name, page, num_pages, index_file=None):
+    """1ページ分の録音の表を1行ずつ書き込む"""
+    with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        title = f"Xeno-canto Recordings: {dir_name.replace('_', ' ')}"
+        write_html_header(f, title if num_pages == 1 else f"{title} ({page}/{num_pages})")
+        write_page_nav(f, index_file, dir_name, page, num_pages)
+        
+        # ヘッダー行を生成
+        f.write("<table>\n<tr>")
+        f.write(''.join([f"<th>{item}</th>" for item in items]))
+        f.write("<th>Sonogram</th><th>Audio</th></tr>\n")
+        
+        # データ行を生成
+        for rec in recordings:
+            # 学名を使用してパスを生成（例：'Emberiza aureola' -> 'Emberiza_aureola'）
+            scientific_name = f"{rec['gen']}_{rec['sp']}"
+            
+            audio_path = f"{AUDIO_ROOT}/{scientific_name}/{rec['id']}.mp3"
+            sono_path = f"{SONO_ROOT}/{scientific_name}/{rec['id']}.png"
+            
+            # 画面外のソナグラムと音声はスクロールや再生まで読み込まない
+            f.write("<tr>")
+            f.write(''.join([f"<td>{rec.get(item, '')}</td>" for item in items]))
+            f.write(f'<td><img src="{sono_path}" alt="Sonogram {rec["id"]}" loading="lazy"></td>'
+                    f'<td><audio controls preload="none"><source src="{audio_path}" type="audio/mpeg">'
+                    f'Your browser does not support the audio element.</audio></td></tr>\n')
+        
+        f.write("</table>\n")
+        write_page_nav(f, index_file, dir_name, page, num_pages)
+        f.write("</body></html>\n")
+
+def write_index_page(output_file, species_pages):
+    """種毎の録音数とページへのリンクの一覧を書き込む"""
+    with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        write_html_header(f, "Xeno-canto Recordings")
+        f.write("<table>\n<tr><th>Species</th><th>English name</th><th>Recordings</th><th>Pages</th></tr>\n")
+        for dir_name, en, num_recordings, num_pages in sorted(species_pages):
+            links = ' '.join([f'<a href="{get_page_file(dir_name, i)}">{i}</a>' for i in range(1, num_pages + 1)])
+            f.write(f'<tr><td><a href="{get_page_file(dir_name, 1)}">{dir_name.replace("_", " ")}</a></td>'
+                    f'<td>{en}</td><td>{num_recordings}</td><td>{links}</td></tr>\n')
+        f.write("</table>\n</body></html>\n")
+
+def generate_html_table(recordings, items, page_size=PAGE_SIZE):
     """
+    HTMLテーブルを生成
     
-    # ヘッダー行を生成
-    html += ''.join([f"<th>{item}</th>" for item in items])
-    html += "<th>Sonogram</th><th>Audio</th></tr>"
+    種毎にpage_size件ずつのページに分けて書き込む（page_sizeが0の場合は分けない）。
+    全種の場合は種毎・ページ毎のリンクの一覧（all.html）も生成する
+    """
+    output_dir = Path(HTML_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
-    # データ行を生成
+    # 種毎にまとめる（読み込んだ順を保つ）
+    species = {}
     for rec in recordings:
-        html += "<tr>"
-        html += ''.join([f"<td>{rec.get(item, '')}</td>" for item in items])
-        
-        # 学名を使用してパスを生成（例：'Emberiza aureola' -> 'Emberiza_aureola'）
-        scientific_name = f"{rec['gen']}_{rec['sp']}"
-        
-        audio_path = f"{AUDIO_ROOT}/{scientific_name}/{rec['id']}.mp3"
-        sono_path = f"{SONO_ROOT}/{scientific_name}/{rec['id']}.png"
-        
-        html += f"""
-                <td><img src="{sono_path}" alt="Sonogram {rec['id']}"></td>
-                <td><audio controls><source src="{audio_path}" type="audio/mpeg">Your browser does not support the audio element.</audio></td>
-            </tr>
-        """
+        species.setdefault(f"{rec['gen']}_{rec['sp']}", []).append(rec)
     
-    html += "</table></body></html>"
+    index_file = "all.html" if args.science_name == 'all' else None
+    species_pages = []
+    for dir_name, species_recordings in species.items():
+        size = page_size if page_size > 0 else len(species_recordings)
+        num_pages = (len(species_recordings) + size - 1) // size
+        for page in range(1, num_pages + 1):
+            write_species_page(output_dir / get_page_file(dir_name, page),
+                               species_recordings[(page - 1) * size:page * size],
+                               items, dir_name, page, num_pages, index_file)
+        species_pages.append((dir_name, species_recordings[0].get('en', ''), len(species_recordings), num_pages))
+        if args.debug:
+            print(f"{dir_name}: {len(species_recordings)} recordings, {num_pages} pages")
     
     # 出力ファイル名の決定
-    if args.science_name == 'all':
-        output_file = output_dir / "all.html"
+    if index_file:
+        output_file = output_dir / index_file
+        write_index_page(output_file, species_pages)
     else:
         dir_name = get_recording_dir(recordings)
-        output_file = output_dir / f"{dir_name}.html"
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+        output_file = output_dir / get_page_file(dir_name, 1)
     
     return output_file
 
@@ -230,7 +294,7 @@ def main():
         items = list(recordings[0].keys())
     
     # HTMLテーブルを生成
-    output_file = generate_html_table(recordings, items)
+    output_file = generate_html_table(recordings, items, args.page_size)
     print(f"HTML table generated: {output_file}")
     
     # スペクトログラムのダウンロード